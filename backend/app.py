@@ -1,137 +1,868 @@
+import asyncio
+import hashlib
+import json
 import numpy as np
 import shapely
-import random
-import matplotlib.pyplot as plt
-import io
 import os
-from matplotlib.patches import Polygon
-from fastapi import FastAPI, UploadFile, HTTPException
+import shutil
+import tempfile
+from configparser import ConfigParser
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Literal, Optional
+from fastapi import Depends, FastAPI, UploadFile, HTTPException, Header, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.exc import SQLAlchemyError
-from logger_manager import log
+from sqlalchemy.ext.asyncio import AsyncSession
+from logger_manager import get_logger
+from metrics import CONTENT_TYPE, MetricsMiddleware, MetricsRegistry, stage
 from database import Database
-from model import Point
+from export import (MEDIA_TYPES as EXPORT_MEDIA_TYPES, POLYGON_MEDIA_TYPES, Compressor, content_encoding,
+                    encode_polygon, export_encoder)
+from model import MetricsQuery, PolygonQuery
+from jobs import Job, JobQueue, JobQueueFull
+from ingest import (FORMAT_NAMES, FileTooLarge, TooManyPoints, decompressed, iter_batch_csv, iter_batch_ndjson,
+                    iter_csv_point_batches, iter_in_thread, iter_polygon_batches, polygon_error, upload_format)
+from render_cache import RenderCache, etag_matches
+from geometry_cache import GeometryCache
+from geometry import choose_lod, metric_records, pack_polygons, polygons_metrics, shapely_polygons
+from renderer import MEDIA_TYPES, RenderPool, RenderQueueFull, pixel_tolerance, render_polygon, render_tile
+from spatial_index import SpatialIndex, parse_bbox
+from startup import WarmUp
+from tiles import TileCache
+
+log = get_logger(__name__)
 
 CONF_DIR = config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "config.ini"))
+config = ConfigParser()
+config.read(CONF_DIR)
+# Nombre de polygones insérés par transaction sur /upload/batch
+BATCH_CHUNK_SIZE = config.getint("upload", "batch_chunk_size", fallback=500)
+# Ingestion en flux de /upload : taille des lots insérés, nombre maximal de points, taille max de l'écho
+UPLOAD_INSERT_BATCH_SIZE = config.getint("upload", "insert_batch_size", fallback=10000)
+UPLOAD_MAX_POINTS = config.getint("upload", "max_points", fallback=1000000)
+UPLOAD_ECHO_MAX_POINTS = config.getint("upload", "echo_max_points", fallback=10000)
+# Taille maximale, une fois décompressé, d'un upload lu d'un bloc (WKB, GeoJSON, Arrow, Parquet)
+UPLOAD_MAX_FILE_BYTES = config.getint("upload", "max_file_bytes", fallback=256 * 1024 * 1024)
+# Longueur maximale d'une ligne CSV : un fichier sans retour à la ligne est refusé au lieu de grossir sans fin
+UPLOAD_MAX_LINE_LENGTH = config.getint("upload", "max_line_length", fallback=1024 * 1024)
+# Requêtes spatiales : index STRtree en mémoire (sinon index GiST de la base seul), taille max d'une page
+SPATIAL_INDEX_ENABLED = config.getboolean("spatial_index", "enabled", fallback=True)
+MAX_PAGE_SIZE = config.getint("spatial_index", "max_page_size", fallback=1000)
+# Export en flux : lignes lues par aller-retour du curseur serveur ; taille max d'une page de points
+EXPORT_BATCH_SIZE = config.getint("export", "batch_size", fallback=10000)
+MAX_POINTS_PAGE_SIZE = config.getint("export", "max_points_page_size", fallback=10000)
+# Niveaux de compression des exports (Accept-Encoding: gzip ou zstd)
+EXPORT_COMPRESSION_LEVELS = {"gzip": config.getint("export", "gzip_level", fallback=6),
+                             "zstd": config.getint("export", "zstd_level", fallback=3)}
+# Nombre maximal de polygones par appel de POST /polygons/metrics
+MAX_METRICS_BATCH_SIZE = config.getint("geometry", "max_batch_size", fallback=10000)
+# Requêtes plus lentes que ce seuil (ms) journalisées avec le détail de leurs étapes
+SLOW_REQUEST_MS = config.getfloat("metrics", "slow_request_ms", fallback=1000)
+# Préchauffage en tâche de fond au démarrage (pool de connexions, index spatial, workers de rendu)
+WARM_UP_ENABLED = config.getboolean("startup", "warm_up", fallback=True)
+WARM_UP_RENDERER = config.getboolean("startup", "warm_up_renderer", fallback=True)
+# Tâches de fond : uploads plus gros que ce seuil (octets) et rendus de plus de ce nombre de sommets (0 = jamais)
+UPLOAD_JOB_THRESHOLD = config.getint("jobs", "upload_threshold_bytes", fallback=0)
+RENDER_JOB_THRESHOLD = config.getint("jobs", "render_threshold_vertices", fallback=0)
+
+# Engines créés au démarrage du worker (lifespan), pas à l'import du module
+db = Database(CONF_DIR, connect=False)
+render_cache = RenderCache.from_config(CONF_DIR)
+render_pool = RenderPool.from_config(CONF_DIR)
+spatial_index = SpatialIndex.from_config(CONF_DIR)
+tile_cache = TileCache.from_config(CONF_DIR)
+geometry_cache = GeometryCache.from_config(CONF_DIR)
+job_queue = JobQueue.from_config(CONF_DIR)
+metrics_registry = MetricsRegistry()
+warm_up = WarmUp()
+
+async def get_session() -> AsyncIterator[AsyncSession]:
+    """ Dépendance FastAPI : une session asynchrone par requête, rendue au pool à la fin de la requête """
+    async with db.AsyncSessionLocal() as session:
+        yield session
+
+async def _refresh_spatial_index(session: AsyncSession):
+    """
+    Build the spatial index on first use, then add the polygons inserted since (by any process),
+    drop the cached tiles they cover and any cached geometry left under their IDs.
+    """
+    if SPATIAL_INDEX_ENABLED and not spatial_index.loaded:
+        ids, bounds = await db.run_async(session, db.get_polygon_bounds)
+        spatial_index.build(ids, bounds)
+        tile_cache.invalidate(ids, bounds)
+        log.info("Spatial index built: %s polygons", len(spatial_index))
+        return
+    # Sans index en mémoire, le cache de tuiles suit seul les nouveaux polygones
+    after_id = spatial_index.max_id if SPATIAL_INDEX_ENABLED else tile_cache.max_id
+    ids, bounds = await db.run_async(session, db.get_polygon_bounds, after_id=after_id)
+    if SPATIAL_INDEX_ENABLED:
+        spatial_index.add(ids, bounds)
+    tile_cache.invalidate(ids, bounds)
+    # IDs réutilisés après une réinitialisation de la base : rien d'ancien ne doit être servi
+    geometry_cache.invalidate(ids)
+
+async def _warm_up_spatial_index():
+    async with db.AsyncSessionLocal() as session:
+        await _refresh_spatial_index(session)
+
+def _warm_up_steps():
+    steps = [("db_pool", db.warm_up_async), ("spatial_index", _warm_up_spatial_index)]
+    if WARM_UP_RENDERER:
+        steps.append(("render_workers", render_pool.warm_up))
+    return steps
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db.connect()
+    job_queue.start()
+    # Pool pré-ouvert, index spatial construit et matplotlib chargé en tâche de fond : le worker
+    # accepte les requêtes tout de suite, /ready indique la fin du préchauffage
+    warm_up.start(_warm_up_steps() if WARM_UP_ENABLED else [])
+    yield
+    # Arrêt du préchauffage, des tâches de fond et des workers de rendu, fermeture des connexions des pools
+    await warm_up.stop()
+    await job_queue.stop()
+    render_pool.shutdown()
+    await db.close_async()
+    db.close()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
-    allow_methods=["GET", "POST"],
+    allow_methods=["GET", "POST", "DELETE"],
     allow_headers=["*"], 
 )
-db = Database(CONF_DIR)
+app.add_middleware(MetricsMiddleware, registry=metrics_registry, slow_seconds=SLOW_REQUEST_MS / 1000)
+
+def _caches():
+    return (("render", render_cache), ("tiles", tile_cache), ("geometry", geometry_cache))
+
+# Jauges lues au moment du scrape de /metrics
+metrics_registry.gauge(
+    "db_pool_connections", "Database connections per engine pool and state.", ("engine", "state"),
+    lambda: {(engine, state): value for engine, pool in db.pool_stats().items() for state, value in pool.items()})
+metrics_registry.gauge(
+    "render_pool_renders", "Renders running and waiting for a worker.", ("state",),
+    lambda: {(state,): render_pool.stats()[state] for state in ("running", "queued")})
+metrics_registry.gauge(
+    "background_jobs", "Background jobs of this process waiting and running.", ("state",),
+    lambda: {(state,): job_queue.stats()[state] for state in ("running", "queued")})
+metrics_registry.gauge(
+    "cache_entries", "Entries held in memory by each cache.", ("cache",),
+    lambda: {(name,): cache.stats()["entries"] for name, cache in _caches()})
+metrics_registry.gauge(
+    "cache_bytes", "Bytes held in memory by each cache.", ("cache",),
+    lambda: {(name,): cache.stats()["bytes"] for name, cache in _caches()})
+metrics_registry.gauge(
+    "app_ready", "1 once the startup warm-up is done.", (), lambda: {(): float(warm_up.ready)})
+metrics_registry.gauge(
+    "app_warm_up_seconds", "Duration of each startup warm-up step.", ("step",),
+    lambda: {(step,): seconds for step, seconds in warm_up.steps.items()})
+metrics_registry.gauge(
+    "cache_hit_ratio", "Hit ratio of each cache since startup.", ("cache",),
+    lambda: {(name,): cache.stats()["hit_ratio"] for name, cache in _caches()})
+
+async def _cached_render(cache_key: str, fmt: str, if_none_match: Optional[str]) -> Optional[Response]:
+    """Return the 304 or the cached image for a render cache key, None if it must be rendered."""
+    headers = {"ETag": f'"{cache_key}"', "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    img = await render_cache.get_async(cache_key)
+    if img is not None:
+        return Response(content=img, media_type=MEDIA_TYPES[fmt], headers=headers)
+    return None
 
 @app.get("/polygon/{id}")
-async def get_polygon(id: int):
-    """ Endpoint retourner l'image du polygone """
+async def get_polygon(id: int,
+                      fmt: Literal["png", "svg"] = Query("png", alias="format"),
+                      engine: Literal["matplotlib", "fast"] = "matplotlib",
+                      lod: Optional[int] = Query(None, ge=0),
+                      max_vertices: Optional[int] = Query(None, ge=3),
+                      if_none_match: Optional[str] = Header(None),
+                      session: AsyncSession = Depends(get_session)):
+    """
+    Endpoint retourner l'image du polygone (PNG ou SVG, moteur matplotlib ou rapide).
+    Sans lod ni max_vertices, le niveau de détail le plus simple exact au demi-pixel près est dessiné.
+    """
     try:
-        log.info(f"Get polygon with ID {id}")
+        log.info("Get polygon with ID %s", id)
 
-        # Récupérer les points associés au polygone
-        polygons_points = db.get_points(id=id)  
-        if not polygons_points:  
-            log.error(f"No polygon found for ID {id} in DB")
+        # Métriques stockées (aire, emprise, empreinte) : une ligne de la table polygons
+        with stage("db_fetch"):
+            metrics = await db.run_async(session, db.get_polygon_metrics, id)
+        if metrics is None:
+            log.error("No polygon found for ID %s in DB", id)
             raise HTTPException(status_code=400, detail="No polygon found in DB")
 
-        # Extraire les coordonnées X et Y
-        x_values = [point.x for point in polygons_points]
-        y_values = [point.y for point in polygons_points]
+        # Clé de cache : ID + empreinte des points + options de rendu, réutilisée comme ETag.
+        # Avec l'empreinte stockée, un 304 ou un hit du cache ne charge pas les points.
+        if metrics["fingerprint"]:
+            cache_key = RenderCache.make_fingerprint_key(id, metrics["fingerprint"], format=fmt, engine=engine,
+                                                         lod=lod, max_vertices=max_vertices)
+            cached = await _cached_render(cache_key, fmt, if_none_match)
+            if cached is not None:
+                return cached
 
-        if not x_values or not y_values:  # Vérification de sécurité
-            raise HTTPException(status_code=400, detail="Invalid polygon data")
+        # Aire et emprise reprises des métriques stockées (toujours celles de la pleine résolution)
+        area = metrics["area"]
+        bbox = (metrics["min_x"], metrics["min_y"], metrics["max_x"], metrics["max_y"])
 
-        # Calcul de l'aire du polygone
-        area = shapely.Polygon([(p.x, p.y) for p in polygons_points]).area
+        # Niveau de détail à dessiner : par défaut le plus simple qui reste exact au demi-pixel
+        with stage("db_fetch"):
+            level = await _choose_level(session, metrics, lod, max_vertices, pixel_tolerance(bbox))
+            # Récupérer les coordonnées X et Y du polygone (tableaux NumPy, sans objet par point)
+            x_values, y_values = await _get_lod_columns(session, id, level)
+        if not len(x_values):
+            log.error("No polygon found for ID %s in DB", id)
+            raise HTTPException(status_code=400, detail="No polygon found in DB")
 
-        # Configuration de l'affichage
-        plt.clf()
-        plt.ioff()
-        plt.xlim(min(x_values) - 1, max(x_values) + 1)
-        plt.ylim(min(y_values) - 1, max(y_values) + 1)
+        if not metrics["fingerprint"]:
+            cache_key = RenderCache.make_key(id, x_values, y_values, format=fmt, engine=engine,
+                                             lod=lod, max_vertices=max_vertices)
+            cached = await _cached_render(cache_key, fmt, if_none_match)
+            if cached is not None:
+                return cached
+        headers = {"ETag": f'"{cache_key}"', "Cache-Control": "no-cache"}
 
-        # Ajout du polygone avec une couleur fixe
-        polygon = Polygon([(p.x, p.y) for p in polygons_points], closed=True, fill=False, 
-                          edgecolor="blue", linewidth=2, label=f"Polygon {id}, Area = {area:.2f} px²")
-        plt.gca().add_patch(polygon)
-        plt.legend(loc="upper right")
+        # Rendu lourd : en tâche de fond (réponse 202), l'image rejoint le cache de rendu
+        # et la requête suivante la reçoit directement
+        if RENDER_JOB_THRESHOLD and len(x_values) > RENDER_JOB_THRESHOLD:
+            return _accepted(_submit_render_job(cache_key, fmt, id, x_values, y_values, area, fmt, engine, bbox))
 
-        # Sauvegarde de l'image en mémoire
-        img_bytes = io.BytesIO()
-        plt.savefig(img_bytes, format='png')
-        img_bytes.seek(0)
+        # Rendu dans le pool de workers, sans bloquer la boucle d'événements
+        # (étapes render_queue et render mesurées par le pool)
+        img = await render_pool.submit(render_polygon, id, x_values, y_values, area, fmt, engine, bbox)
+        await render_cache.put_async(cache_key, img)
 
-        return StreamingResponse(img_bytes, media_type="image/png")
+        return Response(content=img, media_type=MEDIA_TYPES[fmt], headers=headers)
 
     except HTTPException as http_exc:
-        log.error(f"HTTPException {http_exc.status_code}: {http_exc.detail}")
+        log.error("HTTPException %s: %s", http_exc.status_code, http_exc.detail)
         raise http_exc
 
+    except RenderQueueFull as queue_exc:
+        log.warning("Render queue full: %s", queue_exc)
+        raise HTTPException(status_code=503, detail="Render queue is full, retry later.",
+                            headers={"Retry-After": str(render_pool.retry_after)})
+
+    except JobQueueFull as queue_exc:
+        log.warning("Job queue full: %s", queue_exc)
+        raise HTTPException(status_code=503, detail="Job queue is full, retry later.",
+                            headers={"Retry-After": str(job_queue.retry_after)})
+
     except Exception as exc:
-        log.error(f"Unexpected error: {exc}")
+        log.error("Unexpected error: %s", exc)
         raise HTTPException(status_code=500, detail="An error occurred while generating the polygon.")
 
-@app.post("/upload")
-async def upload_csv(csv_file: UploadFile):
-    """Endpoint pour uploader un fichier CSV contenant des points et créer un polygone."""
+# Tâches de rendu en attente ou en cours par clé de cache : une seule tâche par image
+_render_jobs: Dict[str, Job] = {}
+
+def _submit_render_job(cache_key: str, fmt: str, *args) -> Job:
+    """Queue the render of a polygon (arguments of render_polygon), or return the job already rendering it."""
+    job = _render_jobs.get(cache_key)
+    if job is not None and not job.finished:
+        return job
+
+    async def run():
+        try:
+            img = await render_pool.submit(render_polygon, *args)
+        except RenderQueueFull as queue_exc:
+            raise HTTPException(status_code=503, detail=f"Render queue is full: {queue_exc}")
+        finally:
+            _render_jobs.pop(cache_key, None)
+        await render_cache.put_async(cache_key, img)
+        return img, MEDIA_TYPES[fmt]
+
+    job = job_queue.submit("render", run)
+    _render_jobs[cache_key] = job
+    return job
+
+def _accepted(job: Job) -> JSONResponse:
+    """202 response of a request handed to the job queue: status of the job, to poll at /jobs/{id}."""
+    return JSONResponse(status_code=202, content=job.to_dict(), headers={"Location": f"/jobs/{job.id}"})
+
+async def _get_lod_columns(session: AsyncSession, id: int, level: int):
+    """Coordinates of a level of detail of a polygon, through the geometry cache."""
+    return await geometry_cache.load(id, level, lambda: db.run_async(session, db.get_lod_columns, id, level))
+
+async def _choose_level(session: AsyncSession, metrics: dict, lod: Optional[int], max_vertices: Optional[int],
+                        max_tolerance: Optional[float] = None) -> int:
+    """Pick the level of detail of a polygon to read (0: full resolution), see geometry.choose_lod."""
+    if not metrics["vertex_count"] or metrics["vertex_count"] < db.lod_min_vertices:
+        return 0  # Petit polygone : aucun niveau stocké
+    levels = await db.run_async(session, db.get_lod_levels, metrics["id"])
+    return choose_lod([(0, 0.0, metrics["vertex_count"])] + levels, lod, max_vertices, max_tolerance)
+
+@app.get("/polygon/{id}/points")
+async def get_polygon_points(id: int,
+                             lod: Optional[int] = Query(None, ge=0),
+                             max_vertices: Optional[int] = Query(None, ge=3),
+                             limit: Optional[int] = Query(None, ge=1, le=MAX_POINTS_PAGE_SIZE),
+                             after: int = Query(0, ge=0),
+                             session: AsyncSession = Depends(get_session)):
+    """
+    Endpoint retournant les sommets du polygone, en pleine résolution (avec commentaires) ou simplifiés.
+    Avec `limit`, les points en pleine résolution par pages triées par ID de point (`after=next_after`).
+    """
+    log.info("Get points of polygon with ID %s", id)
+    metrics = await db.run_async(session, db.get_polygon_metrics, id)
+    if metrics is None:
+        log.error("No polygon found for ID %s in DB", id)
+        raise HTTPException(status_code=400, detail="No polygon found in DB")
+    if limit is not None:
+        if lod or max_vertices is not None:
+            raise HTTPException(status_code=400, detail="Pages of points are at full resolution only.")
+        points = await db.run_async(session, db.get_points_page, id, after, limit)
+        return {"id": id, "lod": 0, "vertex_count": metrics["vertex_count"], **_page(points, limit, "points")}
+    level = await _choose_level(session, metrics, lod, max_vertices)
+    x_values, y_values = await _get_lod_columns(session, id, level)
+    if level == 0:
+        comments = await db.run_async(session, db.get_comments, id)
+        points = [{"x": x, "y": y, "comment": comment}
+                  for x, y, comment in zip(x_values.tolist(), y_values.tolist(), comments)]
+    else:
+        # Les sommets simplifiés ne correspondent pas un à un aux points : pas de commentaires
+        points = [{"x": x, "y": y} for x, y in zip(x_values.tolist(), y_values.tolist())]
+    return {"id": id, "lod": level, "vertex_count": len(points), "points": points}
+
+@app.delete("/polygon/{id}")
+async def delete_polygon(id: int, session: AsyncSession = Depends(get_session)):
+    """ Endpoint supprimant un polygone avec ses points ; ses géométries en cache et les tuiles qu'il couvre sont retirées """
+    log.info("Delete polygon with ID %s", id)
     try:
-        log.info(f"Uploading {csv_file.filename}...")      
+        metrics = await db.run_async(session, db.get_polygon_metrics, id)
+        if metrics is None or not await db.run_async(session, db.delete_polygon, id):
+            log.error("No polygon found for ID %s in DB", id)
+            raise HTTPException(status_code=400, detail="No polygon found in DB")
+    except SQLAlchemyError as db_exc:
+        log.error("Database error: %s", db_exc)
+        raise HTTPException(status_code=500, detail="Database error.")
+    geometry_cache.invalidate([id])
+    tile_cache.invalidate([id], [metrics["min_x"], metrics["min_y"], metrics["max_x"], metrics["max_y"]])
+    return {"message": "Polygon deleted", "id": id}
 
-        # Vérification du format du fichier (doit être un CSV)
-        if not csv_file.filename.endswith(".csv"):
-            log.error("The file is not in CSV format")
-            raise HTTPException(status_code=400, detail="The file is not in CSV format")
+@app.get("/polygon/{id}/metrics")
+async def get_polygon_metrics(id: int, session: AsyncSession = Depends(get_session)):
+    """ Endpoint retournant les métriques stockées du polygone (aire, périmètre, emprise, centroïde, validité) """
+    log.info("Get metrics of polygon with ID %s", id)
+    metrics = await db.run_async(session, db.get_polygon_metrics, id)
+    if metrics is None:
+        log.error("No polygon found for ID %s in DB", id)
+        raise HTTPException(status_code=400, detail="No polygon found in DB")
+    return {"id": metrics["id"], **_metrics_response(metrics)}
 
-        # Lecture et décodage du fichier en UTF-8
-        content = await csv_file.read()
-        content_str = content.decode('utf-8')
-        string_io = io.StringIO(content_str)
+def _metrics_response(metrics: dict) -> dict:
+    return {
+        "area": metrics["area"],
+        "perimeter": metrics["perimeter"],
+        "bbox": [metrics["min_x"], metrics["min_y"], metrics["max_x"], metrics["max_y"]],
+        "centroid": [metrics["centroid_x"], metrics["centroid_y"]],
+        "vertex_count": metrics["vertex_count"],
+        "is_valid": metrics["is_valid"],
+    }
 
+@app.post("/polygons/metrics")
+async def compute_polygons_metrics(query: MetricsQuery, session: AsyncSession = Depends(get_session)):
+    """
+    Endpoint retournant les métriques de nombreux polygones en un appel, dans l'ordre de la requête :
+    polygones stockés par ID (`ids`, métriques lues en une requête) ou polygones bruts (`polygons`,
+    calculées en une passe vectorisée sur un buffer de coordonnées concaténées).
+    """
+    if (query.ids is None) == (query.polygons is None):
+        raise HTTPException(status_code=400, detail="Give either ids or polygons.")
+    count = len(query.ids if query.ids is not None else query.polygons)
+    if count > MAX_METRICS_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_METRICS_BATCH_SIZE} polygons per call.")
+    log.info("Metrics of %s polygons", count)
+    if query.ids is not None:
         try:
-            # Lecture des données CSV en utilisant NumPy
-            data = np.genfromtxt(string_io, delimiter=',', dtype=None, names=True, encoding='utf-8')
+            with stage("db_fetch"):
+                stored = await db.run_async(session, db.get_polygons_metrics, query.ids)
+        except SQLAlchemyError as db_exc:
+            log.error("Database error: %s", db_exc)
+            raise HTTPException(status_code=500, detail="Database error.")
+        return {"polygons": [{"id": i, **_metrics_response(stored[i])} if i in stored
+                             else {"id": i, "error": "No polygon found in DB"} for i in query.ids]}
 
-            # Création des objets `Point` à partir des données CSV
-            points = [
-                Point(x=float(x), y=float(y), comment=comment)
-                for x, y, comment in zip(data['x'], data['y'], data['comment'])
-            ]
+    errors = [polygon_error(len(polygon.points)) for polygon in query.polygons]
+    valid = [polygon for polygon, error in zip(query.polygons, errors) if error is None]
+    with stage("compute"):
+        records = iter(metric_records(polygons_metrics(*pack_polygons(
+            [([p.x for p in polygon.points], [p.y for p in polygon.points]) for polygon in valid]))))
+    return {"polygons": [{"error": error} if error else _metrics_response(next(records)) for error in errors]}
 
-            # Vérification que le polygone contient au moins 3 points
-            if len(points) < 3:
-                raise HTTPException(status_code=400, detail="A polygon must have at least 3 points.")
+@app.get("/metrics")
+async def get_metrics():
+    """ Endpoint Prometheus : requêtes et latences par route, durée des étapes, pools et caches """
+    return Response(content=metrics_registry.expose(), media_type=CONTENT_TYPE)
 
-            # Insertion du polygone dans la base de données et récupération de son ID
-            id_polygon = db.insert_polygon(points)
+@app.get("/ready")
+async def get_ready():
+    """ Sonde de disponibilité : 503 pendant le préchauffage, 200 ensuite, avec la durée de chaque étape """
+    return JSONResponse(status_code=200 if warm_up.ready else 503, content=warm_up.status())
 
-            log.info(f"{csv_file.filename} uploaded successfully!") 
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """ Endpoint retournant les compteurs du cache de rendu (hits, misses, taille) """
+    return render_cache.stats()
 
-        except ValueError:
-            # Gestion d'une erreur due à un format CSV mal structuré
-            log.error("ValueError: CSV is malformed")
-            raise HTTPException(status_code=400, detail="CSV is malformed.")
+@app.get("/cache/geometry/stats")
+async def get_geometry_cache_stats():
+    """ Endpoint retournant les compteurs du cache de géométries (hits, lectures en base, mémoire utilisée) """
+    return geometry_cache.stats()
 
-        # Retourner une réponse avec l'ID du polygone inséré et la liste des points
-        return {
-            "message": "CSV uploaded successfully",
-            "id": id_polygon,
-            "points": [{"x": p.x, "y": p.y, "comment": p.comment} for p in points]
-        }
+@app.post("/upload")
+async def upload_csv(csv_file: UploadFile, session: AsyncSession = Depends(get_session)):
+    """
+    Endpoint pour uploader un fichier contenant les points d'un polygone et créer ce polygone.
+    Format selon l'extension du fichier : CSV (x,y,comment), WKB, GeoJSON, Arrow IPC ou Parquet,
+    éventuellement compressé en gzip (.gz) ou zstd (.zst), ex. polygon.wkb.zst.
+    Au-delà de UPLOAD_JOB_THRESHOLD octets, le fichier est traité en tâche de fond (réponse 202).
+    """
+    try:
+        log.info("Uploading %s...", csv_file.filename)      
+
+        # Vérification du format du fichier
+        if upload_format(csv_file.filename or "")[0] is None:
+            log.error("The file is not in a supported format")
+            raise HTTPException(status_code=400,
+                                detail="The file is not in a supported format (CSV, WKB, GeoJSON, Arrow, Parquet)")
+
+        if UPLOAD_JOB_THRESHOLD and (csv_file.size or 0) > UPLOAD_JOB_THRESHOLD:
+            return _accepted(await _submit_upload_job("upload", csv_file, _ingest_csv))
+        return await _ingest_csv(csv_file, session)
 
     except HTTPException as http_exc:
         # Gestion des erreurs HTTP spécifiques
-        log.error(f"HTTPException {http_exc.status_code}: {http_exc.detail}")
+        log.error("HTTPException %s: %s", http_exc.status_code, http_exc.detail)
         raise http_exc
 
+    except JobQueueFull as queue_exc:
+        log.warning("Job queue full: %s", queue_exc)
+        raise HTTPException(status_code=503, detail="Job queue is full, retry later.",
+                            headers={"Retry-After": str(job_queue.retry_after)})
+
     except SQLAlchemyError as db_exc:
         # Gestion des erreurs liées à la base de données
-        log.error(f"Database error: {str(db_exc)}")
+        log.error("Database error: %s", db_exc)
         raise HTTPException(status_code=500, detail=f"Database error: {str(db_exc)}")
 
     except Exception as exc:
         # Gestion des erreurs générales
-        log.error(f"Unhandled exception: {str(exc)}")
-        raise HTTPException(status_code=500, detail=f"Error processing the CSV file: {str(exc)}")
\ No newline at end of file
+        log.error("Unhandled exception: %s", exc)
+        raise HTTPException(status_code=500, detail=f"Error processing the CSV file: {str(exc)}")
+
+async def _ingest_csv(csv_file: UploadFile, session: AsyncSession, in_thread: bool = False) -> dict:
+    """
+    Insert the polygon of an upload (format from its file name, see upload_format) and return the response of /upload.
+    With in_thread (background jobs), the file is read and parsed in a worker thread (ingest.iter_in_thread).
+    """
+    fmt, compression = upload_format(csv_file.filename)
+    upload = decompressed(csv_file, compression, UPLOAD_MAX_FILE_BYTES)
+    if fmt == "csv":
+        # Lecture du CSV par morceaux : les points sont insérés par lots au fil de la lecture,
+        # seul l'écho de la réponse (borné par UPLOAD_ECHO_MAX_POINTS) est gardé en mémoire
+        batches = iter_csv_point_batches(upload, UPLOAD_INSERT_BATCH_SIZE, UPLOAD_MAX_POINTS, UPLOAD_MAX_LINE_LENGTH)
+    else:
+        # Formats binaires et GeoJSON : décodés d'un bloc en tableaux de coordonnées
+        batches = iter_polygon_batches(upload, fmt, UPLOAD_INSERT_BATCH_SIZE, UPLOAD_MAX_POINTS, UPLOAD_MAX_FILE_BYTES)
+    if in_thread:
+        batches = iter_in_thread(batches)
+    try:
+        echo = []
+        async with db.async_polygon_writer(session) as writer:
+            # Étapes read, decode et parse mesurées par le lecteur du format
+            async for batch in batches:
+                with stage("insert"):
+                    await writer.write(batch.x, batch.y, batch.comments)
+                if echo is not None and writer.point_count <= UPLOAD_ECHO_MAX_POINTS:
+                    echo.extend({"x": x, "y": y, "comment": comment}
+                                for x, y, comment in zip(batch.x, batch.y, batch.comments))
+                else:
+                    echo = None
+
+            # Vérification que le polygone contient au moins 3 points
+            error = polygon_error(writer.point_count)
+            if error:
+                raise HTTPException(status_code=400, detail=error)
+
+            # Validation de la transaction et récupération de l'ID du polygone
+            # (empreinte, recherche de doublon, métriques et niveaux de détail)
+            with stage("dedup_check"):
+                id_polygon = await writer.commit()
+            point_count = writer.point_count
+        with stage("spatial_index"):
+            await _refresh_spatial_index(session)
+
+        log.info("%s uploaded successfully!", csv_file.filename) 
+
+    except ValueError as exc:
+        # Gestion d'une erreur due à un fichier mal structuré
+        log.error("ValueError: %s is malformed: %s", FORMAT_NAMES[fmt], exc)
+        raise HTTPException(status_code=400, detail=f"{FORMAT_NAMES[fmt]} is malformed.")
+
+    except (TooManyPoints, FileTooLarge) as too_large:
+        log.error("%s: %s", type(too_large).__name__, too_large)
+        raise HTTPException(status_code=413, detail=str(too_large))
+
+    # Retourner une réponse avec l'ID du polygone inséré et la liste des points
+    # (la liste est omise au-delà de UPLOAD_ECHO_MAX_POINTS points)
+    response = {
+        "message": f"{FORMAT_NAMES[fmt]} uploaded successfully",
+        "id": id_polygon,
+        "point_count": point_count,
+    }
+    if echo is not None:
+        response["points"] = echo
+    return response
+
+async def _submit_upload_job(kind: str, upload: UploadFile,
+                             ingest: Callable[..., Awaitable[dict]]) -> Job:
+    """
+    Queue the ingestion of an upload, with its own session, parsed off the event loop
+    (in_thread). The file is first copied to a temporary file: the one of the request is
+    closed when the 202 response is sent.
+    """
+    spool = tempfile.TemporaryFile()
+    await upload.seek(0)
+    await asyncio.to_thread(shutil.copyfileobj, upload.file, spool)
+    spool.seek(0)
+    copy = UploadFile(file=spool, filename=upload.filename, size=upload.size)
+
+    async def run():
+        try:
+            async with db.AsyncSessionLocal() as session:
+                response = await ingest(copy, session, in_thread=True)
+            return json.dumps(response).encode(), "application/json"
+        finally:
+            spool.close()
+
+    try:
+        return job_queue.submit(kind, run)
+    except JobQueueFull:
+        spool.close()
+        raise
+
+async def _insert_batch_chunk(session: AsyncSession, chunk, results):
+    """Insert one chunk of polygons in a single transaction and record their IDs (or the error) in results."""
+    polygons = [points for _, points in chunk]
+    try:
+        # Empreintes, métriques et niveaux de détail calculés dans un thread : seules les écritures passent par run_sync
+        prepared = await asyncio.to_thread(db.prepare_polygons, polygons)
+        ids = await db.run_async(session, db.insert_polygons, polygons, prepared=prepared)
+        for (index, _), id_polygon in zip(chunk, ids):
+            results[index]["id"] = id_polygon
+    except (SQLAlchemyError, ValueError) as db_exc:
+        log.error("Database error while inserting a batch chunk: %s", db_exc)
+        for index, _ in chunk:
+            results[index].pop("id", None)
+            results[index]["error"] = "Database error."
+
+@app.post("/upload/batch")
+async def upload_batch(batch_file: UploadFile, session: AsyncSession = Depends(get_session)):
+    """
+    Endpoint pour uploader plusieurs polygones en une seule requête :
+    CSV avec une colonne polygon_key, ou NDJSON avec un polygone par ligne.
+    Retourne un résumé par polygone (ID ou erreur) sans renvoyer les points.
+    Au-delà de UPLOAD_JOB_THRESHOLD octets, le fichier est traité en tâche de fond (réponse 202).
+    """
+    try:
+        log.info("Uploading batch %s...", batch_file.filename)
+
+        if not (batch_file.filename or "").endswith((".csv", ".ndjson", ".jsonl")):
+            log.error("The file is not in CSV or NDJSON format")
+            raise HTTPException(status_code=400, detail="The file is not in CSV or NDJSON format")
+
+        if UPLOAD_JOB_THRESHOLD and (batch_file.size or 0) > UPLOAD_JOB_THRESHOLD:
+            return _accepted(await _submit_upload_job("upload_batch", batch_file, _ingest_batch))
+        return await _ingest_batch(batch_file, session)
+
+    except HTTPException as http_exc:
+        log.error("HTTPException %s: %s", http_exc.status_code, http_exc.detail)
+        raise http_exc
+
+    except JobQueueFull as queue_exc:
+        log.warning("Job queue full: %s", queue_exc)
+        raise HTTPException(status_code=503, detail="Job queue is full, retry later.",
+                            headers={"Retry-After": str(job_queue.retry_after)})
+
+    except Exception as exc:
+        log.error("Unhandled exception: %s", exc)
+        raise HTTPException(status_code=500, detail=f"Error processing the batch file: {str(exc)}")
+
+async def _ingest_batch(batch_file: UploadFile, session: AsyncSession, in_thread: bool = False) -> dict:
+    """
+    Insert the polygons of a CSV or NDJSON batch upload and return the response of /upload/batch.
+    With in_thread (background jobs), the file is read and parsed in a worker thread (ingest.iter_in_thread).
+    """
+    fmt = "CSV" if batch_file.filename.endswith(".csv") else "NDJSON"
+    if fmt == "CSV":
+        items = iter_batch_csv(batch_file, UPLOAD_MAX_LINE_LENGTH)
+    else:
+        items = iter_batch_ndjson(batch_file, UPLOAD_MAX_FILE_BYTES)
+    if in_thread:
+        items = iter_in_thread(items)
+    results = []
+    chunk = []  # (position dans results, points) des polygones en attente d'insertion
+    try:
+        async for key, points, error in items:
+            error = error or polygon_error(len(points))
+            if error:
+                results.append({"polygon_key": key, "error": error})
+                continue
+            results.append({"polygon_key": key, "id": None})
+            chunk.append((len(results) - 1, points))
+            if len(chunk) >= BATCH_CHUNK_SIZE:
+                await _insert_batch_chunk(session, chunk, results)
+                chunk = []
+        if chunk:
+            await _insert_batch_chunk(session, chunk, results)
+        await _refresh_spatial_index(session)
+
+    except ValueError:
+        # En-tête absent ou mal formé, ou fichier non UTF-8
+        log.error("ValueError: batch file is malformed (%s)", fmt)
+        raise HTTPException(status_code=400, detail=f"{fmt} is malformed.")
+
+    failed = sum(1 for r in results if "error" in r)
+    log.info("%s uploaded: %s polygons, %s errors", batch_file.filename, len(results) - failed, failed)
+    return {
+        "message": "Batch uploaded",
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "polygons": results,
+    }
+
+@app.get("/jobs/{id}")
+async def get_job(id: str):
+    """ Endpoint retournant l'état d'une tâche de fond (queued, running, done, failed) """
+    job = await job_queue.get(id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No job found")
+    return job.to_dict()
+
+@app.get("/jobs/{id}/result")
+async def get_job_result(id: str):
+    """
+    Endpoint retournant le résultat d'une tâche terminée, tel que l'aurait renvoyé la requête
+    synchrone (JSON d'un upload, image d'un rendu), ou son erreur avec le même code HTTP.
+    """
+    job = await job_queue.get(id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No job found")
+    if job.status == "failed":
+        raise HTTPException(status_code=job.status_code, detail=job.error)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}, poll /jobs/{id}")
+    return Response(content=job.result, media_type=job.media_type)
+
+async def _paginate(candidates: np.ndarray, after: int, limit: int,
+                    fetch: Callable[[np.ndarray], Awaitable[List[dict]]]) -> dict:
+    """
+    Walk the sorted candidate IDs of the spatial index after `after`, by chunks of `limit`,
+    keeping what fetch confirms against the database, until a page of `limit` polygons is full.
+    """
+    candidates = candidates[np.searchsorted(candidates, after, side="right"):]
+    found = []
+    for start in range(0, len(candidates), limit):
+        found.extend(await fetch(candidates[start:start + limit]))
+        if len(found) >= limit:
+            break
+    return _page(found[:limit], limit)
+
+def _page(items: List[dict], limit: int, name: str = "polygons") -> dict:
+    # next_after : curseur de la page suivante (None en fin de résultats)
+    return {name: items, "next_after": items[-1]["id"] if len(items) == limit else None}
+
+@app.get("/polygons")
+async def find_polygons(bbox: Optional[str] = None,
+                        limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+                        after: int = Query(0, ge=0),
+                        session: AsyncSession = Depends(get_session)):
+    """
+    Endpoint retournant les polygones dont l'emprise intersecte bbox=min_x,min_y,max_x,max_y
+    (tous les polygones, avec aire et nombre de sommets, sans bbox), par pages de `limit`
+    triées par ID (passer `after=next_after` pour la page suivante).
+    """
+    try:
+        if bbox is None:
+            return _page(await db.run_async(session, db.list_polygons, after, limit), limit)
+        try:
+            box = parse_bbox(bbox)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=f"Invalid bbox: {exc}")
+        if not SPATIAL_INDEX_ENABLED:
+            return _page(await db.run_async(session, db.find_polygons_in_bbox, box, after, limit), limit)
+        await _refresh_spatial_index(session)
+        return await _paginate(spatial_index.query(box), after, limit,
+                               lambda ids: db.run_async(session, db.find_polygons_in_bbox, box, 0, len(ids), ids=ids))
+    except SQLAlchemyError as db_exc:
+        log.error("Database error: %s", db_exc)
+        raise HTTPException(status_code=500, detail="Database error.")
+
+@app.get("/polygons/export")
+async def export_polygons(fmt: Literal["ndjson", "csv", "arrow", "parquet"] = Query("ndjson", alias="format"),
+                          after: int = Query(0, ge=0),
+                          accept_encoding: Optional[str] = Header(None)):
+    """
+    Endpoint exportant en flux les points de tous les polygones d'ID supérieur à `after`, aux formats
+    de /upload/batch (NDJSON : une ligne par polygone, CSV : une ligne par point avec polygon_key)
+    ou en colonnes polygon_id, x, y, comment (Arrow IPC en flux, Parquet).
+    Les lignes sont lues par un curseur côté serveur, EXPORT_BATCH_SIZE à la fois : mémoire constante,
+    premier octet envoyé dès le premier lot. Compressé en zstd ou gzip si le client l'accepte.
+    """
+    log.info("Export of polygons after ID %s (%s)", after, fmt)
+    encoder = export_encoder(fmt)
+    encoding = content_encoding(fmt, accept_encoding)
+    compressor = Compressor(encoding, EXPORT_COMPRESSION_LEVELS[encoding]) if encoding else None
+
+    def output(*chunks) -> bytes:
+        data = b"".join(chunk.encode() if isinstance(chunk, str) else chunk for chunk in chunks)
+        return compressor.compress(data) if compressor else data
+
+    async def body():
+        # Connexion propre au flux (celle d'une dépendance serait rendue avant l'envoi de la réponse),
+        # sans session ORM : les lignes sont lues près de deux fois plus vite
+        async with db.async_engine.connect() as connection:
+            result = await connection.stream(db.export_points_query(after).execution_options(yield_per=EXPORT_BATCH_SIZE))
+            header = encoder.start()
+            async for rows in result.partitions():
+                yield output(header, encoder.encode(rows))
+                header = b""
+            tail = output(header, encoder.finish()) + (compressor.finish() if compressor else b"")
+            if tail:
+                yield tail
+
+    headers = {"Content-Disposition": f'attachment; filename="polygons.{fmt}"', "Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(body(), media_type=EXPORT_MEDIA_TYPES[fmt], headers=headers)
+
+@app.get("/polygon/{id}/export")
+async def export_polygon(id: int,
+                         fmt: Literal["csv", "wkb", "geojson", "arrow", "parquet"] = Query("csv", alias="format"),
+                         accept_encoding: Optional[str] = Header(None),
+                         session: AsyncSession = Depends(get_session)):
+    """
+    Endpoint exportant un polygone en pleine résolution dans un format de /upload (CSV, WKB, GeoJSON,
+    Arrow IPC, Parquet) : le fichier obtenu peut être réimporté tel quel.
+    Compressé en zstd ou gzip si le client l'accepte.
+    """
+    log.info("Export of polygon with ID %s (%s)", id, fmt)
+    x_values, y_values = await _get_lod_columns(session, id, 0)
+    if not len(x_values):
+        log.error("No polygon found for ID %s in DB", id)
+        raise HTTPException(status_code=400, detail="No polygon found in DB")
+    # WKB : la géométrie seule, sans commentaires
+    comments = await db.run_async(session, db.get_comments, id) if fmt != "wkb" else None
+    encoding = content_encoding(fmt, accept_encoding)
+
+    def encode() -> bytes:
+        data = encode_polygon(fmt, id, x_values, y_values, comments)
+        if encoding:
+            compressor = Compressor(encoding, EXPORT_COMPRESSION_LEVELS[encoding])
+            data = compressor.compress(data) + compressor.finish()
+        return data
+
+    with stage("encode"):
+        content = await asyncio.to_thread(encode)
+    headers = {"Content-Disposition": f'attachment; filename="polygon_{id}.{fmt}"', "Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=content, media_type=POLYGON_MEDIA_TYPES[fmt], headers=headers)
+
+@app.get("/tiles/{z}/{x}/{y}.png")
+async def get_tile(z: int, x: int, y: int,
+                   if_none_match: Optional[str] = Header(None),
+                   session: AsyncSession = Depends(get_session)):
+    """
+    Endpoint retournant une tuile de carte (XYZ, PNG transparent) avec le contour de tous les
+    polygones qui la traversent, simplifiés selon le zoom.
+    """
+    if not tile_cache.grid.is_valid(z, x, y):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    try:
+        # Prise en compte des polygones insérés depuis la dernière requête : leurs tuiles sont invalidées
+        await _refresh_spatial_index(session)
+        key = TileCache.tile_key(z, x, y)
+        generation = tile_cache.generation
+        img = tile_cache.get(key)
+        if img is None:
+            bbox = tile_cache.grid.tile_bbox(z, x, y)
+            ids = spatial_index.query(bbox) if SPATIAL_INDEX_ENABLED else None
+            geometries = []
+            if ids is None or len(ids):
+                geometries = await db.run_async(session, db.get_tile_geometries, bbox,
+                                                tile_cache.grid.pixel_size(z), ids=ids)
+            img = await render_pool.submit(render_tile, geometries, bbox, tile_cache.grid.tile_size)
+            tile_cache.put_if_current(key, img, generation)
+    except SQLAlchemyError as db_exc:
+        log.error("Database error: %s", db_exc)
+        raise HTTPException(status_code=500, detail="Database error.")
+    except RenderQueueFull as queue_exc:
+        log.warning("Render queue full: %s", queue_exc)
+        raise HTTPException(status_code=503, detail="Render queue is full, retry later.",
+                            headers={"Retry-After": str(render_pool.retry_after)})
+    # ETag : contenu de la tuile (elle change quand un polygone est inséré dans son emprise)
+    headers = {"ETag": f'"{hashlib.sha256(img).hexdigest()[:32]}"', "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=img, media_type=MEDIA_TYPES["png"], headers=headers)
+
+@app.get("/tiles/grid")
+async def get_tile_grid():
+    """ Endpoint retournant la grille des tuiles (emprise du monde, taille des tuiles, zoom max) pour la carte """
+    grid = tile_cache.grid
+    return {"world": list(grid.world), "tile_size": grid.tile_size, "max_zoom": grid.max_zoom}
+
+@app.get("/tiles/stats")
+async def get_tile_stats():
+    """ Endpoint retournant les compteurs du cache de tuiles (hits, misses, invalidations) """
+    return tile_cache.stats()
+
+@app.post("/polygons/intersects")
+async def find_intersecting_polygons(query: PolygonQuery,
+                                     limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+                                     after: int = Query(0, ge=0),
+                                     session: AsyncSession = Depends(get_session)):
+    """
+    Endpoint retournant les polygones qui intersectent le polygone donné (liste de points),
+    par pages de `limit` triées par ID. L'emprise filtre les candidats, le test exact est fait par shapely.
+    """
+    error = polygon_error(len(query.points))
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    shape = shapely.Polygon([(p.x, p.y) for p in query.points])
+    if not shape.is_valid:
+        shape = shapely.make_valid(shape)
+    shapely.prepare(shape)
+    box = shape.bounds
+
+    async def fetch(ids):
+        candidates = await db.run_async(session, db.find_polygons_in_bbox, box, 0, len(ids), ids=ids)
+        coordinates = await geometry_cache.load_many(
+            [c["id"] for c in candidates], lambda missing: db.run_async(session, db.get_polygons_coordinates, missing))
+        # Candidats construits en une fois à partir d'un buffer de coordonnées concaténées
+        geometries = shapely_polygons(*pack_polygons([coordinates[c["id"]] for c in candidates]))
+        hits = shapely.intersects(geometries, shape)
+        return [candidate for candidate, hit in zip(candidates, hits) if hit]
+
+    try:
+        if not SPATIAL_INDEX_ENABLED:
+            # Sans index en mémoire, les candidats sont les IDs de l'index GiST de la base
+            page = []
+            while len(page) < limit:
+                ids = [c["id"] for c in await db.run_async(session, db.find_polygons_in_bbox, box, after, limit)]
+                if not ids:
+                    break
+                page.extend(await fetch(np.array(ids)))
+                after = ids[-1]
+            return _page(page[:limit], limit)
+        await _refresh_spatial_index(session)
+        return await _paginate(spatial_index.query(box), after, limit, fetch)
+    except SQLAlchemyError as db_exc:
+        log.error("Database error: %s", db_exc)
+        raise HTTPException(status_code=500, detail="Database error.")
@@ -0,0 +1,90 @@
+"""
+Size and throughput of the polygon exchange formats of /upload and GET /polygon/{id}/export.
+
+Usage (depuis le dossier backend) :
+    python benchmark/bench_formats.py [--sizes 10000,100000,1000000] [--repeat 3]
+
+For one polygon of each size (vertices on a noisy circle, with a comment every tenth vertex), and
+for each format (csv, wkb, geojson, arrow, parquet) without compression, then gzip and zstd:
+    size        bytes of the file
+    encode      export.encode_polygon (+ Compressor)
+    decode      what /upload does with the file: decompression, then iter_csv_point_batches for
+                CSV, ingest.read_polygon for the others (no database)
+Throughput is given in millions of points per second of decoding.
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi import UploadFile  # noqa: E402
+from export import Compressor, encode_polygon  # noqa: E402
+from ingest import decompressed, iter_csv_point_batches, read_polygon  # noqa: E402
+
+FORMATS = ("csv", "wkb", "geojson", "arrow", "parquet")
+ENCODINGS = (None, "gzip", "zstd")
+
+
+def noisy_circle(vertices: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    radius = 1000 + rng.normal(0, 1, vertices)
+    comments = [f"pt {i}" if i % 10 == 0 else "" for i in range(vertices)]
+    return radius * np.cos(angles), radius * np.sin(angles), comments
+
+
+def encode(fmt, encoding, x_values, y_values, comments) -> bytes:
+    data = encode_polygon(fmt, 1, x_values, y_values, comments)
+    if encoding:
+        compressor = Compressor(encoding)
+        data = compressor.compress(data) + compressor.finish()
+    return data
+
+
+async def decode(fmt, encoding, data) -> int:
+    upload = decompressed(UploadFile(io.BytesIO(data), filename=f"polygon.{fmt}"), encoding)
+    if fmt == "csv":
+        count = 0
+        async for batch in iter_csv_point_batches(upload, 10000):
+            count += len(batch)
+        return count
+    x_values, _, _ = read_polygon(await upload.read(), fmt)
+    return len(x_values)
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'vertices':>9} {'format':>8} {'encoding':>9} {'size KiB':>10} {'encode ms':>10} "
+          f"{'decode ms':>10} {'Mpts/s':>8}")
+    for vertices in [int(v) for v in args.sizes.split(",")]:
+        x_values, y_values, comments = noisy_circle(vertices)
+        for fmt in FORMATS:
+            for encoding in ENCODINGS:
+                data = encode(fmt, encoding, x_values, y_values, comments)
+                assert asyncio.run(decode(fmt, encoding, data)) == vertices
+                encode_time = best_of(args.repeat, lambda: encode(fmt, encoding, x_values, y_values, comments))
+                decode_time = best_of(args.repeat, lambda: asyncio.run(decode(fmt, encoding, data)))
+                print(f"{vertices:>9} {fmt:>8} {encoding or '-':>9} {len(data) / 1024:>10.0f} "
+                      f"{encode_time * 1000:>10.1f} {decode_time * 1000:>10.1f} "
+                      f"{vertices / decode_time / 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Points/sec of the point insertion strategies of Database, against the database of config.ini.
+
+Usage (depuis le dossier backend) :
+    python benchmark/bench_insert.py [--sizes 1000,100000,1000000]
+
+Strategies compared:
+    orm      one PointORM per point, flushed by the unit of work (the former implementation)
+    values   Core executemany batched into multi-row INSERTs (insertmanyvalues)
+    copy     COPY FROM STDIN through psycopg2
+Every polygon written by the benchmark is rolled back.
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import Database, PointORM, PolygonORM  # noqa: E402
+
+CONF_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "config.ini"))
+
+
+def insert_orm(db, session, polygon_id, xs, ys, comments):
+    session.add_all([PointORM(x=x, y=y, comment=c, polygon_id=polygon_id) for x, y, c in zip(xs, ys, comments)])
+    session.flush()
+
+
+def insert_values(db, session, polygon_id, xs, ys, comments):
+    db.copy_threshold = float("inf")
+    db._insert_point_columns(session, polygon_id, xs, ys, comments)
+
+
+def insert_copy(db, session, polygon_id, xs, ys, comments):
+    db.copy_threshold = 0
+    db._insert_point_columns(session, polygon_id, xs, ys, comments)
+
+
+STRATEGIES = {"orm": insert_orm, "values": insert_values, "copy": insert_copy}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES))
+    args = parser.parse_args()
+
+    db = Database(CONF_DIR)
+    rng = np.random.default_rng(0)
+    print(f"{'points':>9} {'strategy':>9} {'seconds':>9} {'points/s':>12}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        xs, ys = rng.uniform(0, 1e6, size).tolist(), rng.uniform(0, 1e6, size).tolist()
+        comments = [""] * size
+        for name in args.strategies.split(","):
+            session = db.SessionLocal()
+            try:
+                with session.begin():
+                    polygon = PolygonORM()
+                    session.add(polygon)
+                    session.flush()
+                    start = time.perf_counter()
+                    STRATEGIES[name](db, session, polygon.id, xs, ys, comments)
+                    elapsed = time.perf_counter() - start
+                    session.rollback()
+            finally:
+                session.close()
+            print(f"{size:>9} {name:>9} {elapsed:>9.3f} {size / elapsed:>12,.0f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
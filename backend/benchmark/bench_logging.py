@@ -0,0 +1,91 @@
+"""
+Cost of a log call on the calling thread (the event loop in the API), per logging setup.
+
+    legacy    synchronous console + file handlers at DEBUG, f-string messages (before user-015)
+    sync      synchronous handlers, lazy %-style arguments
+    queue     QueueHandler: the calling thread only enqueues, a QueueListener thread writes
+    sampled   queue with sampling: the same message repeated, all but the first ones dropped
+    filtered  a DEBUG call below the logger level: f-string versus lazy arguments
+
+Usage (depuis le dossier backend) :
+    python benchmark/bench_logging.py [--calls 20000] [--threads 8]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from logger_manager import LoggerManager  # noqa: E402
+
+
+def make_logger(name: str, log_file: str, **options) -> LoggerManager:
+    manager = LoggerManager(name=f"bench.{name}", log_file=log_file, **options)
+    # La console du benchmark est redirigée vers /dev/null : seul le coût d'écriture compte
+    for handler in manager.handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.setStream(open(os.devnull, "w"))
+    manager.logger.propagate = False
+    return manager
+
+
+def per_call(fn, calls: int, threads: int):
+    """
+    Mean cost of one call with `threads` threads logging at once, in µs: CPU time of the calling
+    threads (what the event loop pays) and wall time until all calls returned.
+    """
+    cpu = []
+
+    def worker():
+        start = time.thread_time()
+        for i in range(calls):
+            fn(i)
+        cpu.append(time.thread_time() - start)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    wall = time.perf_counter() - start
+    return sum(cpu) / (calls * threads) * 1e6, wall / (calls * threads) * 1e6
+
+
+# Cas mesurés : options du LoggerManager, appel de log
+CASES = {
+    "legacy": ({"level": logging.DEBUG}, lambda log, i: log.info(f"Get polygon with ID {i}")),
+    "sync": ({}, lambda log, i: log.info("Get polygon with ID %s", i)),
+    "queue": ({"use_queue": True}, lambda log, i: log.info("Get polygon with ID %s", i)),
+    "sampled": ({"use_queue": True, "sample_window": 10, "sample_burst": 20},
+                lambda log, i: log.info("Get polygon with ID %s", i)),
+    "filtered f-string": ({"use_queue": True}, lambda log, i: log.debug(f"Polygon {i} has {i * 3} points")),
+    "filtered lazy": ({"use_queue": True}, lambda log, i: log.debug("Polygon %s has %s points", i, i * 3)),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, (options, call) in CASES.items():
+            for threads in (1, args.threads):
+                # Un logger neuf par mesure, vidé avant la suivante : aucun thread d'écriture en concurrence
+                label = f"{name.replace(' ', '-')}-{threads}"
+                manager = make_logger(label, os.path.join(directory, f"{label}.log"), **options)
+                cpu, wall = per_call(lambda i: call(manager.logger, i), args.calls, threads)
+                start = time.perf_counter()
+                manager.stop()
+                drain = (time.perf_counter() - start) / (args.calls * threads) * 1e6
+                print(f"{name:18s} {threads} thread(s): {cpu:6.2f} µs CPU on the caller, {wall:6.2f} µs wall, "
+                      f"{drain:6.2f} µs left to the writer thread per call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Metrics of many polygons: one polygon at a time versus one vectorised pass.
+
+Usage (depuis le dossier backend) :
+    python benchmark/bench_metrics.py [--counts 100,1000,10000] [--vertices 20] [--repeat 3]
+
+Paths compared, for raw polygons (no database):
+    loop        geometry.polygon_metrics called once per polygon
+    vectorised  geometry.polygons_metrics over the concatenated buffer (pack_polygons)
+and for metrics missing in the database (the backfill / legacy rows path):
+    db loop     Database._save_metrics once per polygon
+    db batch    Database._save_polygons_metrics for all of them
+The polygons written by the benchmark are deleted at the end.
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import delete  # noqa: E402
+from database import Database, PolygonORM  # noqa: E402
+from geometry import pack_polygons, polygon_metrics, polygons_metrics  # noqa: E402
+from model import Point  # noqa: E402
+
+CONF_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "config.ini"))
+
+
+def regular_polygons(count: int, vertices: int):
+    """count regular polygons of `vertices` vertices, side by side (valid and distinct)."""
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    return [(np.cos(angles) + 3 * i, np.sin(angles)) for i in range(count)]
+
+
+def best_of(repeat, fn, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", default="100,1000,10000")
+    parser.add_argument("--vertices", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    db = Database(CONF_DIR)
+    created = []
+    print(f"{'polygons':>9} {'loop ms':>9} {'vectorised ms':>14} {'db loop ms':>11} {'db batch ms':>12}")
+    try:
+        for count in [int(c) for c in args.counts.split(",")]:
+            polygons = regular_polygons(count, args.vertices)
+            loop = best_of(args.repeat, lambda: [polygon_metrics(xs, ys) for xs, ys in polygons])
+            vectorised = best_of(args.repeat, lambda: polygons_metrics(*pack_polygons(polygons)))
+
+            # Polygones décalés en y à chaque taille : jamais de doublon entre deux tailles
+            ids = db.insert_polygons([[Point(x=x, y=y + 10 * count) for x, y in zip(xs, ys)] for xs, ys in polygons])
+            created += ids
+            with db.SessionLocal() as session:
+                db_loop = best_of(args.repeat, lambda: [db._save_metrics(i, session) for i in ids])
+                db_batch = best_of(args.repeat, db._save_polygons_metrics, ids, session)
+                session.rollback()
+            print(f"{count:>9} {loop * 1000:>9.1f} {vectorised * 1000:>14.1f} "
+                  f"{db_loop * 1000:>11.1f} {db_batch * 1000:>12.1f}")
+    finally:
+        with db.SessionLocal() as session:
+            session.execute(delete(PolygonORM).where(PolygonORM.id.in_(created)))
+            session.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Latency of the read paths of one polygon, against the database of config.ini.
+
+Usage (depuis le dossier backend) :
+    python benchmark/bench_read.py [--sizes 1000,100000] [--repeat 5]
+
+Paths compared:
+    objects   Database.get_points: one Point per row, then x/y lists (the former read path)
+    columns   Database.get_point_columns over the points rows (aggregated into one bytea by PostgreSQL)
+    packed    Database.get_point_columns over the polygons.coordinates blob (one row)
+The polygons written by the benchmark are deleted at the end.
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import delete  # noqa: E402
+from database import Database, PolygonORM  # noqa: E402
+from model import Point  # noqa: E402
+
+CONF_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "config.ini"))
+
+
+def read_objects(db, polygon_id):
+    points = db.get_points(id=polygon_id)
+    return [p.x for p in points], [p.y for p in points]
+
+
+def best_of(repeat, fn, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,100000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    db = Database(CONF_DIR)
+    rng = np.random.default_rng(0)
+    created = []
+    print(f"{'points':>9} {'objects ms':>11} {'columns ms':>11} {'packed ms':>10}")
+    try:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            points = [Point(x=x, y=y) for x, y in rng.uniform(0, 1e6, (size, 2)).tolist()]
+            db.pack_coordinates = False
+            unpacked_id = db.insert_polygon(points)
+            db.pack_coordinates = True
+            # Même nombre de points, autre polygone (une autre empreinte)
+            packed_id = db.insert_polygon([Point(x=p.x + 1, y=p.y) for p in points])
+            created += [unpacked_id, packed_id]
+            objects = best_of(args.repeat, read_objects, db, unpacked_id)
+            columns = best_of(args.repeat, db.get_point_columns, unpacked_id)
+            packed = best_of(args.repeat, db.get_point_columns, packed_id)
+            print(f"{size:>9} {objects * 1000:>11.1f} {columns * 1000:>11.1f} {packed * 1000:>10.1f}")
+    finally:
+        with db.SessionLocal() as session:
+            session.execute(delete(PolygonORM).where(PolygonORM.id.in_(created)))
+            session.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Per-image latency of the render engines.
+
+Usage (depuis le dossier backend) :
+    python benchmark/bench_render.py [--repeat 20] [--sizes 10,1000,100000]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from renderer import render_polygon  # noqa: E402
+
+
+def star_polygon(n: int, seed: int = 0):
+    """Random star-shaped polygon with n vertices (never self-intersecting)."""
+    rng = np.random.default_rng(seed)
+    angles = np.sort(rng.uniform(0, 2 * np.pi, n))
+    radius = rng.uniform(50, 100, n)
+    return (radius * np.cos(angles)).tolist(), (radius * np.sin(angles)).tolist()
+
+
+def import_time(module: str) -> float:
+    """Time a cold import of a module in a fresh interpreter."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--sizes", default="10,1000,100000")
+    args = parser.parse_args()
+
+    print(f"cold import  matplotlib.figure: {import_time('matplotlib.figure') * 1000:8.1f} ms")
+    print(f"cold import  PIL.ImageDraw:     {import_time('PIL.ImageDraw') * 1000:8.1f} ms")
+    print()
+    print(f"{'vertices':>9} {'engine':>11} {'format':>6} {'ms/image':>10} {'bytes':>9}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        xs, ys = star_polygon(size)
+        for engine in ("matplotlib", "fast"):
+            for fmt in ("png", "svg"):
+                render_polygon(1, xs, ys, 1.0, fmt, engine)  # échauffement
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    img = render_polygon(1, xs, ys, 1.0, fmt, engine)
+                elapsed = (time.perf_counter() - start) / args.repeat
+                print(f"{size:>9} {engine:>11} {fmt:>6} {elapsed * 1000:>10.2f} {len(img):>9}")
+
+
+if __name__ == "__main__":
+    main()
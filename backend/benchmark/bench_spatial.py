@@ -0,0 +1,57 @@
+"""
+Query latency of the in-process spatial index (STRtree) as the number of polygons grows,
+compared with a full scan of the bounding boxes. No database needed.
+
+Usage (depuis le dossier backend) :
+    python benchmark/bench_spatial.py [--sizes 10000,100000,1000000,3000000] [--queries 200]
+
+Polygons are random boxes of side 0 to 10 in a square whose area grows with their number,
+so that a query window of fixed size returns about the same number of polygons at every
+size: the index latency should stay nearly flat while the full scan grows linearly.
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from spatial_index import SpatialIndex  # noqa: E402
+
+WINDOW = 100.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000,3000000")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'polygons':>10} {'build s':>8} {'index ms':>9} {'scan ms':>9} {'hits':>6}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        extent = np.sqrt(size) * 10
+        lower = rng.uniform(0, extent, (size, 2))
+        bounds = np.hstack((lower, lower + rng.uniform(0, 10, (size, 2))))
+        ids = np.arange(1, size + 1)
+
+        start = time.perf_counter()
+        index = SpatialIndex()
+        index.build(ids, bounds)
+        build = time.perf_counter() - start
+
+        windows = rng.uniform(0, extent - WINDOW, (args.queries, 2))
+        start = time.perf_counter()
+        hits = sum(len(index.query((x, y, x + WINDOW, y + WINDOW))) for x, y in windows)
+        indexed = (time.perf_counter() - start) / args.queries
+
+        start = time.perf_counter()
+        for x, y in windows[:20]:
+            ((bounds[:, 0] <= x + WINDOW) & (bounds[:, 2] >= x)
+             & (bounds[:, 1] <= y + WINDOW) & (bounds[:, 3] >= y)).nonzero()
+        scanned = (time.perf_counter() - start) / 20
+        print(f"{size:>10} {build:>8.2f} {indexed * 1000:>9.3f} {scanned * 1000:>9.3f} {hits / args.queries:>6.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Cold start of the API: import time, time to the first request served, to the end of the
+warm-up (/ready) and latency of the first render after it.
+
+Usage (depuis le dossier backend) :
+    python benchmark/bench_startup.py [--repeat 5] [--engine matplotlib] [--baseline benchmark/results/startup-<date>.json]
+
+Each run starts a fresh uvicorn process on a free port, against the database of config.ini
+(set warm_up = false in [startup] to measure the lazy startup). Results are written to JSON
+(see report.py) and compared with --baseline when given.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import delete  # noqa: E402
+from database import Database, PolygonORM  # noqa: E402
+from micro import star_polygon  # noqa: E402
+from model import Point  # noqa: E402
+from report import add_check_arguments, check, save_results  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONF_DIR = os.path.join(BACKEND_DIR, "config.ini")
+
+
+def import_time() -> float:
+    """Time the import of the application module in a fresh interpreter (interpreter startup excluded)."""
+    code = "import time; start = time.perf_counter(); import app; print(time.perf_counter() - start)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, check=True,
+                            capture_output=True, text=True).stdout
+    return float(output.split()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def server_start(polygon_id: int, engine: str) -> dict:
+    """Start a server; seconds until the first response, until /ready is 200, and of the first render."""
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app:app", "--port", str(port)], cwd=BACKEND_DIR,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    timings = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            while "ready" not in timings:
+                if time.perf_counter() - start > 120:
+                    raise TimeoutError("server not ready after 120 s")
+                try:
+                    status = client.get("/ready").status_code
+                except httpx.TransportError:
+                    time.sleep(0.005)
+                    continue
+                timings.setdefault("first_response", time.perf_counter() - start)
+                if status == 200:
+                    timings["ready"] = time.perf_counter() - start
+                else:
+                    time.sleep(0.005)
+            render_start = time.perf_counter()
+            client.get(f"/polygon/{polygon_id}", params={"engine": engine}).raise_for_status()
+            timings["first_render"] = time.perf_counter() - render_start
+    finally:
+        server.terminate()
+        server.wait()
+    return timings
+
+
+def summary(values) -> dict:
+    values = np.asarray(values) * 1000
+    return {"median_ms": float(np.median(values)), "p95_ms": float(np.percentile(values, 95)), "runs": len(values)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--engine", default="matplotlib", choices=("matplotlib", "fast"))
+    add_check_arguments(parser)
+    args = parser.parse_args()
+
+    db = Database(CONF_DIR)
+    xs, ys = star_polygon(1000)
+    polygon_id = db.insert_polygon([Point(x=x, y=y) for x, y in zip(xs, ys)])
+    try:
+        imports = [import_time() for _ in range(args.repeat)]
+        starts = [server_start(polygon_id, args.engine) for _ in range(args.repeat)]
+    finally:
+        with db.SessionLocal() as session:
+            session.execute(delete(PolygonORM).where(PolygonORM.id == polygon_id))
+            session.commit()
+        db.close()
+
+    results = {"import": summary(imports)}
+    for name in ("first_response", "ready", "first_render"):
+        results[name] = summary([timings[name] for timings in starts])
+    for name, result in results.items():
+        print(f"{name:>15}: median {result['median_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms")
+    path = save_results("startup", {"repeat": args.repeat, "engine": args.engine}, results, args.output)
+    print(f"Results written to {path}")
+    if args.baseline and not check(results, args.baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
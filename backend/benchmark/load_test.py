@@ -0,0 +1,153 @@
+"""
+HTTP load test of the upload and render endpoints at several concurrency levels.
+
+Usage (depuis le dossier backend) :
+    python benchmark/load_test.py [--concurrency 1,8,32] [--requests 200] [--points 1000]
+    [--url http://localhost:8000] [--baseline benchmark/results/load-<date>.json]
+
+Without --url the application runs in-process (httpx ASGI transport, lifespan included)
+against the database of config.ini; with --url a running server is loaded, and must use the
+same database (the test polygons are inserted and deleted through config.ini).
+Scenarios, each run at every concurrency level with `requests` requests:
+    get_polygon   GET /polygon/{id}?engine=fast over the seeded polygons (render cache warm after the warm-up round)
+    upload        POST /upload of a new CSV polygon of `points` points
+    find_bbox     GET /polygons?bbox=... over the extent of the seeded polygons
+p50/p95/p99 latencies and throughput of the successful requests, and errors, are printed and
+written to JSON (see report.py), then compared with --baseline when given.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import time
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import delete  # noqa: E402
+from database import Database, PolygonORM  # noqa: E402
+from micro import star_polygon  # noqa: E402
+from model import Point  # noqa: E402
+from report import add_check_arguments, check, save_results  # noqa: E402
+
+CONF_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "config.ini"))
+SEEDED_POLYGONS = 16
+
+
+async def run_level(client: httpx.AsyncClient, make_request, concurrency: int, requests: int) -> dict:
+    """
+    Send `requests` requests from `concurrency` workers. Latency percentiles and throughput
+    count successful requests only (a fast error must not look like a speed-up); failures are
+    reported as errors and error_rate. Percentiles are None when every request failed.
+    """
+    counter = itertools.count()
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        while (index := next(counter)) < requests:
+            start = time.perf_counter()
+            try:
+                response = await make_request(client, index)
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            if response.status_code >= 400:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    p50, p95, p99 = (float(p) for p in np.percentile(latencies, [50, 95, 99])) if latencies else (None,) * 3
+    return {"median_ms": p50, "p95_ms": p95, "p99_ms": p99, "throughput_rps": len(latencies) / wall,
+            "errors": errors, "error_rate": errors / requests, "requests": requests}
+
+
+def _ms(value) -> str:
+    return "     n/a" if value is None else f"{value:8.2f}"
+
+
+def scenarios(ids, points: int, uploaded: list):
+    xs, ys = star_polygon(points, seed=1)
+    offsets = itertools.count(1)
+
+    async def get_polygon(client, index):
+        return await client.get(f"/polygon/{ids[index % len(ids)]}", params={"engine": "fast"})
+
+    async def upload(client, index):
+        # Polygone décalé à chaque requête : jamais un doublon
+        offset = next(offsets) * 1000.0
+        csv = "x,y,comment\n" + "".join(f"{x + offset},{y},\n" for x, y in zip(xs, ys))
+        response = await client.post("/upload", files={"csv_file": ("load.csv", csv.encode(), "text/csv")})
+        if response.status_code == 200:
+            uploaded.append(response.json()["id"])
+        return response
+
+    async def find_bbox(client, index):
+        return await client.get("/polygons", params={"bbox": "-100,-100,100,100", "limit": 100})
+
+    return {"get_polygon": get_polygon, "upload": upload, "find_bbox": find_bbox}
+
+
+async def load(args, ids, uploaded) -> dict:
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+        lifespan = None
+    else:
+        from app import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=60)
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+    results = {}
+    try:
+        for name, make_request in scenarios(ids, args.points, uploaded).items():
+            # Tour de chauffe non mesuré : process de rendu démarrés, connexions du pool ouvertes
+            await run_level(client, make_request, 1, SEEDED_POLYGONS)
+            for concurrency in [int(c) for c in args.concurrency.split(",")]:
+                result = await run_level(client, make_request, concurrency, args.requests)
+                results[f"{name}@c{concurrency}"] = result
+                print(f"{name:>12} c={concurrency:<4} p50 {_ms(result['median_ms'])} ms  p95 {_ms(result['p95_ms'])} ms  "
+                      f"p99 {_ms(result['p99_ms'])} ms  {result['throughput_rps']:8.1f} req/s  "
+                      f"{result['errors']} errors")
+    finally:
+        await client.aclose()
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and concurrency level")
+    parser.add_argument("--points", type=int, default=1000, help="vertices of the seeded and uploaded polygons")
+    parser.add_argument("--url", help="load a running server instead of the in-process application")
+    add_check_arguments(parser)
+    args = parser.parse_args()
+
+    db = Database(CONF_DIR)
+    uploaded = []
+    xs, ys = star_polygon(args.points)
+    # Polygones de départ, décalés de 1 pour ne pas être des doublons entre eux
+    ids = [db.insert_polygon([Point(x=x + i, y=y) for x, y in zip(xs, ys)]) for i in range(SEEDED_POLYGONS)]
+    try:
+        results = asyncio.run(load(args, ids, uploaded))
+    finally:
+        with db.SessionLocal() as session:
+            session.execute(delete(PolygonORM).where(PolygonORM.id.in_(ids + uploaded)))
+            session.commit()
+        db.close()
+
+    params = {"concurrency": args.concurrency, "requests": args.requests, "points": args.points,
+              "target": args.url or "in-process"}
+    path = save_results("load", params, results, args.output)
+    print(f"Results written to {path}")
+    if args.baseline and not check(results, args.baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
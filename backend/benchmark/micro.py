@@ -0,0 +1,124 @@
+"""
+Micro-benchmarks of the upload and render paths, against the database of config.ini.
+
+Usage (depuis le dossier backend) :
+    python benchmark/micro.py [--sizes 1000,100000] [--repeat 7] [--baseline benchmark/results/micro-<date>.json]
+
+Benchmarks, one per stage and polygon size:
+    csv_parse     ingest.iter_csv_point_batches over an in-memory CSV (read, decode, parse)
+    dedup_query   Database.is_polygon_exist on a stored polygon (fingerprint + unique index lookup)
+    bulk_insert   Database.insert_polygon of a new polygon (points, metrics, levels of detail)
+    point_fetch   Database.get_point_columns
+    area          geometry.polygon_metrics (area, perimeter, bbox, centroid, validity)
+    render_fast   renderer.render_polygon, PNG with the fast engine
+    render_mpl    renderer.render_polygon, PNG with matplotlib
+Each benchmark runs once to warm up, then `repeat` times; the median and p95 are written to JSON
+(see report.py) and compared with --baseline when given. The polygons written are deleted at the end.
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import delete  # noqa: E402
+from database import Database, PolygonORM  # noqa: E402
+from geometry import polygon_metrics  # noqa: E402
+from ingest import iter_csv_point_batches  # noqa: E402
+from model import Point  # noqa: E402
+from renderer import render_polygon  # noqa: E402
+from report import add_check_arguments, check, save_results  # noqa: E402
+
+CONF_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "config.ini"))
+
+
+class _Upload:
+    """Stand-in for the UploadFile of a request: an in-memory file read asynchronously."""
+
+    def __init__(self, data: bytes):
+        self._file = io.BytesIO(data)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+
+def star_polygon(n: int, seed: int = 0):
+    """Random star-shaped polygon with n vertices (never self-intersecting)."""
+    rng = np.random.default_rng(seed)
+    angles = np.sort(rng.uniform(0, 2 * np.pi, n))
+    radius = rng.uniform(50, 100, n)
+    return (radius * np.cos(angles)).tolist(), (radius * np.sin(angles)).tolist()
+
+
+def measure(fn, repeat: int) -> dict:
+    """Median and p95 (ms) of fn() over repeat runs, after one warm-up run."""
+    fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": float(np.median(timings)), "p95_ms": float(np.percentile(timings, 95)), "runs": repeat}
+
+
+def parse_csv(data: bytes) -> int:
+    async def consume():
+        return sum([len(batch) async for batch in iter_csv_point_batches(_Upload(data), 10000)])
+    return asyncio.run(consume())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,100000")
+    parser.add_argument("--repeat", type=int, default=7)
+    add_check_arguments(parser)
+    args = parser.parse_args()
+
+    db = Database(CONF_DIR)
+    created = []
+    results = {}
+    try:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            xs, ys = star_polygon(size)
+            points = [Point(x=x, y=y, comment="") for x, y in zip(xs, ys)]
+            csv = ("x,y,comment\n" + "".join(f"{x},{y},\n" for x, y in zip(xs, ys))).encode()
+            stored_id = db.insert_polygon(points)
+            created.append(stored_id)
+            offsets = iter(range(1, 10 ** 6))
+
+            def insert():
+                # Polygone décalé à chaque fois : jamais un doublon
+                offset = next(offsets) * 1000.0
+                created.append(db.insert_polygon([Point(x=p.x + offset, y=p.y) for p in points]))
+
+            benchmarks = {
+                "csv_parse": lambda: parse_csv(csv),
+                "dedup_query": lambda: db.is_polygon_exist(points),
+                "bulk_insert": insert,
+                "point_fetch": lambda: db.get_point_columns(stored_id),
+                "area": lambda: polygon_metrics(xs, ys),
+                "render_fast": lambda: render_polygon(stored_id, xs, ys, 1.0, "png", "fast"),
+                "render_mpl": lambda: render_polygon(stored_id, xs, ys, 1.0, "png", "matplotlib"),
+            }
+            for name, fn in benchmarks.items():
+                result = measure(fn, args.repeat)
+                results[f"{name}[{size}]"] = result
+                print(f"{name:>12} {size:>8} points: median {result['median_ms']:9.2f} ms  "
+                      f"p95 {result['p95_ms']:9.2f} ms")
+    finally:
+        with db.SessionLocal() as session:
+            session.execute(delete(PolygonORM).where(PolygonORM.id.in_(created)))
+            session.commit()
+        db.close()
+
+    path = save_results("micro", {"sizes": args.sizes, "repeat": args.repeat}, results, args.output)
+    print(f"Results written to {path}")
+    if args.baseline and not check(results, args.baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+JSON results of the benchmark suite (micro.py, load_test.py) and regression check between two runs.
+
+Usage (depuis le dossier backend) :
+    python benchmark/report.py benchmark/results/micro-<date>.json --baseline benchmark/results/micro-<old>.json
+    [--threshold 0.2]
+
+Exit status 1 when a measure of the run is worse than the baseline by more than the threshold
+(latencies higher, throughputs lower) or when its error rate is higher, so the check can gate a CI job.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+from typing import Dict, List
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+# Mesures comparées : plus bas est mieux pour les latences, plus haut pour les débits
+LOWER_IS_BETTER = ("median_ms", "p95_ms", "p99_ms")
+HIGHER_IS_BETTER = ("throughput_rps", "points_per_s")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(suite: str, params: dict, results: Dict[str, dict], path: str = None) -> str:
+    """Write a run to JSON (benchmark/results/<suite>-<date>.json by default) and return the path."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{suite}-{now:%Y%m%dT%H%M%S}.json")
+    run = {
+        "suite": suite,
+        "created": now.isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} cpu)",
+        "params": params,
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=2, sort_keys=True)
+    return path
+
+
+def _error_rate(result: dict):
+    if "error_rate" in result:
+        return result["error_rate"]
+    if result.get("requests"):
+        return result.get("errors", 0) / result["requests"]
+    return None
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float = 0.2) -> List[str]:
+    """
+    Return one line per measure of results worse than the same measure of baseline by more than
+    threshold (0.2: 20 % slower, or 20 % less throughput), and one per higher error rate.
+    A measure of 0 is compared like any other; measures absent (or None) on either side are ignored.
+    """
+    regressions = []
+    for name in sorted(set(results) & set(baseline)):
+        current, previous = _error_rate(results[name]), _error_rate(baseline[name])
+        if current is not None and previous is not None and current > previous:
+            regressions.append(f"{name} error_rate: {previous:.1%} -> {current:.1%}")
+        for measure in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            current, previous = results[name].get(measure), baseline[name].get(measure)
+            if current is None or previous is None:
+                continue
+            if previous == 0:
+                # Pas de variation relative depuis 0 : toute hausse d'une latence est une régression
+                if measure in LOWER_IS_BETTER and current > 0:
+                    regressions.append(f"{name} {measure}: {previous:.3f} -> {current:.3f}")
+                continue
+            change = current / previous - 1
+            worse = change > threshold if measure in LOWER_IS_BETTER else change < -threshold
+            if worse:
+                regressions.append(f"{name} {measure}: {previous:.3f} -> {current:.3f} ({change:+.0%})")
+    return regressions
+
+
+def check(results: Dict[str, dict], baseline_path: str, threshold: float) -> bool:
+    """Print the regressions against a baseline file; return True if there is none."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline["results"], threshold)
+    print(f"\nAgainst {os.path.basename(baseline_path)} (commit {baseline.get('git_commit')}, "
+          f"threshold {threshold:.0%}): {len(regressions)} regression(s)")
+    for line in regressions:
+        print(f"  REGRESSION {line}")
+    return not regressions
+
+
+def add_check_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--output", help="JSON file of the results (default: benchmark/results/<suite>-<date>.json)")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="tolerated slowdown before failing (0.2 = 20%%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("results")
+    parser.add_argument("--baseline", required=True)
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+    with open(args.results, encoding="utf-8") as f:
+        results = json.load(f)["results"]
+    sys.exit(0 if check(results, args.baseline, args.threshold) else 1)
+
+
+if __name__ == "__main__":
+    main()
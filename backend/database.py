@@ -1,18 +1,60 @@
-from sqlalchemy import create_engine, text, ForeignKey, Column, Integer, Float, String
+import asyncio
+import io
+from contextlib import contextmanager
+from itertools import islice, repeat
+import numpy as np
+from sqlalchemy import (bindparam, create_engine, delete, func, insert, literal, select, update, ForeignKey, Boolean, Column,
+                        Integer, Float, Index, LargeBinary, String)
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship, Session
+from sqlalchemy.orm import deferred, sessionmaker, relationship, Session
+from sqlalchemy.util import await_only
 from configparser import ConfigParser
-from typing import List, Union, Optional
-from sqlalchemy.exc import SQLAlchemyError
+from typing import Dict, Iterator, List, Tuple, Union, Optional, Sequence
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from model import Point
-from logger_manager import log
+from geometry import (METRIC_COLUMNS, FingerprintBuilder, metric_records, pack_coordinates, pack_polygons,
+                      polygon_fingerprint, polygon_lods, polygon_metrics, polygons_metrics, unpack_coordinates)
+from logger_manager import get_logger
+
+log = get_logger(__name__)
 
 Base = declarative_base()
 
 class PolygonORM(Base):
     __tablename__ = "polygons"
     id = Column(Integer, primary_key=True, autoincrement=True)
+    # Empreinte canonique des sommets (geometry.FingerprintBuilder), unique : sert à la détection des doublons
+    fingerprint = Column(String(64), nullable=True, unique=True, index=True)
+    # Métriques calculées une fois à l'insertion (geometry.polygon_metrics)
+    area = Column(Float, nullable=True)
+    perimeter = Column(Float, nullable=True)
+    min_x = Column(Float, nullable=True)
+    min_y = Column(Float, nullable=True)
+    max_x = Column(Float, nullable=True)
+    max_y = Column(Float, nullable=True)
+    centroid_x = Column(Float, nullable=True)
+    centroid_y = Column(Float, nullable=True)
+    vertex_count = Column(Integer, nullable=True)
+    is_valid = Column(Boolean, nullable=True)
+    # Copie optionnelle des sommets en un seul blob (geometry.pack_coordinates) : lecture en une ligne.
+    # Différée : jamais chargée avec l'objet ORM, seulement par get_point_columns
+    coordinates = deferred(Column(LargeBinary, nullable=True))
     points = relationship("PointORM", back_populates="polygon", cascade="all, delete-orphan")
+    lods = relationship("PolygonLodORM", cascade="all, delete-orphan", passive_deletes=True)
+
+
+class PolygonLodORM(Base):
+    """Simplified version of a polygon (geometry.polygon_lods); level 1 is the finest, higher levels are coarser."""
+    __tablename__ = "polygon_lods"
+    polygon_id = Column(Integer, ForeignKey('polygons.id', ondelete="CASCADE"), primary_key=True)
+    level = Column(Integer, primary_key=True)
+    # Distance maximale au polygone complet, dans l'unité des coordonnées
+    tolerance = Column(Float, nullable=False)
+    vertex_count = Column(Integer, nullable=False)
+    # Sommets simplifiés, au format de polygons.coordinates (geometry.pack_coordinates)
+    coordinates = Column(LargeBinary, nullable=False)
 
 
 class PointORM(Base):
@@ -23,12 +65,211 @@ class PointORM(Base):
     comment = Column(String, nullable=True)
     polygon_id = Column(Integer, ForeignKey('polygons.id'), nullable=False)
     polygon = relationship("PolygonORM", back_populates="points") 
+    # Points d'un polygone dans l'ordre des sommets (lecture, pages, export en flux)
+    __table_args__ = (Index("ix_points_polygon_id", "polygon_id", "id"),)
+
+
+def _copy_quote(value: Optional[str]) -> str:
+    """Quote a text value for COPY ... (FORMAT csv); None is written as NULL."""
+    if value is None:
+        return ""
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _packed_points():
+    """
+    Aggregate of the points of a polygon into one bytea of big-endian float64 x, y pairs, in
+    vertex order: one value to transfer and decode instead of one row per point.
+    """
+    pair = func.float8send(PointORM.x).op("||", return_type=LargeBinary)(func.float8send(PointORM.y))
+    return func.string_agg(pair, aggregate_order_by(literal(b"", LargeBinary), PointORM.id), type_=LargeBinary)
+
+
+def _unpack_points(blob: Optional[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    values = np.frombuffer(blob or b"", dtype=">f8").astype(np.float64)
+    return values[0::2], values[1::2]
+
+
+def _box(min_x, min_y, max_x, max_y):
+    return func.box(func.point(min_x, min_y), func.point(max_x, max_y))
+
+
+def _polygon_box():
+    """Box of a polygon: the expression of the GiST index ix_polygons_bbox."""
+    return _box(PolygonORM.min_x, PolygonORM.min_y, PolygonORM.max_x, PolygonORM.max_y)
+
+
+@contextmanager
+def _transaction(session_db: Session) -> Iterator[None]:
+    """Commit the session's current transaction at the end of the block, roll it back on error."""
+    try:
+        yield
+        session_db.commit()
+    except BaseException:
+        session_db.rollback()
+        raise
+
+
+class PolygonWriter:
+    """
+    Write one polygon whose points arrive in batches, inside a single transaction.
+    Each batch is flushed to the database as soon as it is written, so the caller never
+    needs to hold the whole point set. Nothing is visible to other sessions until commit().
+    Use it as a context manager: leaving the block without commit() rolls everything back.
+    session_db, when given, must have no transaction in progress and is left open on exit.
+    """
+
+    def __init__(self, database: "Database", session_db: Optional[Session] = None):
+        self._database = database
+        self._owns_session = session_db is None
+        self._session = database.SessionLocal() if session_db is None else session_db
+        self._transaction = self._session.begin()
+        polygon = PolygonORM()
+        self._session.add(polygon)
+        self._session.flush()
+        self.polygon_id = polygon.id
+        self.point_count = 0
+        self._fingerprint = FingerprintBuilder()
+
+    def write(self, x_values: Sequence[float], y_values: Sequence[float], comments: Sequence[Optional[str]]) -> None:
+        """Insert one batch of points into the polygon being written."""
+        self._insert(x_values, y_values, comments)
+        self._update_fingerprint(x_values, y_values)
+
+    def commit(self) -> int:
+        """
+        Commit the polygon and return its ID. If an identical polygon already exists,
+        the new one is rolled back and the existing ID is returned instead.
+        """
+        fingerprint = self._fingerprint.hexdigest()
+        existing_polygon_id = self._existing(fingerprint)
+        if existing_polygon_id:
+            return existing_polygon_id
+        return self._store(fingerprint, *self._derive(*self._read_points()))
+
+    # Étapes de write() et commit(), séparées entre accès à la base et calcul pour
+    # qu'AsyncPolygonWriter fasse le calcul hors de la boucle d'événements
+
+    def _insert(self, x_values: Sequence[float], y_values: Sequence[float], comments: Sequence[Optional[str]]) -> None:
+        self.point_count += self._database._insert_point_columns(
+            self._session, self.polygon_id, x_values, y_values, comments)
+
+    def _update_fingerprint(self, x_values: Sequence[float], y_values: Sequence[float]) -> None:
+        self._fingerprint.update(x_values, y_values)
+
+    def _existing(self, fingerprint: str) -> Optional[int]:
+        """ID of an identical polygon already committed (the new one is then rolled back), else None."""
+        existing_polygon_id = self._database._find_polygon_by_fingerprint(fingerprint, self._session)
+        if existing_polygon_id:
+            log.warning("Polygon with the same points already exists, ID: %s", existing_polygon_id)
+            self._transaction.rollback()
+        return existing_polygon_id
+
+    def _read_points(self) -> Tuple[np.ndarray, np.ndarray]:
+        # Les métriques ont besoin de l'anneau complet : relu une seule fois, en colonnes NumPy
+        return self._database._select_point_columns(self.polygon_id, self._session)
+
+    def _derive(self, x_values: np.ndarray, y_values: np.ndarray) -> Tuple[dict, List[dict]]:
+        """Columns computed from the vertices (metrics, packed coordinates) and rows of the levels of detail."""
+        return self._database._derived_columns(x_values, y_values), self._database._lod_rows(x_values, y_values)
+
+    def _store(self, fingerprint: str, columns: dict, lod_rows: List[dict]) -> int:
+        try:
+            self._session.execute(
+                update(PolygonORM).where(PolygonORM.id == self.polygon_id).values(fingerprint=fingerprint, **columns))
+            self._database._store_lods(self._session, self.polygon_id, lod_rows)
+            self._transaction.commit()
+            return self.polygon_id
+        except IntegrityError:
+            # Le même polygone a été inséré en parallèle : l'index unique a tranché
+            self._transaction.rollback()
+            return self._database._find_polygon_by_fingerprint(fingerprint, self._session)
+
+    def __enter__(self) -> "PolygonWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if self._transaction.is_active:
+                self._transaction.rollback()
+        finally:
+            if self._owns_session:
+                self._session.close()
+
+
+class AsyncPolygonWriter:
+    """
+    PolygonWriter on the AsyncSession of a request: the same batches and transaction,
+    with every database round trip awaited and the fingerprint, metrics and levels of
+    detail computed in a worker thread, instead of blocking the event loop.
+    """
+
+    def __init__(self, database: "Database", session: AsyncSession):
+        self._database = database
+        self._session = session
+        self._writer: Optional[PolygonWriter] = None
+
+    @property
+    def polygon_id(self) -> int:
+        return self._writer.polygon_id
+
+    @property
+    def point_count(self) -> int:
+        return self._writer.point_count
+
+    async def write(self, x_values: Sequence[float], y_values: Sequence[float],
+                    comments: Sequence[Optional[str]]) -> None:
+        await self._session.run_sync(lambda _: self._writer._insert(x_values, y_values, comments))
+        await asyncio.to_thread(self._writer._update_fingerprint, x_values, y_values)
+
+    async def commit(self) -> int:
+        writer = self._writer
+        fingerprint = writer._fingerprint.hexdigest()
+        existing_polygon_id = await self._session.run_sync(lambda _: writer._existing(fingerprint))
+        if existing_polygon_id:
+            return existing_polygon_id
+        x_values, y_values = await self._session.run_sync(lambda _: writer._read_points())
+        # Métriques et niveaux de détail calculés dans un thread : seules les écritures passent par run_sync
+        columns, lod_rows = await asyncio.to_thread(writer._derive, x_values, y_values)
+        return await self._session.run_sync(lambda _: writer._store(fingerprint, columns, lod_rows))
+
+    async def __aenter__(self) -> "AsyncPolygonWriter":
+        self._writer = await self._session.run_sync(lambda session_db: PolygonWriter(self._database, session_db))
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self._session.run_sync(lambda _: self._writer.__exit__(exc_type, exc, tb))
 
 
 class Database:
-    def __init__(self, config_file: str = "config.ini"):
+    # Au-delà de ce nombre de points, l'insertion passe par COPY FROM STDIN (PostgreSQL / psycopg2)
+    DEFAULT_COPY_THRESHOLD = 50000
+    # Nombre de lignes par requête INSERT ... VALUES générée par executemany (insertmanyvalues)
+    DEFAULT_INSERT_PAGE_SIZE = 1000
+    # Nombre de lignes envoyées par commande COPY
+    COPY_CHUNK_SIZE = 100000
+
+    def __init__(self, config_file: str = "config.ini", connect: bool = True):
+        """Read the settings of the ini file; with connect=False the engines are created by a later connect()."""
         self.config_file = config_file
-        self.connect()
+        config = ConfigParser()
+        config.read(self.config_file)
+        self.copy_threshold = config.getint("postgresql", "copy_threshold", fallback=self.DEFAULT_COPY_THRESHOLD)
+        self.insert_page_size = config.getint("postgresql", "insert_page_size", fallback=self.DEFAULT_INSERT_PAGE_SIZE)
+        # Pool de connexions, partagé par les engines synchrone et asynchrone
+        self.pool_size = config.getint("postgresql", "pool_size", fallback=5)
+        self.max_overflow = config.getint("postgresql", "max_overflow", fallback=10)
+        self.pool_timeout = config.getfloat("postgresql", "pool_timeout", fallback=30)
+        self.pool_pre_ping = config.getboolean("postgresql", "pool_pre_ping", fallback=True)
+        self.statement_timeout_ms = config.getint("postgresql", "statement_timeout_ms", fallback=0)
+        # Copie des sommets dans polygons.coordinates à l'insertion
+        self.pack_coordinates = config.getboolean("postgresql", "pack_coordinates", fallback=True)
+        # Niveaux de détail calculés à l'insertion (geometry.polygon_lods)
+        self.lod_min_vertices = config.getint("lod", "min_vertices", fallback=1024)
+        self.lod_resolutions = [int(r) for r in config.get("lod", "resolutions", fallback="4096,1024,256").split(",")]
+        self.engine = self.async_engine = self.session = None
+        if connect:
+            self.connect()
 
     def get_all_rows(self, model):
         """ Récupérer toutes les lignes d'une table donnée (ex: PointORM ou PolygonORM) """
@@ -40,24 +281,37 @@ class Database:
             print(f"Error while fetching rows: {e}")
             return []
 
-    def read_db_config(self) -> str:
-        """Read and return the database connection URL from the ini file"""
+    def read_db_config(self, driver: str = "") -> str:
+        """Read and return the database connection URL from the ini file (driver: e.g. "asyncpg")"""
         config = ConfigParser()
         config.read(self.config_file)
         db = config["postgresql"]
-        return f"postgresql://{db['user']}:{db['password']}@{db['host']}:{db['port']}/{db['dbname']}"
+        scheme = f"postgresql+{driver}" if driver else "postgresql"
+        return f"{scheme}://{db['user']}:{db['password']}@{db['host']}:{db['port']}/{db['dbname']}"
 
     def connect(self) -> bool:
-        """Establish a database connection and return True if successful, False otherwise."""
+        """
+        Create the engines (connections are opened lazily by their pools) and return True
+        if successful, False otherwise. The API uses the asyncio engine (asyncpg) through
+        per-request AsyncSession; scripts and tests use the synchronous one (psycopg2).
+        """
         try:
-            DATABASE_URL = self.read_db_config()
-            self.engine = create_engine(DATABASE_URL)
+            pool_options = dict(pool_size=self.pool_size, max_overflow=self.max_overflow,
+                                pool_timeout=self.pool_timeout, pool_pre_ping=self.pool_pre_ping)
+            timeout = str(self.statement_timeout_ms)
+            self.engine = create_engine(self.read_db_config(), insertmanyvalues_page_size=self.insert_page_size,
+                                        connect_args={"options": f"-c statement_timeout={timeout}"}, **pool_options)
             self.SessionLocal = sessionmaker(bind=self.engine)
+            self.async_engine = create_async_engine(
+                self.read_db_config("asyncpg"), insertmanyvalues_page_size=self.insert_page_size,
+                connect_args={"server_settings": {"statement_timeout": timeout}}, **pool_options)
+            # expire_on_commit=False : les objets restent lisibles après commit sans nouvel aller-retour
+            self.AsyncSessionLocal = async_sessionmaker(bind=self.async_engine, expire_on_commit=False)
             self.session = self.SessionLocal()
             log.info("✅ Database connection established.")
             return True
         except SQLAlchemyError as e:
-            log.error(f"❌ Error while connecting to the database: {e}")
+            log.error("❌ Error while connecting to the database: %s", e)
             return False
 
     def close(self):
@@ -68,96 +322,630 @@ class Database:
             self.engine.dispose()
         log.info("✅ Connection closed.")
 
+    async def close_async(self):
+        """Close the connections of the asyncio engine pool (they are bound to the running event loop)."""
+        if self.async_engine:
+            await self.async_engine.dispose()
+
+    async def warm_up_async(self, connections: Optional[int] = None) -> int:
+        """
+        Open `connections` connections of the asyncio pool at once (pool_size by default) and
+        give them back to the pool, so the first requests do not pay for the connection setup.
+        """
+        count = self.pool_size if connections is None else connections
+
+        async def ping():
+            async with self.async_engine.connect() as connection:
+                await connection.execute(select(literal(1)))
+
+        await asyncio.gather(*(ping() for _ in range(count)))
+        return count
+
+    def pool_stats(self) -> dict:
+        """Return the connections in use, idle and in overflow of both engine pools."""
+        stats = {}
+        for name, engine in (("sync", self.engine), ("async", self.async_engine)):
+            pool = engine.sync_engine.pool if name == "async" else engine.pool
+            stats[name] = {"checked_out": pool.checkedout(), "idle": pool.checkedin(),
+                           "overflow": max(pool.overflow(), 0), "size": pool.size()}
+        return stats
+
+    @staticmethod
+    async def run_async(session: AsyncSession, method, *args, **kwargs):
+        """
+        Await a Database method on the AsyncSession of a request: the method runs with the
+        session as session_db, its queries go through asyncpg without blocking the event loop.
+        """
+        return await session.run_sync(lambda session_db: method(*args, session_db=session_db, **kwargs))
+
+    @contextmanager
+    def _session_scope(self, session_db: Optional[Session]) -> Iterator[Session]:
+        """Yield session_db if given (the caller closes it), else a new session closed on exit."""
+        if session_db is not None:
+            yield session_db
+            return
+        with self.SessionLocal() as session_db:
+            yield session_db
+
     def init_db(self):
         """Initialize the database and create tables."""
         Base.metadata.create_all(bind=self.engine)
 
-    def is_polygon_exist(self, points: List[Point]) -> Optional[int]:
+    def is_polygon_exist(self, points: List[Point], session_db: Optional[Session] = None) -> Optional[int]:
         """Check if a polygon with the same points already exists in the database, and return its ID if it exists."""
         try:
-            session_db = self.SessionLocal()
-
-            # Ordonnancer les points par leurs coordonnées x puis y pour éviter les erreurs de comparaison d'ordre
-            sorted_points = sorted(points, key=lambda p: (p.x, p.y))  # Trie les points par x puis y
-            point_placeholders = ",".join([f"({p.x}, {p.y})" for p in sorted_points])
+            with self._session_scope(session_db) as session_db:
+                fingerprint = polygon_fingerprint([p.x for p in points], [p.y for p in points])
+                return self._find_polygon_by_fingerprint(fingerprint, session_db)
 
-            # Vérifier si tous les points existent dans la base de données et sont associés à un même polygone
-            query = text(f"""
-                SELECT p.polygon_id, COUNT(DISTINCT p.polygon_id)
-                FROM points p
-                WHERE (p.x, p.y) IN ({point_placeholders})
-                GROUP BY p.polygon_id
-            """)
+        except SQLAlchemyError as e:
+            log.error("❌ Error checking if polygon exists: %s", e)
+            raise SQLAlchemyError
 
-            result = session_db.execute(query).fetchall()
+    def _find_polygon_by_fingerprint(self, fingerprint: str, session_db: Session) -> Optional[int]:
+        """Return the ID of the polygon with this fingerprint (single lookup on the unique index)."""
+        return session_db.execute(select(PolygonORM.id).where(PolygonORM.fingerprint == fingerprint)).scalar()
 
-            # Si on trouve des résultats
-            if result:
-                # Vérifier si tous les points sont associés au même polygon_id
-                for polygon_id, polygon_count in result:
-                    # Si plus d'un polygone existe pour ces points, ce n'est pas le même polygone
-                    if polygon_count > 1:
-                        log.warning(f"Points {point_placeholders} are associated with multiple polygons.")
-                        return None  # Plusieurs polygones pour les mêmes points, pas le même polygone
+    def insert_polygon(self, points: List[Point], session_db: Optional[Session] = None) -> int:
+        """Create a new polygon and insert its points in a single transaction."""
+        try:
+            with self._session_scope(session_db) as session_db:
+                x_values, y_values = [p.x for p in points], [p.y for p in points]
+                fingerprint = polygon_fingerprint(x_values, y_values)
 
-                    # Si un seul polygone est trouvé, retourner son ID
-                    if polygon_count == 1:
-                        return polygon_id  # Retourner l'ID du polygone existant
+                # Vérifier si un polygone avec ces points existe déjà et récupérer l'ID si c'est le cas
+                existing_polygon_id = self._find_polygon_by_fingerprint(fingerprint, session_db)
+                if existing_polygon_id:
+                    log.warning("Polygon with the same points already exists, ID: %s", existing_polygon_id)
+                    return existing_polygon_id  # Retourner l'ID du polygone existant
 
-            return None  # Aucun polygone avec ces points n'existe
+                # Si aucun polygone n'existe, on crée un nouveau polygone
+                try:
+                    new_polygon = PolygonORM(fingerprint=fingerprint, **self._derived_columns(x_values, y_values))
+                    session_db.add(new_polygon)
+                    session_db.flush()
+                    new_polygon_id = new_polygon.id
+                    rows_inserted = self._insert_point_columns(
+                        session_db, new_polygon_id, x_values, y_values, [p.comment for p in points])
+                    self._insert_lods(session_db, new_polygon_id, x_values, y_values)
+                    if rows_inserted == 0:
+                        log.warning("All points already exist, database is unchanged.")
+                    session_db.commit()
+                except IntegrityError:
+                    # Le même polygone a été inséré en parallèle : retourner son ID
+                    session_db.rollback()
+                    return self._find_polygon_by_fingerprint(fingerprint, session_db)
+                except BaseException:
+                    session_db.rollback()
+                    raise
+                return new_polygon_id  # Retourner l'ID du nouveau polygone créé
 
-        except SQLAlchemyError as e:
-            log.error(f"❌ Error checking if polygon exists: {e}")
+        except (SQLAlchemyError, ValueError) as e:
+            log.error("❌ Error inserting polygon and points: %s", e)
             raise SQLAlchemyError
+
+    def delete_polygon(self, id: int, session_db: Optional[Session] = None) -> bool:
+        """Delete a polygon, its points and levels of detail (ON DELETE CASCADE); return False if it did not exist."""
+        with self._session_scope(session_db) as session_db:
+            deleted = session_db.execute(delete(PolygonORM).where(PolygonORM.id == id)).rowcount
+            session_db.commit()
+        return deleted > 0
+
+    def polygon_writer(self) -> PolygonWriter:
+        """Start writing a polygon whose points will be inserted batch by batch (see PolygonWriter)."""
+        return PolygonWriter(self)
+
+    def async_polygon_writer(self, session: AsyncSession) -> AsyncPolygonWriter:
+        """Same as polygon_writer, on the AsyncSession of a request (see AsyncPolygonWriter)."""
+        return AsyncPolygonWriter(self, session)
+
+    def _insert_point_columns(self, session_db: Session, polygon_id: Union[int, Sequence[int]],
+                              x_values: Sequence[float], y_values: Sequence[float],
+                              comments: Sequence[Optional[str]]) -> int:
+        """
+        Insert a batch of points given column-wise, without building ORM objects, in the
+        session's current transaction. `polygon_id` is either one ID for every point or one ID
+        per point. Small batches go through a Core executemany (batched into multi-row INSERTs
+        by insertmanyvalues); from `copy_threshold` points on PostgreSQL the rows are streamed
+        with COPY FROM STDIN.
+        """
+        polygon_ids = repeat(polygon_id) if isinstance(polygon_id, int) else polygon_id
+        driver = session_db.get_bind().dialect.driver
+        if len(x_values) >= self.copy_threshold and driver == "psycopg2":
+            return self._copy_point_columns(session_db, polygon_ids, x_values, y_values, comments)
+        if len(x_values) >= self.copy_threshold and driver == "asyncpg":
+            return self._copy_point_records(session_db, polygon_ids, x_values, y_values, comments)
+        rows = [
+            {"x": x, "y": y, "comment": comment, "polygon_id": pid}
+            for x, y, comment, pid in zip(x_values, y_values, comments, polygon_ids)
+        ]
+        if rows:
+            session_db.execute(insert(PointORM.__table__), rows)
+        return len(rows)
+
+    def _copy_point_columns(self, session_db: Session, polygon_ids, x_values: Sequence[float],
+                            y_values: Sequence[float], comments: Sequence[Optional[str]]) -> int:
+        """Insert points with COPY FROM STDIN on the session's connection (same transaction)."""
+        cursor = session_db.connection().connection.dbapi_connection.cursor()
+        rows = zip(x_values, y_values, comments, polygon_ids)
+        inserted = 0
+        try:
+            while True:
+                chunk = list(islice(rows, self.COPY_CHUNK_SIZE))
+                if not chunk:
+                    break
+                # Format CSV de COPY : champ vide non quoté = NULL, "" = chaîne vide
+                buffer = io.StringIO("".join(
+                    f"{float(x)!r},{float(y)!r},{_copy_quote(comment)},{pid}\n" for x, y, comment, pid in chunk
+                ))
+                cursor.copy_expert("COPY points (x, y, comment, polygon_id) FROM STDIN WITH (FORMAT csv)", buffer)
+                inserted += len(chunk)
         finally:
-            session_db.close()
+            cursor.close()
+        return inserted
 
+    def _copy_point_records(self, session_db: Session, polygon_ids, x_values: Sequence[float],
+                            y_values: Sequence[float], comments: Sequence[Optional[str]]) -> int:
+        """Insert points with asyncpg's binary COPY on the session's connection (same transaction)."""
+        # Appelé depuis AsyncSession.run_sync : await_only attend la coroutine asyncpg sans bloquer la boucle
+        connection = session_db.connection().connection.dbapi_connection.driver_connection
+        rows = zip((float(x) for x in x_values), (float(y) for y in y_values), comments, polygon_ids)
+        inserted = 0
+        while True:
+            chunk = list(islice(rows, self.COPY_CHUNK_SIZE))
+            if not chunk:
+                return inserted
+            await_only(connection.copy_records_to_table(
+                "points", records=chunk, columns=["x", "y", "comment", "polygon_id"]))
+            inserted += len(chunk)
 
-    def insert_polygon(self, points: List[Point]) -> int:
-        """Create a new polygon and insert its points in a single transaction."""
+    def prepare_polygons(self, polygons: List[List[Point]]) -> Tuple[List[str], Dict[str, Tuple[dict, List[dict]]]]:
+        """
+        Computation part of insert_polygons, without database access (to run in a worker thread):
+        the fingerprint of each polygon and, for the first polygon of each fingerprint, its
+        derived columns and the rows of its levels of detail.
+        """
+        coordinates = [([p.x for p in points], [p.y for p in points]) for points in polygons]
+        fingerprints = [polygon_fingerprint(x_values, y_values) for x_values, y_values in coordinates]
+        first: Dict[str, Tuple[List[float], List[float]]] = {}
+        for fp, xy in zip(fingerprints, coordinates):
+            first.setdefault(fp, xy)
+        columns = self._derived_columns_many(list(first.values()))
+        derived = {fp: (values, self._lod_rows(*xy)) for (fp, xy), values in zip(first.items(), columns)}
+        return fingerprints, derived
+
+    def insert_polygons(self, polygons: List[List[Point]], session_db: Optional[Session] = None,
+                        prepared: Optional[Tuple[List[str], Dict[str, Tuple[dict, List[dict]]]]] = None) -> List[int]:
+        """
+        Insert several polygons in a single transaction and return their IDs in the same order.
+        A polygon that already exists (in the database or earlier in the list) gets the existing ID.
+        prepared is the result of prepare_polygons(polygons), computed here when not given.
+        """
         try:
-            # Vérifier si un polygone avec ces points existe déjà et récupérer l'ID si c'est le cas
-            existing_polygon_id = self.is_polygon_exist(points)
-            if existing_polygon_id:
-                log.warning(f"Polygon with the same points already exists, ID: {existing_polygon_id}")
-                return existing_polygon_id  # Retourner l'ID du polygone existant
-
-            # Si aucun polygone n'existe, on crée un nouveau polygone
-            session_db = self.SessionLocal()
-            with session_db.begin():
-                new_polygon = PolygonORM()
-                session_db.add(new_polygon)
-                session_db.flush()
-                for p in points:
-                    p.polygon_id = new_polygon.id
-                rows_inserted = self.__insert_points(points, session_db)
-                if rows_inserted == 0:
-                    log.warning("All points already exist, database is unchanged.")
-            self.session.commit()
-            return new_polygon.id  # Retourner l'ID du nouveau polygone créé
+            fingerprints, derived = prepared or self.prepare_polygons(polygons)
+            with self._session_scope(session_db) as session_db, _transaction(session_db):
+                # Une seule requête sur l'index unique pour tout le lot
+                known = dict(session_db.execute(
+                    select(PolygonORM.fingerprint, PolygonORM.id).where(PolygonORM.fingerprint.in_(set(fingerprints)))
+                ).all())
+
+                # Nouveaux polygones (premier de chaque empreinte inconnue), insérés en une fois
+                new_fingerprints = [fp for fp in derived if fp not in known]
+                if new_fingerprints:
+                    # ON CONFLICT DO NOTHING : un polygone identique validé entre-temps par une autre
+                    # transaction n'interrompt pas le lot, il est ignoré et son ID relu ensuite
+                    table = PolygonORM.__table__
+                    inserted = dict(session_db.execute(
+                        pg_insert(table).on_conflict_do_nothing(index_elements=["fingerprint"])
+                        .returning(table.c.fingerprint, table.c.id),
+                        [{"fingerprint": fp, **derived[fp][0]} for fp in new_fingerprints],
+                    ).all())
+                    skipped = [fp for fp in new_fingerprints if fp not in inserted]
+                    if skipped:
+                        log.warning("%s polygons of the batch were inserted concurrently, reusing their IDs", len(skipped))
+                        known.update(session_db.execute(
+                            select(PolygonORM.fingerprint, PolygonORM.id).where(PolygonORM.fingerprint.in_(skipped))
+                        ).all())
+                    known.update(inserted)
+                    new_fingerprints = [fp for fp in new_fingerprints if fp in inserted]
+                    new_polygons: Dict[str, List[Point]] = {}
+                    for fp, points in zip(fingerprints, polygons):
+                        if fp in inserted:
+                            new_polygons.setdefault(fp, points)
+
+                    # Tous les points des nouveaux polygones en un seul INSERT en masse
+                    all_points = [(known[fp], p) for fp, points in new_polygons.items() for p in points]
+                    self._insert_point_columns(
+                        session_db, [pid for pid, _ in all_points], [p.x for _, p in all_points],
+                        [p.y for _, p in all_points], [p.comment for _, p in all_points])
+                    for fp in new_fingerprints:
+                        self._store_lods(session_db, known[fp], derived[fp][1])
+            return [known[fp] for fp in fingerprints]
 
         except (SQLAlchemyError, ValueError) as e:
-            log.error(f"❌ Error inserting polygon and points: {e}")
+            log.error("❌ Error inserting polygons batch: %s", e)
             raise SQLAlchemyError
+
+    def _derived_columns(self, x_values: Sequence[float], y_values: Sequence[float]) -> dict:
+        """Values of the polygons columns computed from the vertices: metrics and packed coordinates."""
+        values = polygon_metrics(x_values, y_values)
+        if self.pack_coordinates:
+            values["coordinates"] = pack_coordinates(x_values, y_values)
+        return values
+
+    def _derived_columns_many(self, polygons: Sequence[Tuple[Sequence[float], Sequence[float]]]) -> List[dict]:
+        """_derived_columns of many polygons given as (x, y), with the metrics computed in one vectorised pass."""
+        values = metric_records(polygons_metrics(*pack_polygons(polygons)))
+        if self.pack_coordinates:
+            for row, (x_values, y_values) in zip(values, polygons):
+                row["coordinates"] = pack_coordinates(x_values, y_values)
+        return values
+
+    def _lod_rows(self, x_values: Sequence[float], y_values: Sequence[float]) -> List[dict]:
+        """Rows of polygon_lods (without polygon_id) for the levels of detail of a polygon; no database access."""
+        levels = polygon_lods(x_values, y_values, self.lod_resolutions, self.lod_min_vertices)
+        return [{"level": level, "tolerance": tolerance, "vertex_count": len(xs), "coordinates": pack_coordinates(xs, ys)}
+                for level, (tolerance, xs, ys) in enumerate(levels, start=1)]
+
+    @staticmethod
+    def _store_lods(session_db: Session, polygon_id: int, rows: List[dict]) -> int:
+        if rows:
+            session_db.execute(insert(PolygonLodORM.__table__), [{"polygon_id": polygon_id, **row} for row in rows])
+        return len(rows)
+
+    def _insert_lods(self, session_db: Session, polygon_id: int, x_values: Sequence[float],
+                     y_values: Sequence[float]) -> int:
+        """Compute and insert the levels of detail of a polygon; return how many were stored."""
+        return self._store_lods(session_db, polygon_id, self._lod_rows(x_values, y_values))
+
+    def get_lod_levels(self, id: int, session_db: Optional[Session] = None) -> List[Tuple[int, float, int]]:
+        """Return the stored levels of detail of a polygon as (level, tolerance, vertex_count), finest first."""
+        with self._session_scope(session_db) as session_db:
+            rows = session_db.execute(
+                select(PolygonLodORM.level, PolygonLodORM.tolerance, PolygonLodORM.vertex_count)
+                .where(PolygonLodORM.polygon_id == id).order_by(PolygonLodORM.level)
+            ).all()
+            return [tuple(row) for row in rows]
+
+    def get_lod_columns(self, id: int, level: int, session_db: Optional[Session] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the x and y coordinates of a level of detail of a polygon (level 0: full resolution)."""
+        if level == 0:
+            return self.get_point_columns(id, session_db)
+        with self._session_scope(session_db) as session_db:
+            blob = session_db.execute(
+                select(PolygonLodORM.coordinates)
+                .where(PolygonLodORM.polygon_id == id, PolygonLodORM.level == level)
+            ).scalar()
+            return unpack_coordinates(blob or b"")
+
+    def _select_point_columns(self, polygon_id: int, session_db: Session) -> Tuple[np.ndarray, np.ndarray]:
+        """Read the x and y coordinates of a polygon from the points table, in vertex order."""
+        return _unpack_points(session_db.execute(
+            select(_packed_points()).where(PointORM.polygon_id == polygon_id)
+        ).scalar())
+
+    def get_point_columns(self, id: int, session_db: Optional[Session] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the x and y coordinates of a polygon, in vertex order, as float64 NumPy arrays
+        (empty if the polygon has no points), without building any ORM or Pydantic object.
+        The packed polygons.coordinates blob is read in one row when present, else the points
+        rows are read with a Core select. Comments are not read: see get_comments.
+        """
+        with self._session_scope(session_db) as session_db:
+            blob = session_db.execute(select(PolygonORM.coordinates).where(PolygonORM.id == id)).scalar()
+            if blob is not None:
+                return unpack_coordinates(blob)
+            return self._select_point_columns(id, session_db)
+
+    def get_points_page(self, id: int, after_id: int = 0, limit: int = 1000,
+                        session_db: Optional[Session] = None) -> List[dict]:
+        """
+        Return up to limit points (id, x, y, comment) of a polygon with a point ID greater than
+        after_id, in vertex order: keyset pages read through the (polygon_id, id) index.
+        """
+        with self._session_scope(session_db) as session_db:
+            rows = session_db.execute(
+                select(PointORM.id, PointORM.x, PointORM.y, PointORM.comment)
+                .where(PointORM.polygon_id == id, PointORM.id > after_id).order_by(PointORM.id).limit(limit)
+            ).mappings().all()
+        return [dict(row) for row in rows]
+
+    def get_comments(self, id: int, session_db: Optional[Session] = None) -> List[Optional[str]]:
+        """Return the comments of the points of a polygon, in vertex order."""
+        with self._session_scope(session_db) as session_db:
+            return session_db.execute(
+                select(PointORM.comment).where(PointORM.polygon_id == id).order_by(PointORM.id)
+            ).scalars().all()
+
+    def get_polygon_metrics(self, id: int, session_db: Optional[Session] = None) -> Optional[dict]:
+        """
+        Return the stored metrics of a polygon (None if it does not exist), read from the
+        polygons table only. Metrics missing on rows older than the metric columns are computed
+        from the points and saved on the way.
+        """
+        with self._session_scope(session_db) as session_db:
+            columns = [getattr(PolygonORM, name) for name in METRIC_COLUMNS]
+            row = session_db.execute(
+                select(PolygonORM.id, PolygonORM.fingerprint, *columns).where(PolygonORM.id == id)
+            ).mappings().first()
+            if row is None:
+                return None
+            metrics = dict(row)
+            if metrics["vertex_count"] is None:
+                metrics.update(self._save_metrics(id, session_db))
+                session_db.commit()
+            return metrics
+
+    def get_polygons_metrics(self, ids: Sequence[int], session_db: Optional[Session] = None) -> Dict[int, dict]:
+        """
+        Return {polygon ID: stored metrics} for these polygons (absent IDs are left out), in one
+        query. Metrics missing on older rows are computed for all of them in one vectorised pass
+        (geometry.polygons_metrics) and saved on the way.
+        """
+        ids = [int(i) for i in ids]
+        if not ids:
+            return {}
+        with self._session_scope(session_db) as session_db:
+            columns = [getattr(PolygonORM, name) for name in METRIC_COLUMNS]
+            rows = session_db.execute(
+                select(PolygonORM.id, PolygonORM.fingerprint, *columns).where(PolygonORM.id.in_(ids))
+            ).mappings().all()
+            metrics = {row["id"]: dict(row) for row in rows}
+            missing = [polygon_id for polygon_id, values in metrics.items() if values["vertex_count"] is None]
+            if missing:
+                for polygon_id, values in self._save_polygons_metrics(missing, session_db).items():
+                    metrics[polygon_id].update(values)
+                session_db.commit()
+            return metrics
+
+    def get_polygon_bounds(self, after_id: int = 0, session_db: Optional[Session] = None):
+        """
+        Return the IDs (int64 array) and bounding boxes (float64 array of min_x, min_y, max_x, max_y
+        rows) of the polygons with an ID greater than after_id, in ID order. Used to build the
+        in-process spatial index.
+        """
+        with self._session_scope(session_db) as session_db:
+            rows = session_db.execute(
+                select(PolygonORM.id, PolygonORM.min_x, PolygonORM.min_y, PolygonORM.max_x, PolygonORM.max_y)
+                .where(PolygonORM.id > after_id, PolygonORM.min_x.is_not(None))
+                .order_by(PolygonORM.id)
+            ).all()
+        table = np.array(rows, dtype=np.float64).reshape(-1, 5)
+        return table[:, 0].astype(np.int64), table[:, 1:]
+
+    def find_polygons_in_bbox(self, bbox: Sequence[float], after_id: int = 0, limit: int = 100,
+                              ids: Optional[Sequence[int]] = None, session_db: Optional[Session] = None) -> List[dict]:
+        """
+        Return up to limit polygons (id and bbox, in ID order, after after_id) whose bounding box
+        intersects bbox, through the GiST index on the box of the polygons. ids optionally
+        restricts the search to candidates found by the in-process spatial index.
+        """
+        min_x, min_y, max_x, max_y = bbox
+        query = (
+            select(PolygonORM.id, PolygonORM.min_x, PolygonORM.min_y, PolygonORM.max_x, PolygonORM.max_y)
+            .where(_polygon_box().op("&&")(_box(min_x, min_y, max_x, max_y)), PolygonORM.id > after_id)
+            .order_by(PolygonORM.id).limit(limit)
+        )
+        if ids is not None:
+            query = query.where(PolygonORM.id.in_([int(i) for i in ids]))
+        with self._session_scope(session_db) as session_db:
+            return [{"id": row.id, "bbox": [row.min_x, row.min_y, row.max_x, row.max_y]}
+                    for row in session_db.execute(query)]
+
+    def list_polygons(self, after_id: int = 0, limit: int = 100, session_db: Optional[Session] = None) -> List[dict]:
+        """Return up to limit polygons (id, bbox, area, vertex count) with an ID greater than after_id, in ID order."""
+        query = (
+            select(PolygonORM.id, PolygonORM.min_x, PolygonORM.min_y, PolygonORM.max_x, PolygonORM.max_y,
+                   PolygonORM.area, PolygonORM.vertex_count)
+            .where(PolygonORM.id > after_id).order_by(PolygonORM.id).limit(limit)
+        )
+        with self._session_scope(session_db) as session_db:
+            return [{"id": row.id, "bbox": [row.min_x, row.min_y, row.max_x, row.max_y], "area": row.area,
+                     "vertex_count": row.vertex_count} for row in session_db.execute(query)]
+
+    @staticmethod
+    def export_points_query(after_id: int = 0):
+        """
+        Select the points (polygon_id, x, y, comment) of the polygons with an ID greater than
+        after_id, ordered by polygon then vertex (the order of the (polygon_id, id) index, so rows
+        come without a sort). Meant to be streamed with a server-side cursor (yield_per).
+        """
+        return (
+            select(PointORM.polygon_id, PointORM.x, PointORM.y, PointORM.comment)
+            .where(PointORM.polygon_id > after_id).order_by(PointORM.polygon_id, PointORM.id)
+        )
+
+    def get_polygons_coordinates(self, ids: Sequence[int], session_db: Optional[Session] = None) -> dict:
+        """
+        Return {polygon ID: (x array, y array)} for these polygons: the packed blobs in one
+        query, then the points of the polygons without blob in a second one.
+        """
+        ids = [int(i) for i in ids]
+        if not ids:
+            return {}
+        with self._session_scope(session_db) as session_db:
+            blobs = session_db.execute(
+                select(PolygonORM.id, PolygonORM.coordinates)
+                .where(PolygonORM.id.in_(ids), PolygonORM.coordinates.is_not(None))
+            ).all()
+            coordinates = {polygon_id: unpack_coordinates(blob) for polygon_id, blob in blobs}
+            missing = [i for i in ids if i not in coordinates]
+            if not missing:
+                return coordinates
+            rows = session_db.execute(
+                select(PointORM.polygon_id, _packed_points())
+                .where(PointORM.polygon_id.in_(missing)).group_by(PointORM.polygon_id)
+            ).all()
+        coordinates.update((polygon_id, _unpack_points(blob)) for polygon_id, blob in rows)
+        return coordinates
+
+    def get_tile_geometries(self, bbox: Sequence[float], pixel_size: float, ids: Optional[Sequence[int]] = None,
+                            session_db: Optional[Session] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Return the (x array, y array) of every polygon whose bounding box intersects bbox, at the
+        detail a map tile with pixels of pixel_size needs: a polygon smaller than a pixel is read
+        as its centroid alone, a polygon with levels of detail as its coarsest level within half
+        a pixel, the others at full resolution. ids optionally restricts the search to candidates
+        found by the in-process spatial index.
+        """
+        min_x, min_y, max_x, max_y = bbox
+        query = (
+            select(PolygonORM.id, PolygonORM.centroid_x, PolygonORM.centroid_y,
+                   func.greatest(PolygonORM.max_x - PolygonORM.min_x, PolygonORM.max_y - PolygonORM.min_y) <= pixel_size)
+            .where(_polygon_box().op("&&")(_box(min_x, min_y, max_x, max_y)))
+        )
+        if ids is not None:
+            query = query.where(PolygonORM.id.in_([int(i) for i in ids]))
+        with self._session_scope(session_db) as session_db:
+            rows = session_db.execute(query).all()
+            geometries = [(np.array([x]), np.array([y])) for _, x, y, tiny in rows if tiny]
+            large = [polygon_id for polygon_id, _, _, tiny in rows if not tiny]
+            if not large:
+                return geometries
+            # Niveau le plus simple à moins d'un demi-pixel (DISTINCT ON : un niveau par polygone)
+            lods = session_db.execute(
+                select(PolygonLodORM.polygon_id, PolygonLodORM.coordinates)
+                .where(PolygonLodORM.polygon_id.in_(large), PolygonLodORM.tolerance <= pixel_size / 2)
+                .order_by(PolygonLodORM.polygon_id, PolygonLodORM.level.desc())
+                .distinct(PolygonLodORM.polygon_id)
+            ).all()
+            geometries.extend(unpack_coordinates(blob) for _, blob in lods)
+            simplified = {polygon_id for polygon_id, _ in lods}
+            full = self.get_polygons_coordinates([i for i in large if i not in simplified], session_db)
+        geometries.extend(full.values())
+        return geometries
+
+    def _save_metrics(self, polygon_id: int, session_db: Session) -> dict:
+        metrics = polygon_metrics(*self.get_point_columns(polygon_id, session_db))
+        session_db.execute(update(PolygonORM).where(PolygonORM.id == polygon_id).values(**metrics))
+        return metrics
+
+    def _save_polygons_metrics(self, ids: Sequence[int], session_db: Session) -> Dict[int, dict]:
+        """Compute the metrics of these polygons in one vectorised pass and store them (one UPDATE per polygon)."""
+        coordinates = self.get_polygons_coordinates(ids, session_db)
+        empty = (np.empty(0), np.empty(0))
+        records = metric_records(polygons_metrics(*pack_polygons([coordinates.get(i, empty) for i in ids])))
+        if records:
+            table = PolygonORM.__table__
+            session_db.execute(
+                update(table).where(table.c.id == bindparam("polygon_id")),
+                [{"polygon_id": polygon_id, **values} for polygon_id, values in zip(ids, records)])
+        return dict(zip(ids, records))
+
+    def backfill_metrics(self, batch_size: int = 1000) -> int:
+        """Compute and store the metrics of every polygon stored without them. Return the number updated."""
+        updated = 0
+        last_id = 0
+        session_db = self.SessionLocal()
+        try:
+            while True:
+                ids = session_db.execute(
+                    select(PolygonORM.id)
+                    .where(PolygonORM.vertex_count.is_(None), PolygonORM.id > last_id)
+                    .order_by(PolygonORM.id).limit(batch_size)
+                ).scalars().all()
+                if not ids:
+                    return updated
+                last_id = ids[-1]
+                self._save_polygons_metrics(ids, session_db)
+                updated += len(ids)
+                session_db.commit()
+                log.info("Metrics backfilled: %s polygons so far", updated)
         finally:
-            self.session.close()
+            session_db.close()
+
+    def backfill_coordinates(self, batch_size: int = 1000) -> int:
+        """Fill polygons.coordinates for every polygon stored without it. Return the number updated."""
+        updated = 0
+        last_id = 0
+        session_db = self.SessionLocal()
+        try:
+            while True:
+                ids = session_db.execute(
+                    select(PolygonORM.id)
+                    .where(PolygonORM.coordinates.is_(None), PolygonORM.id > last_id)
+                    .order_by(PolygonORM.id).limit(batch_size)
+                ).scalars().all()
+                if not ids:
+                    return updated
+                last_id = ids[-1]
+                for polygon_id in ids:
+                    blob = pack_coordinates(*self._select_point_columns(polygon_id, session_db))
+                    session_db.execute(update(PolygonORM).where(PolygonORM.id == polygon_id).values(coordinates=blob))
+                    updated += 1
+                session_db.commit()
+                log.info("Coordinates packed: %s polygons so far", updated)
+        finally:
+            session_db.close()
+
+    def backfill_lods(self, batch_size: int = 1000) -> int:
+        """Compute the levels of detail of the large polygons stored without them. Return the number updated."""
+        updated = 0
+        last_id = 0
+        session_db = self.SessionLocal()
+        try:
+            while True:
+                ids = session_db.execute(
+                    select(PolygonORM.id)
+                    .where(PolygonORM.vertex_count >= self.lod_min_vertices, PolygonORM.id > last_id,
+                           ~PolygonORM.lods.any())
+                    .order_by(PolygonORM.id).limit(batch_size)
+                ).scalars().all()
+                if not ids:
+                    return updated
+                last_id = ids[-1]
+                for polygon_id in ids:
+                    updated += self._insert_lods(session_db, polygon_id, *self.get_point_columns(polygon_id, session_db)) > 0
+                session_db.commit()
+                log.info("Levels of detail computed: %s polygons so far", updated)
+        finally:
+            session_db.close()
+
+    def backfill_fingerprints(self, batch_size: int = 1000) -> int:
+        """
+        Compute the fingerprint of every polygon stored without one (rows created before the
+        fingerprint column existed). Polygons whose fingerprint is already taken by another
+        polygon are duplicates: they are left without fingerprint and reported in the log.
+        Return the number of polygons updated.
+        """
+        updated = 0
+        last_id = 0
+        session_db = self.SessionLocal()
+        try:
+            while True:
+                ids = session_db.execute(
+                    select(PolygonORM.id)
+                    .where(PolygonORM.fingerprint.is_(None), PolygonORM.id > last_id)
+                    .order_by(PolygonORM.id).limit(batch_size)
+                ).scalars().all()
+                if not ids:
+                    return updated
+                last_id = ids[-1]
+                for polygon_id in ids:
+                    fingerprint = polygon_fingerprint(*self.get_point_columns(polygon_id, session_db))
+                    duplicate_of = self._find_polygon_by_fingerprint(fingerprint, session_db)
+                    if duplicate_of:
+                        log.warning("Polygon %s is a duplicate of polygon %s, left without fingerprint",
+                                    polygon_id, duplicate_of)
+                        continue
+                    session_db.execute(
+                        update(PolygonORM).where(PolygonORM.id == polygon_id).values(fingerprint=fingerprint))
+                    updated += 1
+                session_db.commit()
+                log.info("Fingerprints backfilled: %s polygons so far", updated)
+        finally:
+            session_db.close()
 
-    def get_points(self, id: Union[int, None] = None) -> List[Point]:
-        """Retrieve all points from the database or points for a specific polygon."""
-        if id is None:
-            # Si l'id est None, récupérer tous les points
-            points = self.session.query(PointORM).all()
-        else:
-            # Sinon, récupérer les points pour un polygone spécifique
-            points = self.session.query(PointORM).filter(PointORM.polygon_id == id).all()
-        # Convertir les résultats en objets Point et les retourner
-        return [Point(x=p.x, y=p.y, comment=p.comment, polygon_id=p.polygon_id) for p in points]
-
-    def __insert_points(self, points: List[Point], session_db: Session) -> int:
-        """Insert points without duplicates."""
-        row_inserted = 0
-        for p in points:
-            new_point = PointORM(**p.model_dump())
-            session_db.add(new_point)
-            row_inserted += 1
-        return row_inserted
\ No newline at end of file
+    def get_points(self, id: Union[int, None] = None, session_db: Optional[Session] = None) -> List[Point]:
+        """
+        Retrieve all points from the database or points for a specific polygon, as one list.
+        Reading whole tables this way holds every row in memory: use get_points_page or
+        export_points_query to go through many points.
+        """
+        with self._session_scope(session_db) as session_db:
+            query = select(PointORM.x, PointORM.y, PointORM.comment, PointORM.polygon_id).order_by(PointORM.id)
+            if id is not None:
+                # Récupérer les points d'un polygone spécifique, sinon tous les points
+                query = query.where(PointORM.polygon_id == id)
+            # Convertir les résultats en objets Point et les retourner
+            return [Point(x=p.x, y=p.y, comment=p.comment, polygon_id=p.polygon_id) for p in session_db.execute(query)]
@@ -0,0 +1,217 @@
+import io
+import json
+import re
+import zlib
+from typing import Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+import shapely
+
+# Formats de GET /polygons/export : ceux de /upload/batch, pour pouvoir réimporter un export, et Arrow / Parquet
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv",
+               "arrow": "application/vnd.apache.arrow.stream", "parquet": "application/vnd.apache.parquet"}
+# Formats de GET /polygon/{id}/export : ceux de /upload (le nom du format sert d'extension au fichier)
+POLYGON_MEDIA_TYPES = {"csv": "text/csv", "wkb": "application/octet-stream", "geojson": "application/geo+json",
+                       "arrow": "application/vnd.apache.arrow.file", "parquet": "application/vnd.apache.parquet"}
+# Encodages proposés selon Accept-Encoding, par ordre de préférence (Parquet est déjà compressé)
+CONTENT_ENCODINGS = ("zstd", "gzip")
+_PRECOMPRESSED = {"parquet"}
+
+PointRow = Tuple[int, float, float, Optional[str]]
+# Commentaires à mettre entre guillemets en CSV
+_CSV_SPECIAL = re.compile(r'[,"\r\n]')
+
+
+def _csv_field(comment: Optional[str]) -> str:
+    if comment is None:
+        return ""
+    if _CSV_SPECIAL.search(comment):
+        return '"' + comment.replace('"', '""') + '"'
+    return comment
+
+
+class ExportEncoder:
+    """
+    Encodes point rows (polygon_id, x, y, comment), ordered by polygon then vertex, into the
+    batch upload formats, one chunk of text per batch of rows:
+    - csv: a polygon_key,x,y,comment row per point;
+    - ndjson: a {"polygon_key": ..., "points": [...]} line per polygon.
+    Only the current polygon ID is kept between batches: a polygon line is written as its
+    points arrive, so memory does not grow with the size of the export.
+    """
+
+    def __init__(self, fmt: str = "ndjson"):
+        if fmt not in ("ndjson", "csv"):
+            raise ValueError(f"Unknown export format: {fmt}")
+        self.fmt = fmt
+        self._polygon_id = None
+
+    def start(self) -> str:
+        return "polygon_key,x,y,comment\n" if self.fmt == "csv" else ""
+
+    def encode(self, rows: Iterable[PointRow]) -> str:
+        parts = []
+        if self.fmt == "csv":
+            # Lignes formatées directement (environ deux fois plus rapide que csv.writer)
+            for polygon_id, x, y, comment in rows:
+                parts.append(f"{polygon_id},{x!r},{y!r},{_csv_field(comment)}\n")
+            return "".join(parts)
+        for polygon_id, x, y, comment in rows:
+            if polygon_id != self._polygon_id:
+                if self._polygon_id is not None:
+                    parts.append("]}\n")
+                parts.append(f'{{"polygon_key": "{polygon_id}", "points": [')
+                self._polygon_id = polygon_id
+            else:
+                parts.append(", ")
+            parts.append(f'{{"x": {x!r}, "y": {y!r}, "comment": {json.dumps(comment, ensure_ascii=False)}}}')
+        return "".join(parts)
+
+    def finish(self) -> str:
+        return "]}\n" if self.fmt == "ndjson" and self._polygon_id is not None else ""
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file holding what was written until take(), so that Arrow writers can stream."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+class TableExportEncoder:
+    """
+    Same interface as ExportEncoder for the columnar formats: point rows become polygon_id, x, y
+    and comment columns of an Arrow IPC stream (one record batch per batch of rows) or of a
+    Parquet file (one row group per batch of rows), written as they arrive.
+    """
+
+    def __init__(self, fmt: str = "arrow"):
+        import pyarrow as pa  # Importé au premier export Arrow ou Parquet
+        self._pa = pa
+        self.schema = pa.schema([("polygon_id", pa.int64()), ("x", pa.float64()), ("y", pa.float64()),
+                                 ("comment", pa.string())])
+        self._sink = _Sink()
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(pa.PythonFile(self._sink, mode="w"), self.schema)
+        elif fmt == "arrow":
+            self._writer = pa.ipc.new_stream(pa.PythonFile(self._sink, mode="w"), self.schema)
+        else:
+            raise ValueError(f"Unknown export format: {fmt}")
+
+    def start(self) -> bytes:
+        return self._sink.take()
+
+    def encode(self, rows: Sequence[PointRow]) -> bytes:
+        if not rows:
+            return b""
+        columns = [self._pa.array(values, type=field.type) for values, field in zip(zip(*rows), self.schema)]
+        self._writer.write_batch(self._pa.record_batch(columns, schema=self.schema))
+        return self._sink.take()
+
+    def finish(self) -> bytes:
+        self._writer.close()
+        return self._sink.take()
+
+
+def export_encoder(fmt: str):
+    """Encoder of GET /polygons/export for a format of MEDIA_TYPES."""
+    return TableExportEncoder(fmt) if fmt in ("arrow", "parquet") else ExportEncoder(fmt)
+
+
+def encode_polygon(fmt: str, polygon_id: int, x_values: np.ndarray, y_values: np.ndarray,
+                   comments: Optional[Sequence[Optional[str]]] = None) -> bytes:
+    """
+    Encode one polygon in an upload format of /upload (read back by ingest.read_polygon):
+    csv (x,y,comment rows), wkb (Polygon), geojson (a Feature with the comments in its properties),
+    arrow (IPC file) or parquet (x, y and comment columns).
+    """
+    if comments is None:
+        comments = [None] * len(x_values)
+    if fmt == "csv":
+        rows = zip(np.asarray(x_values).tolist(), np.asarray(y_values).tolist(), comments)
+        return ("x,y,comment\n" + "".join(f"{x!r},{y!r},{_csv_field(c)}\n" for x, y, c in rows)).encode()
+    if fmt == "wkb":
+        return shapely.to_wkb(shapely.polygons(np.column_stack((x_values, y_values))))
+    if fmt == "geojson":
+        # Anneau fermé, comme l'exige la RFC 7946
+        ring = np.column_stack((x_values, y_values))
+        feature = {"type": "Feature", "id": polygon_id, "properties": {"comments": list(comments)},
+                   "geometry": {"type": "Polygon", "coordinates": [np.vstack((ring, ring[:1])).tolist()]}}
+        return json.dumps(feature, ensure_ascii=False).encode()
+    if fmt in ("arrow", "parquet"):
+        import pyarrow as pa
+        table = pa.table({"x": pa.array(x_values, pa.float64()), "y": pa.array(y_values, pa.float64()),
+                          "comment": pa.array(comments, pa.string())})
+        sink = pa.BufferOutputStream()
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            pq.write_table(table, sink)
+        else:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+def content_encoding(fmt: str, accept_encoding: Optional[str]) -> Optional[str]:
+    """Content encoding of an export from the Accept-Encoding header (None: not compressed)."""
+    if fmt in _PRECOMPRESSED or not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return next((encoding for encoding in CONTENT_ENCODINGS if accepted.get(encoding, 0) > 0), None)
+
+
+class Compressor:
+    """
+    Streaming gzip or zstd compression of a response body. Each chunk is flushed as it is
+    compressed, so a streamed export reaches the client batch by batch.
+    """
+
+    def __init__(self, encoding: str, level: Optional[int] = None):
+        if encoding == "gzip":
+            # wbits=31 : format gzip (en-tête et CRC) plutôt que zlib
+            self._compressor = zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 31)
+            self._sync = zlib.Z_SYNC_FLUSH
+        elif encoding == "zstd":
+            import zstandard  # Importé au premier export compressé en zstd
+            self._compressor = zstandard.ZstdCompressor(level=3 if level is None else level).compressobj()
+            self._sync = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            raise ValueError(f"Unknown content encoding: {encoding}")
+
+    def compress(self, data) -> bytes:
+        if isinstance(data, str):
+            data = data.encode()
+        if not data:
+            return b""
+        return self._compressor.compress(data) + self._compressor.flush(self._sync)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
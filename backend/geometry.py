@@ -0,0 +1,322 @@
+import hashlib
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+import shapely
+
+# Graines des deux hachages 64 bits combinés dans l'empreinte (128 bits au total)
+_SEEDS = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F))
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+_MASK = (1 << 64) - 1
+
+
+def _mix(h: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, applied element-wise (uint64 arithmetic wraps around)."""
+    h = h ^ (h >> np.uint64(30))
+    h = h * _MIX_1
+    h = h ^ (h >> np.uint64(27))
+    h = h * _MIX_2
+    return h ^ (h >> np.uint64(31))
+
+
+def _as_coordinates(x_values: Sequence[float], y_values: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+    # + 0.0 normalise -0.0 en 0.0 pour que les deux aient la même empreinte
+    return np.asarray(x_values, dtype=np.float64) + 0.0, np.asarray(y_values, dtype=np.float64) + 0.0
+
+
+class FingerprintBuilder:
+    """
+    Canonical fingerprint of a polygon, computed incrementally from its vertices in order.
+
+    The polygon is normalised to its set of edges: consecutive duplicate vertices (including
+    an explicit closing vertex) are dropped and each edge is taken without direction. Every
+    edge is hashed and the hashes are summed, so the result does not depend on the starting
+    vertex (rotation) nor on the orientation of the ring, and batches can be fed one at a
+    time without keeping the vertices.
+    """
+
+    def __init__(self):
+        self._first: Optional[Tuple[float, float]] = None
+        self._last: Optional[Tuple[float, float]] = None
+        self._edges = 0
+        self._sums = [0, 0]
+
+    def update(self, x_values: Sequence[float], y_values: Sequence[float]) -> None:
+        """Add the next vertices of the polygon."""
+        xs, ys = _as_coordinates(x_values, y_values)
+        if not len(xs):
+            return
+        if self._first is None:
+            self._first = (float(xs[0]), float(ys[0]))
+        else:
+            xs = np.concatenate(([self._last[0]], xs))
+            ys = np.concatenate(([self._last[1]], ys))
+        self._last = (float(xs[-1]), float(ys[-1]))
+        self._add_edges(xs[:-1], ys[:-1], xs[1:], ys[1:])
+
+    def _add_edges(self, ax: np.ndarray, ay: np.ndarray, bx: np.ndarray, by: np.ndarray) -> None:
+        keep = (ax != bx) | (ay != by)
+        ax, ay, bx, by = ax[keep], ay[keep], bx[keep], by[keep]
+        if not len(ax):
+            return
+        # Arête non orientée : l'extrémité la plus petite (x puis y) en premier
+        swap = (ax > bx) | ((ax == bx) & (ay > by))
+        lo_x, hi_x = np.where(swap, bx, ax), np.where(swap, ax, bx)
+        lo_y, hi_y = np.where(swap, by, ay), np.where(swap, ay, by)
+        words = [v.view(np.uint64) for v in (lo_x, lo_y, hi_x, hi_y)]
+        for i, seed in enumerate(_SEEDS):
+            h = np.full(len(ax), seed, dtype=np.uint64)
+            for word in words:
+                h = _mix(h ^ word)
+            self._sums[i] = (self._sums[i] + int(h.sum(dtype=np.uint64))) & _MASK
+        self._edges += len(ax)
+
+    def hexdigest(self) -> str:
+        """Return the fingerprint (64 hex characters) of the vertices seen so far."""
+        edges, sums = self._edges, list(self._sums)
+        if self._first is not None and self._first != self._last:
+            # Arête de fermeture, calculée sur une copie pour pouvoir continuer update()
+            closing = FingerprintBuilder()
+            closing._add_edges(*(np.array([v]) for v in (*self._last, *self._first)))
+            edges += closing._edges
+            sums = [(a + b) & _MASK for a, b in zip(sums, closing._sums)]
+        payload = f"{edges}:{sums[0]:016x}:{sums[1]:016x}"
+        if edges == 0 and self._first is not None:
+            payload += f":{self._first[0]!r}:{self._first[1]!r}"
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def polygon_fingerprint(x_values: Sequence[float], y_values: Sequence[float]) -> str:
+    """Canonical fingerprint of a polygon given all its vertices (see FingerprintBuilder)."""
+    builder = FingerprintBuilder()
+    builder.update(x_values, y_values)
+    return builder.hexdigest()
+
+
+METRIC_COLUMNS = ("area", "perimeter", "min_x", "min_y", "max_x", "max_y",
+                  "centroid_x", "centroid_y", "vertex_count", "is_valid")
+
+
+def polygon_metrics(x_values: Sequence[float], y_values: Sequence[float]) -> dict:
+    """
+    Area, perimeter, bounding box, centroid, vertex count and validity of a polygon,
+    computed in one vectorised pass over its vertices (shoelace formula for area and centroid).
+    """
+    xs = np.asarray(x_values, dtype=np.float64)
+    ys = np.asarray(y_values, dtype=np.float64)
+    count = len(xs)
+    if count == 0:
+        return dict.fromkeys(METRIC_COLUMNS) | {"vertex_count": 0, "is_valid": False}
+    # Coordonnées relatives au premier sommet : limite les pertes de précision sur de grandes valeurs
+    origin_x, origin_y = xs[0], ys[0]
+    dx, dy = xs - origin_x, ys - origin_y
+    # Sommets suivants (anneau fermé)
+    next_dx, next_dy = np.roll(dx, -1), np.roll(dy, -1)
+    cross = dx * next_dy - next_dx * dy
+    signed_area = cross.sum() / 2
+    if signed_area != 0:
+        centroid_x = origin_x + ((dx + next_dx) * cross).sum() / (6 * signed_area)
+        centroid_y = origin_y + ((dy + next_dy) * cross).sum() / (6 * signed_area)
+    else:
+        centroid_x, centroid_y = xs.mean(), ys.mean()
+    return {
+        "area": float(abs(signed_area)),
+        "perimeter": float(np.hypot(next_dx - dx, next_dy - dy).sum()),
+        "min_x": float(xs.min()), "min_y": float(ys.min()),
+        "max_x": float(xs.max()), "max_y": float(ys.max()),
+        "centroid_x": float(centroid_x), "centroid_y": float(centroid_y),
+        "vertex_count": count,
+        "is_valid": polygon_is_valid(xs, ys),
+    }
+
+
+def polygon_is_valid(x_values: Sequence[float], y_values: Sequence[float]) -> bool:
+    """OGC validity of the polygon (closed simple ring with at least 3 distinct vertices)."""
+    coords = np.column_stack((np.asarray(x_values, dtype=np.float64), np.asarray(y_values, dtype=np.float64)))
+    if len(np.unique(coords, axis=0)) < 3:
+        return False
+    return bool(shapely.is_valid(shapely.polygons(coords)))
+
+
+def polygons_metrics(x_values: Sequence[float], y_values: Sequence[float], offsets: Sequence[int]) -> dict:
+    """
+    Metrics of many polygons at once (the columns of polygon_metrics, as arrays), from their
+    vertices concatenated in x_values / y_values: polygon i is [offsets[i], offsets[i + 1]).
+    One vectorised pass over the whole buffer: per-polygon sums with np.bincount, bounds with
+    reduceat and validity with shapely array functions (linearrings built with indices).
+    Polygons without vertices get NaN metrics and is_valid False.
+    """
+    xs = np.asarray(x_values, dtype=np.float64)
+    ys = np.asarray(y_values, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    n = len(offsets) - 1
+    counts = np.diff(offsets)
+    starts = offsets[:-1]
+    filled = counts > 0
+    # Polygone de chaque sommet, et sommet suivant dans son anneau (le dernier revient au premier)
+    owner = np.repeat(np.arange(n), counts)
+    following = np.arange(1, len(xs) + 1)
+    following[offsets[1:][filled] - 1] = starts[filled]
+    # Coordonnées relatives au premier sommet de chaque polygone, comme polygon_metrics
+    dx, dy = xs - xs[starts[owner]], ys - ys[starts[owner]]
+    next_dx, next_dy = dx[following], dy[following]
+    cross = dx * next_dy - next_dx * dy
+
+    def per_polygon(values: np.ndarray) -> np.ndarray:
+        return np.bincount(owner, weights=values, minlength=n)
+
+    origin_x, origin_y = np.full(n, np.nan), np.full(n, np.nan)
+    origin_x[filled], origin_y[filled] = xs[starts[filled]], ys[starts[filled]]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        signed_area = per_polygon(cross) / 2
+        flat = signed_area == 0
+        centroid_x = np.where(flat, per_polygon(xs) / counts,
+                              origin_x + per_polygon((dx + next_dx) * cross) / (6 * signed_area))
+        centroid_y = np.where(flat, per_polygon(ys) / counts,
+                              origin_y + per_polygon((dy + next_dy) * cross) / (6 * signed_area))
+    bounds = np.full((4, n), np.nan)
+    if filled.any():
+        for row, (values, reduce) in enumerate(((xs, np.minimum), (ys, np.minimum), (xs, np.maximum), (ys, np.maximum))):
+            bounds[row, filled] = reduce.reduceat(values, starts[filled])
+    return {
+        "area": np.where(filled, np.abs(signed_area), np.nan),
+        "perimeter": np.where(filled, per_polygon(np.hypot(next_dx - dx, next_dy - dy)), np.nan),
+        "min_x": bounds[0], "min_y": bounds[1], "max_x": bounds[2], "max_y": bounds[3],
+        "centroid_x": centroid_x, "centroid_y": centroid_y,
+        "vertex_count": counts,
+        "is_valid": _polygons_are_valid(xs, ys, owner, n),
+    }
+
+
+def _polygons_are_valid(xs: np.ndarray, ys: np.ndarray, owner: np.ndarray, n: int) -> np.ndarray:
+    """polygon_is_valid for each polygon of a concatenated buffer (owner: polygon of each vertex)."""
+    valid = np.zeros(n, dtype=bool)
+    if not len(xs):
+        return valid
+    # Sommets distincts par polygone : tri par (polygone, x, y) puis changements de valeur
+    order = np.lexsort((ys, xs, owner))
+    o, x, y = owner[order], xs[order], ys[order]
+    changes = np.ones(len(o), dtype=bool)
+    changes[1:] = (o[1:] != o[:-1]) | (x[1:] != x[:-1]) | (y[1:] != y[:-1])
+    buildable = np.bincount(o[changes], minlength=n) >= 3
+    # Anneaux fermés automatiquement par shapely, un par polygone d'au moins 3 sommets distincts
+    keep = buildable[owner]
+    if keep.any():
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(owner[keep], minlength=n)[buildable])))
+        valid[buildable] = shapely.is_valid(shapely_polygons(xs[keep], ys[keep], offsets))
+    return valid
+
+
+def pack_polygons(columns: Sequence[Tuple[Sequence[float], Sequence[float]]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Concatenate the (x, y) vertices of many polygons into one buffer: x and y float64 arrays and
+    offsets, polygon i being [offsets[i], offsets[i + 1]) (the input of polygons_metrics).
+    """
+    counts = [len(x_values) for x_values, _ in columns]
+    offsets = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+    if not offsets[-1]:
+        return np.empty(0), np.empty(0), offsets
+    xs = np.concatenate([np.asarray(x_values, dtype=np.float64) for x_values, _ in columns])
+    ys = np.concatenate([np.asarray(y_values, dtype=np.float64) for _, y_values in columns])
+    return xs, ys, offsets
+
+
+def shapely_polygons(x_values: np.ndarray, y_values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Array of shapely polygons from a buffer of pack_polygons, built by shapely array functions
+    (rings closed automatically) instead of one shapely.Polygon per polygon. Every polygon needs
+    at least 3 distinct vertices.
+    """
+    counts = np.diff(np.asarray(offsets, dtype=np.int64))
+    if not len(counts):
+        return np.empty(0, dtype=object)
+    rings = shapely.linearrings(np.column_stack((x_values, y_values)), indices=np.repeat(np.arange(len(counts)), counts))
+    return shapely.polygons(rings)
+
+
+def metric_records(metrics: dict) -> List[dict]:
+    """Turn the arrays of polygons_metrics into one dict per polygon, with Python values (None for NaN)."""
+    columns = {name: values.tolist() for name, values in metrics.items()}
+    records = [dict(zip(columns, values)) for values in zip(*columns.values())]
+    for record in records:
+        if record["vertex_count"] == 0:
+            record.update((name, None) for name in METRIC_COLUMNS if name not in ("vertex_count", "is_valid"))
+    return records
+
+
+# Format de la colonne polygons.coordinates : x0, y0, x1, y1, ... en float64 little-endian
+PACKED_DTYPE = np.dtype("<f8")
+
+
+def pack_coordinates(x_values: Sequence[float], y_values: Sequence[float]) -> bytes:
+    """Pack the vertices of a polygon into one blob of interleaved float64 x, y values."""
+    packed = np.empty(2 * len(x_values), dtype=PACKED_DTYPE)
+    packed[0::2] = x_values
+    packed[1::2] = y_values
+    return packed.tobytes()
+
+
+def unpack_coordinates(blob: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the x and y float64 arrays of a blob written by pack_coordinates (views, no copy)."""
+    values = np.frombuffer(blob, dtype=PACKED_DTYPE)
+    return values[0::2], values[1::2]
+
+
+def polygon_lods(x_values: Sequence[float], y_values: Sequence[float], resolutions: Sequence[int] = (4096, 1024, 256),
+                 min_vertices: int = 1024, min_reduction: float = 0.8) -> List[Tuple[float, np.ndarray, np.ndarray]]:
+    """
+    Simplified versions (levels of detail) of a polygon, finest first, as (tolerance, x, y).
+
+    For each resolution, the polygon is simplified (Douglas-Peucker) with a tolerance of half
+    a pixel when its extent is drawn on that many pixels. Each level is simplified from the
+    previous one with the remaining tolerance, so its distance to the full polygon stays within
+    its own tolerance. Simplification keeps the ring valid: when plain Douglas-Peucker breaks a
+    valid ring, the topology-preserving variant is used instead. Polygons with fewer than
+    min_vertices vertices get no level, and a level that keeps more than min_reduction of the
+    vertices of the previous one is skipped.
+    """
+    xs = np.asarray(x_values, dtype=np.float64)
+    ys = np.asarray(y_values, dtype=np.float64)
+    if len(xs) < min_vertices:
+        return []
+    extent = max(np.ptp(xs), np.ptp(ys))
+    if extent == 0:
+        return []
+    current = shapely.polygons(np.column_stack((xs, ys)))
+    check_validity = bool(shapely.is_valid(current))
+    current_tolerance, current_count = 0.0, len(xs)
+    levels = []
+    for resolution in sorted(resolutions, reverse=True):
+        tolerance = float(extent / resolution / 2)
+        simplified = shapely.simplify(current, tolerance - current_tolerance, preserve_topology=False)
+        if check_validity and not shapely.is_valid(simplified):
+            simplified = shapely.simplify(current, tolerance - current_tolerance, preserve_topology=True)
+        if shapely.get_type_id(simplified) != 3 or simplified.is_empty:  # Pas un polygone
+            continue
+        coordinates = shapely.get_coordinates(simplified.exterior)[:-1]  # Sans le sommet de fermeture
+        if len(coordinates) < 3 or len(coordinates) > min_reduction * current_count:
+            continue
+        levels.append((tolerance, coordinates[:, 0].copy(), coordinates[:, 1].copy()))
+        current, current_tolerance, current_count = simplified, tolerance, len(coordinates)
+    return levels
+
+
+def choose_lod(levels: Sequence[Tuple[int, float, int]], lod: Optional[int] = None, max_vertices: Optional[int] = None,
+               max_tolerance: Optional[float] = None) -> int:
+    """
+    Pick a level of detail among levels, given as (level, tolerance, vertex_count) with level 0
+    being the full resolution (tolerance 0) and higher levels coarser.
+      lod:           the requested level, or the coarsest stored level below it
+      max_vertices:  the finest level with at most that many vertices (the coarsest if none)
+      max_tolerance: the coarsest level whose tolerance is within it (pixel accuracy)
+    The first given criterion wins; with none, the full resolution is returned.
+    """
+    levels = sorted(levels)
+    if lod is not None:
+        return max(level for level, _, _ in levels if level <= lod)
+    if max_vertices is not None:
+        fitting = [level for level, _, count in levels if count <= max_vertices]
+        return min(fitting) if fitting else levels[-1][0]
+    if max_tolerance is not None:
+        return max(level for level, tolerance, _ in levels if tolerance <= max_tolerance)
+    return 0
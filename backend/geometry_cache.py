@@ -0,0 +1,213 @@
+import asyncio
+import math
+import struct
+import time
+from configparser import ConfigParser
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from geometry import pack_coordinates, unpack_coordinates
+from logger_manager import get_logger
+from render_cache import RenderCache
+
+log = get_logger(__name__)
+
+Columns = Tuple[np.ndarray, np.ndarray]
+# En-tête des blobs du tier partagé : marque et échéance (horloge murale, commune aux process)
+_DISK_HEADER = struct.Struct(">4sd")
+_DISK_MAGIC = b"GEO1"
+
+
+class GeometryCache(RenderCache):
+    """
+    Read-through cache of polygon coordinates in front of the database, keyed by polygon ID and
+    level of detail. Entries are packed blobs (format of polygons.coordinates) held in the LRU
+    byte budget of RenderCache, each for at most `ttl` seconds, backed by an optional tier shared
+    by the API processes of one host (a directory, ideally in memory such as /dev/shm), whose
+    blobs carry their expiry time so that the ttl applies to both tiers.
+    Concurrent misses on one key share a single database read (load); a read started before an
+    invalidation is not stored (put_if_current).
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 300, levels: int = 3,
+                 shared_dir: Optional[str] = None, shared_max_bytes: int = 256 * 1024 * 1024):
+        super().__init__(max_bytes=max_bytes, disk_dir=shared_dir, disk_max_bytes=shared_max_bytes)
+        self.ttl = ttl
+        # Niveau de détail le plus simple : une invalidation retire les niveaux 0 à levels
+        self.levels = levels
+        self._expires: Dict[str, float] = {}
+        # Échéance (horloge monotone) d'une entrée lue sur le disque, reprise par _memory_put
+        self._disk_expires: Dict[str, float] = {}
+        self.generation = 0
+        self._loading: Dict[str, asyncio.Future] = {}
+        self.loads = 0
+        self.coalesced = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_config(cls, config_file: str) -> "GeometryCache":
+        """Build a cache from the [geometry_cache] section of the ini file (defaults if absent)."""
+        config = ConfigParser()
+        config.read(config_file)
+        section = config["geometry_cache"] if config.has_section("geometry_cache") else {}
+        return cls(
+            max_bytes=int(section.get("max_bytes", 64 * 1024 * 1024)),
+            ttl=float(section.get("ttl", 300)),
+            levels=len(config.get("lod", "resolutions", fallback="4096,1024,256").split(",")),
+            shared_dir=section.get("shared_dir") or None,
+            shared_max_bytes=int(section.get("shared_max_bytes", 256 * 1024 * 1024)),
+        )
+
+    @staticmethod
+    def key(polygon_id: int, level: int = 0) -> str:
+        return f"{int(polygon_id)}-{int(level)}"
+
+    def _memory_get(self, key: str) -> Optional[bytes]:
+        """Memory hit younger than ttl; an expired entry is dropped and the key looked up in the shared tier."""
+        with self._lock:
+            expires = self._expires.get(key)
+            if expires is not None and expires <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+        return super()._memory_get(key)
+
+    async def load(self, polygon_id: int, level: int, fetch: Callable[[], Awaitable[Columns]]) -> Columns:
+        """
+        Return the x and y coordinates of a level of detail of a polygon from the cache, else
+        from fetch() (stored unless empty). A miss on a key already being read waits for that
+        read instead of going to the database again.
+        """
+        key = self.key(polygon_id, level)
+        while True:
+            blob = await self.get_async(key)
+            if blob is not None:
+                return unpack_coordinates(blob)
+            pending = self._loading.get(key)
+            if pending is None:
+                break
+            with self._lock:
+                self.coalesced += 1
+            columns = await asyncio.shield(pending)
+            if columns is not None:
+                return columns
+            # Lecture abandonnée (erreur ou annulation de la requête qui la faisait) : nouvel essai
+
+        pending = asyncio.get_running_loop().create_future()
+        self._loading[key] = pending
+        columns = None
+        try:
+            with self._lock:
+                self.loads += 1
+                generation = self.generation
+            columns = await fetch()
+            if len(columns[0]):
+                await self._off_loop(self.put_if_current, key, pack_coordinates(*columns), generation)
+            return columns
+        finally:
+            del self._loading[key]
+            pending.set_result(columns)
+
+    async def load_many(self, polygon_ids: Sequence[int],
+                        fetch: Callable[[List[int]], Awaitable[Dict[int, Columns]]]) -> Dict[int, Columns]:
+        """Return {polygon ID: (x, y)} at full resolution: hits from the cache, all the misses with one fetch."""
+        coordinates, missing = {}, []
+        blobs = await self.get_many_async([self.key(polygon_id) for polygon_id in polygon_ids])
+        for polygon_id, blob in zip(polygon_ids, blobs):
+            if blob is None:
+                missing.append(int(polygon_id))
+            else:
+                coordinates[int(polygon_id)] = unpack_coordinates(blob)
+        if missing:
+            with self._lock:
+                self.loads += 1
+                generation = self.generation
+            fetched = await fetch(missing)
+            blobs = {self.key(polygon_id): pack_coordinates(*columns)
+                     for polygon_id, columns in fetched.items() if len(columns[0])}
+            await self._off_loop(lambda: [self.put_if_current(key, blob, generation) for key, blob in blobs.items()])
+            coordinates.update(fetched)
+        return coordinates
+
+    def put_if_current(self, key: str, data: bytes, generation: int) -> bool:
+        """Store a blob read when the cache was at this generation, unless polygons were invalidated since."""
+        with self._lock:
+            if generation != self.generation:
+                return False
+            self._memory_put(key, data)
+        self._disk_put(key, data)
+        with self._lock:
+            current = generation == self.generation
+        if not current:
+            # Invalidation pendant l'écriture sur le disque : le fichier peut être périmé
+            self._disk_remove(key)
+        return current
+
+    def invalidate(self, polygon_ids: Sequence[int]) -> int:
+        """Drop every level of these polygons from both tiers; return how many entries were dropped."""
+        keys = [self.key(polygon_id, level) for polygon_id in polygon_ids for level in range(self.levels + 1)]
+        if not keys:
+            return 0
+        dropped = 0
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                dropped += self._drop(key)
+        for key in keys:
+            dropped += self._disk_remove(key)
+        with self._lock:
+            self.invalidations += dropped
+        return dropped
+
+    def clear(self) -> None:
+        super().clear()
+        with self._lock:
+            self._expires.clear()
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        with self._lock:
+            stats.update(ttl=self.ttl, loads=self.loads, coalesced=self.coalesced, expirations=self.expirations,
+                         invalidations=self.invalidations, generation=self.generation)
+        return stats
+
+    def _memory_put(self, key: str, data: bytes) -> None:
+        # Entrée lue sur le disque : elle garde l'échéance écrite avec elle, sans repartir pour ttl secondes
+        expires = self._disk_expires.pop(key, None)
+        super()._memory_put(key, data)
+        if key in self._entries and self.ttl:
+            self._expires[key] = time.monotonic() + self.ttl if expires is None else expires
+        # Échéances des entrées évincées par le budget : nettoyées quand elles deviennent majoritaires
+        if len(self._expires) > 2 * len(self._entries) + 64:
+            self._expires = {k: v for k, v in self._expires.items() if k in self._entries}
+
+    def _drop(self, key: str) -> int:
+        """Remove a key from the memory tier (lock held); return 1 if it was there."""
+        self._expires.pop(key, None)
+        data = self._entries.pop(key, None)
+        if data is None:
+            return 0
+        self._size -= len(data)
+        return 1
+
+    def _disk_put(self, key: str, data: bytes) -> None:
+        expires = time.time() + self.ttl if self.ttl else math.inf
+        super()._disk_put(key, _DISK_HEADER.pack(_DISK_MAGIC, expires) + data)
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        """Blob of the shared tier without its header; None (and the file removed) once expired."""
+        blob = super()._disk_get(key)
+        if blob is None:
+            return None
+        magic, expires = _DISK_HEADER.unpack_from(blob) if len(blob) >= _DISK_HEADER.size else (None, 0.0)
+        remaining = expires - time.time()
+        if magic != _DISK_MAGIC or remaining <= 0:
+            # Entrée expirée, ou écrite dans un ancien format sans en-tête
+            self._disk_remove(key)
+            if magic == _DISK_MAGIC:
+                with self._lock:
+                    self.expirations += 1
+            return None
+        with self._lock:
+            if remaining != math.inf:
+                self._disk_expires[key] = time.monotonic() + remaining
+        return blob[_DISK_HEADER.size:]
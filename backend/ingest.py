@@ -0,0 +1,487 @@
+import asyncio
+import codecs
+import csv
+import gzip
+import json
+import threading
+import time
+import zlib
+from array import array
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple, TypeVar
+import numpy as np
+import shapely
+from fastapi import UploadFile
+from pydantic import ValidationError
+from metrics import StageTimer, current_timer, stage
+from model import Point
+
+# Règles de validation communes à /upload et /upload/batch
+MIN_POLYGON_POINTS = 3
+POINT_COLUMNS = ("x", "y", "comment")
+CHUNK_SIZE = 64 * 1024
+# Longueur maximale d'une ligne CSV (ValueError au-delà) : un fichier sans retour à la ligne ne grossit pas sans fin
+MAX_LINE_LENGTH = 1024 * 1024
+# Formats d'un polygone acceptés par /upload, selon l'extension du fichier, et compressions
+# (extension finale, ex. polygon.parquet ou polygon.wkb.zst)
+UPLOAD_FORMATS = {".csv": "csv", ".wkb": "wkb", ".geojson": "geojson", ".json": "geojson",
+                  ".arrow": "arrow", ".feather": "arrow", ".parquet": "parquet"}
+COMPRESSIONS = {".gz": "gzip", ".zst": "zstd"}
+FORMAT_NAMES = {"csv": "CSV", "wkb": "WKB", "geojson": "GeoJSON", "arrow": "Arrow", "parquet": "Parquet"}
+
+T = TypeVar("T")
+_END = object()
+
+
+class TooManyPoints(Exception):
+    """Raised when an upload goes over the configured maximum number of points."""
+
+
+class FileTooLarge(Exception):
+    """Raised when an upload read whole goes over the configured maximum size (once decompressed)."""
+
+
+def polygon_error(point_count: int) -> Optional[str]:
+    """Return why a polygon with this many points cannot be stored, or None if it can."""
+    if point_count < MIN_POLYGON_POINTS:
+        return f"A polygon must have at least {MIN_POLYGON_POINTS} points."
+    return None
+
+
+def parse_csv_header(line: str, columns: Sequence[str] = POINT_COLUMNS) -> Tuple[Dict[str, int], int]:
+    """
+    Return the index of each required column of a CSV header and the number of columns.
+    Raise ValueError if a required column is missing.
+    """
+    names = [name.strip() for name in split_csv_row(line)]
+    missing = [column for column in columns if column not in names]
+    if missing:
+        raise ValueError(f"Missing CSV columns: {', '.join(missing)}")
+    return {column: names.index(column) for column in columns}, len(names)
+
+
+def split_csv_row(line: str) -> List[str]:
+    """Split a CSV row into fields; quoted fields (RFC 4180, as written by the exports) are unquoted."""
+    if '"' not in line:
+        return line.split(",")  # Cas courant, sans guillemets : bien plus rapide que csv.reader
+    return next(csv.reader([line]))
+
+
+def parse_csv_row(line: str, width: int) -> List[str]:
+    """Split a CSV row and check it has exactly as many fields as the header."""
+    fields = split_csv_row(line)
+    if len(fields) != width:
+        raise ValueError(f"Expected {width} values, got {len(fields)}")
+    return fields
+
+
+def parse_csv_point(fields: List[str], columns: Dict[str, int]) -> Point:
+    """Build a Point from the fields of a CSV row (ValueError if x or y are not numbers)."""
+    return Point(x=float(fields[columns["x"]]), y=float(fields[columns["y"]]), comment=fields[columns["comment"]])
+
+
+async def iter_lines(upload: UploadFile, chunk_size: int = CHUNK_SIZE,
+                     max_line_length: Optional[int] = MAX_LINE_LENGTH, quoted: bool = False) -> AsyncIterator[str]:
+    """
+    Yield the lines of an uploaded file, reading it chunk by chunk.
+    Blank lines are skipped; invalid UTF-8 raises UnicodeDecodeError (a ValueError), and so does
+    a line longer than `max_line_length` characters (None: no limit).
+    With quoted=True (CSV), a line opening a quoted field is yielded together with the next ones
+    up to the line closing it, as one record: the lines inside the field are kept as they are
+    (blank lines, \\r\\n). The open field is tracked by the parity of the number of quotes of each
+    line, so each line is scanned once; the record is bounded by max_line_length, and an
+    unterminated field raises ValueError.
+    Each chunk is scanned once: the end of a line cut by a chunk is kept as a list of pieces,
+    joined when its newline arrives, so time and memory stay linear even for very long lines.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending: List[str] = []  # Morceaux de la ligne en cours, pas encore terminée
+    pending_size = 0
+    record: Optional[List[str]] = None  # Lignes brutes d'un enregistrement dont un champ entre guillemets est ouvert
+    record_size = 0
+    eof = False
+    while not eof:
+        with stage("read"):
+            chunk = await upload.read(chunk_size)
+        with stage("decode"):
+            if chunk:
+                text = decoder.decode(chunk)
+            else:
+                text, eof = decoder.decode(b"", final=True), True
+            lines = text.split("\n")
+            if len(lines) == 1 and not eof:
+                pending.append(text)
+                pending_size += len(text)
+                if max_line_length is not None and pending_size > max_line_length:
+                    raise ValueError(f"Line longer than {max_line_length} characters")
+                continue
+            if pending:
+                lines[0] = "".join(pending) + lines[0]
+                if max_line_length is not None and len(lines[0]) > max_line_length:
+                    raise ValueError(f"Line longer than {max_line_length} characters")
+                pending, pending_size = [], 0
+            if not eof:
+                tail = lines.pop()
+                if tail:
+                    pending, pending_size = [tail], len(tail)
+        for line in lines:
+            if record is not None:
+                record.append(line)
+                record_size += len(line) + 1
+                if max_line_length is not None and record_size > max_line_length:
+                    raise ValueError(f"Quoted field longer than {max_line_length} characters")
+                # Nombre impair de guillemets : le champ ouvert se ferme sur cette ligne
+                if line.count('"') % 2:
+                    yield "\n".join(record).rstrip("\r")
+                    record = None
+                continue
+            if quoted and '"' in line and line.count('"') % 2 and _quote_open(line):
+                record, record_size = [line], len(line)
+                continue
+            line = line.rstrip("\r")
+            if line.strip():
+                yield line
+    if record is not None:
+        raise ValueError("Unterminated quoted field")
+
+
+def _quote_open(record: str) -> bool:
+    """True if the record ends inside a quoted field (its next line continues the field)."""
+    try:
+        next(csv.reader([record], strict=True))
+    except csv.Error as exc:
+        return "unexpected end of data" in str(exc)
+    return False
+
+
+class PointBatch:
+    """A bounded batch of parsed points, stored column-wise in compact float arrays."""
+
+    def __init__(self, x=None, y=None, comments: Optional[List[Optional[str]]] = None):
+        self.x = array("d") if x is None else x
+        self.y = array("d") if y is None else y
+        self.comments: List[Optional[str]] = [] if comments is None else comments
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+
+async def iter_csv_point_batches(upload: UploadFile, batch_size: int, max_points: Optional[int] = None,
+                                 max_line_length: Optional[int] = MAX_LINE_LENGTH) -> AsyncIterator[PointBatch]:
+    """
+    Parse an x,y,comment CSV upload incrementally and yield batches of at most `batch_size` points.
+    Only one chunk of the file and one batch are held in memory at a time. A malformed row
+    raises ValueError as soon as it is read, going over `max_points` raises TooManyPoints.
+    """
+    lines = iter_lines(upload, max_line_length=max_line_length, quoted=True)
+    try:
+        header_line = await lines.__anext__()
+    except StopAsyncIteration:
+        raise ValueError("Empty CSV")
+    columns, width = parse_csv_header(header_line)
+    x_index, y_index, comment_index = columns["x"], columns["y"], columns["comment"]
+
+    batch = PointBatch()
+    count = 0
+    # Temps de parsing : temps passé dans la boucle, hors lecture et décodage (mesurés par iter_lines)
+    timer = current_timer()
+    start, io_before = _parse_clock(timer)
+    async for line in lines:
+        fields = parse_csv_row(line, width)
+        batch.x.append(float(fields[x_index]))
+        batch.y.append(float(fields[y_index]))
+        batch.comments.append(fields[comment_index])
+        count += 1
+        if max_points is not None and count > max_points:
+            raise TooManyPoints(f"A polygon can have at most {max_points} points.")
+        if len(batch) >= batch_size:
+            _add_parse_time(timer, start, io_before)
+            yield batch
+            batch = PointBatch()
+            start, io_before = _parse_clock(timer)
+    _add_parse_time(timer, start, io_before)
+    if len(batch):
+        yield batch
+
+
+def upload_format(filename: str) -> Tuple[Optional[str], Optional[str]]:
+    """Return the (format, compression) of an uploaded file from its name; format is None if not supported."""
+    name, compression = filename.lower(), None
+    for suffix, codec in COMPRESSIONS.items():
+        if name.endswith(suffix):
+            name, compression = name[:-len(suffix)], codec
+    fmt = next((fmt for suffix, fmt in UPLOAD_FORMATS.items() if name.endswith(suffix)), None)
+    return fmt, compression
+
+
+class _DecompressedFile:
+    """
+    Read side of a compressed upload: data is decompressed as it is read, corrupt data raises ValueError
+    and FileTooLarge is raised as soon as more than max_bytes bytes come out of the decompressor.
+    """
+
+    def __init__(self, file, compression: str, max_bytes: Optional[int] = None):
+        if compression == "gzip":
+            self._file = gzip.GzipFile(fileobj=file, mode="rb")
+            self._errors = (OSError, EOFError, zlib.error)
+        else:
+            import zstandard  # Importé au premier upload compressé en zstd
+            self._file = zstandard.ZstdDecompressor().stream_reader(file)
+            self._errors = (zstandard.ZstdError,)
+        self._max_bytes = max_bytes
+        self._size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if self._max_bytes is not None and (size is None or size < 0):
+            # Lecture complète découpée, pour ne jamais décompresser plus que la limite d'un coup
+            chunks = []
+            while True:
+                chunk = self.read(16 * CHUNK_SIZE)
+                if not chunk:
+                    return b"".join(chunks)
+                chunks.append(chunk)
+        try:
+            data = self._file.read(size)
+        except self._errors as exc:
+            raise ValueError(f"Cannot decompress the file: {exc}")
+        self._size += len(data)
+        # Compté pour tous les formats : quelques Ko compressés peuvent donner des Go de texte
+        if self._max_bytes is not None and self._size > self._max_bytes:
+            raise FileTooLarge(f"A file can have at most {self._max_bytes} bytes once decompressed.")
+        return data
+
+    def close(self) -> None:
+        self._file.close()
+
+
+async def iter_in_thread(items: AsyncIterator[T]) -> AsyncIterator[T]:
+    """
+    Iterate an async iterator on an event loop of its own, in a worker thread: reading, decoding
+    and parsing each item happen there, so a long upload handled in the background does not hold
+    the caller's event loop. Items are produced one at a time, when the caller asks for them.
+    """
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, name="ingest-parse", daemon=True)
+    thread.start()
+
+    async def next_item():
+        # Fin signalée par une valeur sentinelle, transmise comme un élément
+        try:
+            return await items.__anext__()
+        except StopAsyncIteration:
+            return _END
+
+    async def close():
+        aclose = getattr(items, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    try:
+        while True:
+            item = await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(next_item(), loop))
+            if item is _END:
+                return
+            yield item
+    finally:
+        try:
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(close(), loop))
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            await asyncio.to_thread(thread.join)
+            loop.close()
+
+
+def decompressed(upload: UploadFile, compression: Optional[str], max_bytes: Optional[int] = None) -> UploadFile:
+    """The upload read through its decompressor (unchanged without compression), bounded to max_bytes once decompressed."""
+    if compression is None:
+        return upload
+    return UploadFile(file=_DecompressedFile(upload.file, compression, max_bytes), filename=upload.filename)
+
+
+async def read_limited(upload: UploadFile, max_bytes: Optional[int] = None,
+                       chunk_size: int = 16 * CHUNK_SIZE) -> bytes:
+    """Read a whole upload chunk by chunk; FileTooLarge as soon as it goes over max_bytes."""
+    chunks, size = [], 0
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            return b"".join(chunks)
+        size += len(chunk)
+        # Vérifié à chaque morceau : un petit fichier compressé ne peut pas se décompresser sans limite
+        if max_bytes is not None and size > max_bytes:
+            raise FileTooLarge(f"A file can have at most {max_bytes} bytes once decompressed.")
+        chunks.append(chunk)
+
+
+async def iter_polygon_batches(upload: UploadFile, fmt: str, batch_size: int, max_points: Optional[int] = None,
+                               max_bytes: Optional[int] = None) -> AsyncIterator[PointBatch]:
+    """
+    Decode the polygon of a WKB, GeoJSON, Arrow IPC or Parquet upload (see read_polygon) and yield
+    it in batches of at most `batch_size` points, like iter_csv_point_batches. The file is read
+    whole (its coordinates are needed at once), up to `max_bytes`, then decoded outside the event loop.
+    """
+    with stage("read"):
+        data = await read_limited(upload, max_bytes)
+    with stage("parse"):
+        x_values, y_values, comments = await asyncio.to_thread(read_polygon, data, fmt)
+    if max_points is not None and len(x_values) > max_points:
+        raise TooManyPoints(f"A polygon can have at most {max_points} points.")
+    for start in range(0, len(x_values), batch_size):
+        end = start + batch_size
+        yield PointBatch(x_values[start:end], y_values[start:end], comments[start:end])
+
+
+def read_polygon(data: bytes, fmt: str) -> Tuple[np.ndarray, np.ndarray, List[Optional[str]]]:
+    """
+    Return the x and y float64 arrays and the comments of the polygon of an upload:
+    - wkb: a Polygon without holes (no comments);
+    - geojson: a Polygon geometry, a Feature or a FeatureCollection of one Feature, without
+      holes; comments from the "comments" property (one per vertex) when present;
+    - arrow (IPC file or stream) and parquet: a table with x, y and optionally comment columns.
+    Binary formats are decoded straight into coordinate arrays, without text parsing. The closing
+    vertex of a ring is dropped (the rings are stored open, as in CSV). Raise ValueError if malformed.
+    """
+    if fmt in ("arrow", "parquet"):
+        return _read_table(data, fmt)
+    if fmt == "wkb":
+        try:
+            geometry = shapely.from_wkb(data)
+        except shapely.errors.GEOSException as exc:
+            raise ValueError(f"Invalid WKB: {exc}")
+        if not isinstance(geometry, shapely.Polygon) or len(geometry.interiors):
+            raise ValueError("WKB must be a Polygon without holes")
+        coordinates, comments = shapely.get_coordinates(geometry.exterior), None
+    elif fmt == "geojson":
+        coordinates, comments = _geojson_ring(json.loads(data))
+    else:
+        raise ValueError(f"Unknown upload format: {fmt}")
+    if len(coordinates) > 1 and np.array_equal(coordinates[0], coordinates[-1]):
+        coordinates = coordinates[:-1]
+    if comments is None or len(comments) != len(coordinates):
+        comments = [None] * len(coordinates)
+    return np.ascontiguousarray(coordinates[:, 0]), np.ascontiguousarray(coordinates[:, 1]), comments
+
+
+def _geojson_ring(document) -> Tuple[np.ndarray, Optional[list]]:
+    """Exterior ring (n x 2 array) and per-vertex comments of a GeoJSON polygon document."""
+    try:
+        if document["type"] == "FeatureCollection":
+            if len(document["features"]) != 1:
+                raise ValueError("GeoJSON FeatureCollection must hold exactly one Feature")
+            document = document["features"][0]
+        comments = None
+        if document["type"] == "Feature":
+            comments = (document.get("properties") or {}).get("comments")
+            document = document["geometry"]
+        if document["type"] != "Polygon" or len(document["coordinates"]) != 1:
+            raise ValueError("GeoJSON geometry must be a Polygon without holes")
+        ring = np.asarray(document["coordinates"][0], dtype=np.float64)
+    except (KeyError, TypeError, IndexError) as exc:
+        raise ValueError(f"Invalid GeoJSON: {exc}")
+    if ring.ndim != 2 or ring.shape[1] < 2:
+        raise ValueError("GeoJSON positions must be [x, y] pairs")
+    return ring[:, :2], comments
+
+
+def _read_table(data: bytes, fmt: str) -> Tuple[np.ndarray, np.ndarray, List[Optional[str]]]:
+    """Columns x, y (float64, without nulls) and comment of an Arrow IPC or Parquet table."""
+    import pyarrow as pa  # Importés au premier upload Arrow ou Parquet
+    import pyarrow.parquet as pq
+    try:
+        if fmt == "parquet":
+            table = pq.read_table(pa.BufferReader(data))
+        elif data[:6] == b"ARROW1":
+            table = pa.ipc.open_file(pa.BufferReader(data)).read_all()
+        else:
+            table = pa.ipc.open_stream(pa.BufferReader(data)).read_all()
+    except (pa.ArrowException, OSError) as exc:
+        raise ValueError(f"Invalid {FORMAT_NAMES[fmt]} file: {exc}")
+    missing = [name for name in ("x", "y") if name not in table.column_names]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    columns = []
+    for name in ("x", "y"):
+        column = table.column(name)
+        if column.null_count or not (pa.types.is_floating(column.type) or pa.types.is_integer(column.type)):
+            raise ValueError(f"Column {name} must hold numbers without nulls")
+        columns.append(column.to_numpy().astype(np.float64, copy=False))
+    if "comment" in table.column_names:
+        comments = table.column("comment").cast(pa.string()).to_pylist()
+    else:
+        comments = [None] * table.num_rows
+    return columns[0], columns[1], comments
+
+
+def _parse_clock(timer: Optional[StageTimer]) -> Tuple[float, float]:
+    return time.perf_counter(), timer.total("read", "decode") if timer else 0.0
+
+
+def _add_parse_time(timer: Optional[StageTimer], start: float, io_before: float) -> None:
+    if timer is not None:
+        timer.add("parse", time.perf_counter() - start - (timer.total("read", "decode") - io_before))
+
+
+PolygonItem = Tuple[str, Optional[List[Point]], Optional[str]]
+
+
+async def iter_batch_csv(upload: UploadFile,
+                         max_line_length: Optional[int] = MAX_LINE_LENGTH) -> AsyncIterator[PolygonItem]:
+    """
+    Yield (polygon_key, points, error) for each polygon of a batch CSV.
+    The file has a `polygon_key` column in addition to x,y,comment; the rows of a
+    polygon must be contiguous so that each polygon is complete as soon as the key changes.
+    A malformed header (or a line longer than max_line_length) raises ValueError, a malformed
+    row only fails its own polygon.
+    """
+    lines = iter_lines(upload, max_line_length=max_line_length, quoted=True)
+    try:
+        header_line = await lines.__anext__()
+    except StopAsyncIteration:
+        raise ValueError("Empty CSV")
+    columns, width = parse_csv_header(header_line, ("polygon_key",) + POINT_COLUMNS)
+
+    seen = set()
+    key, points, error = None, [], None
+    line_number = 1
+    async for line in lines:
+        row_line = line_number + 1  # Ligne où commence l'enregistrement
+        line_number = row_line + line.count("\n")
+        fields = split_csv_row(line)
+        row_key = fields[columns["polygon_key"]].strip() if len(fields) > columns["polygon_key"] else ""
+        if row_key != key:
+            if key is not None:
+                yield key, points if error is None else None, error
+            key, points, error = row_key, [], None
+            if row_key in seen:
+                error = f"Rows of polygon_key '{row_key}' are not contiguous (line {row_line})."
+            seen.add(row_key)
+        if error is not None:
+            continue
+        try:
+            if len(fields) != width:
+                raise ValueError(f"Expected {width} values, got {len(fields)}")
+            points.append(parse_csv_point(fields, columns))
+        except ValueError:
+            error = f"CSV is malformed (line {row_line})."
+    if key is not None:
+        yield key, points if error is None else None, error
+
+
+async def iter_batch_ndjson(upload: UploadFile,
+                            max_line_length: Optional[int] = None) -> AsyncIterator[PolygonItem]:
+    """
+    Yield (polygon_key, points, error) for each line of an NDJSON batch, one polygon per line:
+    {"polygon_key": "a", "points": [{"x": 1.0, "y": 2.0, "comment": "..."}, ...]}
+    The key defaults to the line number. A line longer than max_line_length raises ValueError.
+    """
+    line_number = 0
+    async for line in iter_lines(upload, max_line_length=max_line_length):
+        line_number += 1
+        key = str(line_number)
+        try:
+            item = json.loads(line)
+            key = str(item.get("polygon_key", key))
+            points = [Point(x=p["x"], y=p["y"], comment=p.get("comment")) for p in item["points"]]
+        except (ValueError, ValidationError, KeyError, TypeError, AttributeError):
+            yield key, None, f"NDJSON is malformed (line {line_number})."
+            continue
+        yield key, points, None
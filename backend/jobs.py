@@ -0,0 +1,281 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from configparser import ConfigParser
+from contextlib import closing
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from logger_manager import get_logger
+
+log = get_logger(__name__)
+
+# Résultat d'une tâche : contenu et type MIME (JSON d'un upload, image d'un rendu)
+JobResult = Tuple[bytes, str]
+
+STATES = ("queued", "running", "done", "failed")
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue already holds queue_depth jobs waiting for a worker."""
+
+
+class Job:
+    """One background job: state, timestamps (epoch seconds) and result or error."""
+
+    def __init__(self, kind: str, id: Optional[str] = None, status: str = "queued",
+                 created_at: Optional[float] = None, started_at: Optional[float] = None,
+                 finished_at: Optional[float] = None, media_type: Optional[str] = None,
+                 result: Optional[bytes] = None, status_code: Optional[int] = None,
+                 error: Optional[str] = None):
+        self.id = id or uuid.uuid4().hex
+        self.kind = kind
+        self.status = status
+        self.created_at = created_at if created_at is not None else time.time()
+        self.started_at = started_at
+        self.finished_at = finished_at
+        self.media_type = media_type
+        self.result = result
+        # Code HTTP de la réponse qu'aurait donnée la requête synchrone (200, ou celui de l'erreur)
+        self.status_code = status_code
+        self.error = error
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> dict:
+        """Public status of the job (without its result)."""
+        status = {"id": self.id, "kind": self.kind, "status": self.status, "created_at": self.created_at,
+                  "started_at": self.started_at, "finished_at": self.finished_at}
+        if self.status == "done":
+            status["result_url"] = f"/jobs/{self.id}/result"
+        elif self.status == "failed":
+            status["status_code"] = self.status_code
+            status["error"] = self.error
+        return status
+
+
+class MemoryJobStore:
+    """Jobs of this process in a dict; finished jobs are dropped `ttl` seconds after their end."""
+
+    def __init__(self, ttl: float = 3600):
+        self.ttl = ttl
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def save(self, job: Job) -> None:
+        with self._lock:
+            self._jobs[job.id] = job
+
+    def get(self, id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(id)
+
+    def purge(self) -> int:
+        """Drop the jobs finished for longer than ttl; return how many were dropped."""
+        limit = time.time() - self.ttl
+        with self._lock:
+            expired = [id for id, job in self._jobs.items() if job.finished and job.finished_at < limit]
+            for id in expired:
+                del self._jobs[id]
+        return len(expired)
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict.fromkeys(STATES, 0)
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
+
+
+class SQLiteJobStore:
+    """
+    Jobs in a SQLite file, shared by the API processes of one host: a job queued by one worker
+    process can be polled through any other. The jobs still run in the process that queued them.
+    One short connection per call (WAL journal), closed at its end, so that it can be used
+    from any thread. Calls block on the file: JobQueue runs them off the event loop.
+    """
+
+    _COLUMNS = ("id", "kind", "status", "created_at", "started_at", "finished_at",
+                "media_type", "result", "status_code", "error")
+
+    def __init__(self, path: str, ttl: float = 3600):
+        self.path = path
+        self.ttl = ttl
+        with closing(self._connect()) as connection, connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+                "created_at REAL NOT NULL, started_at REAL, finished_at REAL, media_type TEXT, result BLOB, "
+                "status_code INTEGER, error TEXT)")
+            connection.execute("CREATE INDEX IF NOT EXISTS ix_jobs_finished_at ON jobs (finished_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=10)
+        # Journal WAL : pas de fsync à chaque changement d'état
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def save(self, job: Job) -> None:
+        values = tuple(getattr(job, column) for column in self._COLUMNS)
+        with closing(self._connect()) as connection, connection:
+            connection.execute(f"INSERT OR REPLACE INTO jobs ({', '.join(self._COLUMNS)}) "
+                               f"VALUES ({', '.join('?' * len(self._COLUMNS))})", values)
+
+    def get(self, id: str) -> Optional[Job]:
+        with closing(self._connect()) as connection:
+            row = connection.execute(f"SELECT {', '.join(self._COLUMNS)} FROM jobs WHERE id = ?", (id,)).fetchone()
+        return Job(**dict(zip(self._COLUMNS, row))) if row else None
+
+    def purge(self) -> int:
+        with closing(self._connect()) as connection, connection:
+            return connection.execute("DELETE FROM jobs WHERE finished_at < ?", (time.time() - self.ttl,)).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        counts = dict.fromkeys(STATES, 0)
+        with closing(self._connect()) as connection:
+            counts.update(connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return counts
+
+
+class JobQueue:
+    """
+    Bounded queue of background jobs run by `workers` asyncio tasks of the event loop.
+    At most `queue_depth` jobs wait for a worker; beyond that submit raises JobQueueFull
+    instead of piling up work. A job is a coroutine function returning (content, media type);
+    an exception with a status_code (HTTPException) fails the job with that code, any other with 500.
+    The store is read and written by one background thread, in call order, so that a slow or
+    locked store (SQLite file) never blocks the event loop.
+    """
+
+    def __init__(self, workers: int = 2, queue_depth: int = 32, retry_after: int = 1, store=None):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+        self.store = store if store is not None else MemoryJobStore()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Tâches de ce process pas encore terminées (en attente ou en cours)
+        self._pending: Dict[str, Job] = {}
+        # Accès au store : un seul thread, les enregistrements d'une tâche restent dans l'ordre
+        self._store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+        self._saving: set = set()
+
+    @classmethod
+    def from_config(cls, config_file: str) -> "JobQueue":
+        """Build a queue from the [jobs] section of the ini file (defaults if absent)."""
+        config = ConfigParser()
+        config.read(config_file)
+        section = config["jobs"] if config.has_section("jobs") else {}
+        ttl = float(section.get("ttl", 3600))
+        path = section.get("store")
+        if path:
+            path = os.path.join(os.path.dirname(os.path.abspath(config_file)), path)
+            store = SQLiteJobStore(path, ttl=ttl)
+        else:
+            store = MemoryJobStore(ttl=ttl)
+        return cls(
+            workers=int(section.get("workers", 2)),
+            queue_depth=int(section.get("queue_depth", 32)),
+            retry_after=int(section.get("retry_after", 1)),
+            store=store,
+        )
+
+    def start(self) -> None:
+        """Start the workers on the running event loop."""
+        self._queue = asyncio.Queue(maxsize=self.queue_depth)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def submit(self, kind: str, fn: Callable[[], Awaitable[JobResult]]) -> Job:
+        """Queue `fn` and return its job (status queued), or raise JobQueueFull."""
+        if self._queue is None:
+            raise RuntimeError("Job queue is not started")
+        job = Job(kind)
+        try:
+            self._queue.put_nowait((job, fn))
+        except asyncio.QueueFull:
+            raise JobQueueFull(f"{self._queue.qsize()} jobs already waiting")
+        self._pending[job.id] = job
+        # Enregistrement en tâche de fond : submit reste synchrone (pas de await entre le
+        # contrôle de la file et l'ajout), la tâche est lue dans _pending en attendant
+        task = asyncio.create_task(self._store_call(self._save_queued, job))
+        self._saving.add(task)
+        task.add_done_callback(self._saving.discard)
+        log.info("Job %s queued (%s)", job.id, kind)
+        return job
+
+    def _save_queued(self, job: Job) -> None:
+        self.store.save(job)
+        self.store.purge()
+
+    async def _store_call(self, fn, *args):
+        """Run a store call on the store thread."""
+        return await asyncio.get_running_loop().run_in_executor(self._store_executor, fn, *args)
+
+    async def get(self, id: str) -> Optional[Job]:
+        # Tâche de ce process : l'objet à jour, sans relire le store
+        job = self._pending.get(id)
+        return job if job is not None else await self._store_call(self.store.get, id)
+
+    async def _worker(self) -> None:
+        while True:
+            job, fn = await self._queue.get()
+            job.status, job.started_at = "running", time.time()
+            await self._store_call(self.store.save, job)
+            try:
+                job.result, job.media_type = await fn()
+                job.status, job.status_code = "done", 200
+            except asyncio.CancelledError:
+                self._fail(job, 503, "Server shut down before the job finished.")
+                raise
+            except Exception as exc:
+                job.status = "failed"
+                job.status_code = getattr(exc, "status_code", 500)
+                job.error = str(getattr(exc, "detail", exc))
+                log.error("Job %s (%s) failed: %s", job.id, job.kind, job.error)
+            finally:
+                job.finished_at = time.time()
+                try:
+                    # Enregistré avant de quitter _pending : un get ne relit jamais un état dépassé
+                    await self._store_call(self.store.save, job)
+                finally:
+                    self._pending.pop(job.id, None)
+                    self._queue.task_done()
+            log.info("Job %s (%s) %s in %.0fms", job.id, job.kind, job.status,
+                     (job.finished_at - job.started_at) * 1000)
+
+    def _fail(self, job: Job, status_code: int, error: str) -> None:
+        job.status, job.status_code, job.error = "failed", status_code, error
+
+    async def join(self) -> None:
+        """Wait until every queued job has run."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self) -> None:
+        """Cancel the workers; jobs still waiting or running are marked failed."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        pending, self._pending = list(self._pending.values()), {}
+        for job in pending:
+            self._fail(job, 503, "Server shut down before the job finished.")
+            job.finished_at = time.time()
+        await asyncio.gather(*self._saving, return_exceptions=True)
+        for job in pending:
+            await self._store_call(self.store.save, job)
+        self._queue = None
+
+    def stats(self) -> dict:
+        """Return the number of jobs of this process waiting and running."""
+        running = sum(1 for job in self._pending.values() if job.status == "running")
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "queued": len(self._pending) - running,
+            "running": running,
+        }
@@ -1,21 +1,256 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from configparser import ConfigParser
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+CONF_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "config.ini"))
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - [%(request_id)s] - %(message)s"
+
+# Identifiant de la requête en cours, ajouté à chaque ligne de log ("-" hors requête)
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds the ID of the request being handled to every record (%(request_id)s)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets through at most `burst` records per message template (logger, level, unformatted
+    message) in each window of `window` seconds; the others are dropped and counted, and the
+    first record of the template in a later window carries how many were suppressed
+    (record.suppressed, written by the formatters). Records above max_level (errors by default)
+    are never dropped. Each record must go through the filter once: attach it to a single handler.
+    """
+
+    def __init__(self, window: float = 10.0, burst: int = 20, max_level: int = logging.WARNING):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self.max_level = max_level
+        self._lock = threading.Lock()
+        # Gabarit -> [début de la fenêtre, messages émis, messages supprimés]
+        self._templates: Dict[tuple, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            state = self._templates.get(key)
+            if state is None or now - state[0] >= self.window:
+                suppressed = state[2] if state else 0
+                if len(self._templates) > 10000:
+                    self._templates.clear()  # Borne la mémoire si les gabarits ne se répètent pas
+                self._templates[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+            return False
+
+
+def _message(record: logging.LogRecord) -> str:
+    """Formatted message of a record, with the number of similar messages suppressed before it."""
+    message = record.getMessage()
+    suppressed = getattr(record, "suppressed", 0)
+    return f"{message} ({suppressed} similar messages suppressed)" if suppressed else message
+
+
+class TextFormatter(logging.Formatter):
+    """TEXT_FORMAT lines, with the suppressed count of SamplingFilter after the message."""
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        record.message = _message(record)
+        return super().formatMessage(record)
+
+
+class _DispatchHandler(logging.Handler):
+    """
+    Single handler of the logger without queue: its filters run once per record, then the
+    record is written by each output handler (console, file) that accepts its level.
+    """
+
+    def __init__(self, handlers):
+        super().__init__()
+        self.handlers = handlers
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        accepted = self.filter(record)
+        if accepted:
+            self.emit(record)
+        return bool(accepted)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def flush(self) -> None:
+        for handler in self.handlers:
+            handler.flush()
+
+    def close(self) -> None:
+        for handler in self.handlers:
+            handler.close()
+        super().close()
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that formats the message in place instead of copying the record (the caller pays less)."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Les objets traceback ne passent pas dans la file : texte formaté ici
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, request_id, message (and exception)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": _message(record),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
 
 class LoggerManager:
-    def __init__(self, name="my_app", log_file=None, level=logging.INFO):
+    def __init__(self, name="my_app", log_file=None, level=logging.INFO, json_format=False, use_queue=False,
+                 rotation="none", max_bytes=10 * 1024 * 1024, when="midnight", backup_count=5,
+                 module_levels: Optional[Dict[str, int]] = None, sample_window=0.0, sample_burst=20):
         """
         Initializes a global logger with an option to write to a file.
+        With use_queue, records are put on a queue by the calling thread and written to the
+        console and the file by a background thread (QueueListener), so logging never blocks
+        on I/O. The file can be rotated by size (rotation="size") or time (rotation="time");
+        module_levels sets the level of the child loggers of get_logger (e.g. {"database": WARNING}).
+        "{pid}" in log_file is replaced by the process ID (one file per API worker process).
+        The file is only opened by the first record written to it (see console_only).
         """
-        self._logger = logging.getLogger(name) 
+        self._logger = logging.getLogger(name)
         self._logger.setLevel(level)
+        self._listener = None
+        self._handlers = []
+        for module, module_level in (module_levels or {}).items():
+            logging.getLogger(f"{name}.{module}").setLevel(module_level)
         if not self._logger.handlers:
-            formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(name)s - %(message)s")
-            console_handler = logging.StreamHandler()
-            console_handler.setFormatter(formatter)
-            self._logger.addHandler(console_handler)
+            formatter = JsonFormatter() if json_format else TextFormatter(TEXT_FORMAT)
+            handlers = [logging.StreamHandler()]
             if log_file:
-                file_handler = logging.FileHandler(log_file)
-                file_handler.setFormatter(formatter)
-                self._logger.addHandler(file_handler)
+                handlers.append(self._file_handler(log_file, rotation, max_bytes, when, backup_count))
+            for handler in handlers:
+                handler.setFormatter(formatter)
+            self._handlers = handlers
+            # Un seul point d'entrée, porteur des filtres : chaque message passe une seule fois
+            # par l'échantillonnage, quel que soit le nombre de sorties
+            if use_queue:
+                log_queue = queue.SimpleQueue()
+                self._listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+                self._listener.start()
+                atexit.register(self.stop)
+                entry = _QueueHandler(log_queue)
+            else:
+                entry = _DispatchHandler(handlers)
+            # Filtres appliqués dans le thread appelant : l'ID de requête vient de son contexte,
+            # et un message supprimé par l'échantillonnage n'est ni formaté ni mis en file
+            entry.addFilter(RequestIdFilter())
+            if sample_window > 0:
+                entry.addFilter(SamplingFilter(sample_window, sample_burst))
+            self._logger.addHandler(entry)
+
+    @classmethod
+    def from_config(cls, config_file: str = CONF_DIR, name="my_app") -> "LoggerManager":
+        """Build the logger from the [logging] section of the ini file (DEBUG to app.log if absent)."""
+        config = ConfigParser()
+        config.read(config_file)
+        section = config["logging"] if config.has_section("logging") else {}
+        module_levels = {}
+        for item in section.get("levels", "").split(","):
+            if "=" in item:
+                module, module_level = item.split("=", 1)
+                module_levels[module.strip()] = logging.getLevelName(module_level.strip().upper())
+        return cls(
+            name=name,
+            log_file=section.get("file", "app.log") or None,
+            level=logging.getLevelName(section.get("level", "DEBUG").upper()),
+            json_format=section.get("format", "text") == "json",
+            use_queue=config.getboolean("logging", "queue", fallback=False),
+            rotation=section.get("rotation", "none"),
+            max_bytes=int(section.get("max_bytes", 10 * 1024 * 1024)),
+            when=section.get("when", "midnight"),
+            backup_count=int(section.get("backup_count", 5)),
+            module_levels=module_levels,
+            sample_window=float(section.get("sample_window", 0)),
+            sample_burst=int(section.get("sample_burst", 20)),
+        )
+
+    @staticmethod
+    def _file_handler(log_file, rotation, max_bytes, when, backup_count) -> logging.Handler:
+        log_file = log_file.replace("{pid}", str(os.getpid()))
+        # delay : fichier ouvert à la première ligne, jamais par un process qui passe en console_only avant
+        if rotation == "size":
+            return logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count,
+                                                        delay=True)
+        if rotation == "time":
+            return logging.handlers.TimedRotatingFileHandler(log_file, when=when, backupCount=backup_count,
+                                                             delay=True)
+        return logging.FileHandler(log_file, delay=True)
+
+    def console_only(self) -> None:
+        """
+        Stop writing to the log file, keeping the console. Used by the render workers: several
+        processes appending to (and rotating) one file would interleave and lose lines.
+        """
+        files = [handler for handler in self._handlers if isinstance(handler, logging.FileHandler)]
+        if not files:
+            return
+        self._handlers = [handler for handler in self._handlers if handler not in files]
+        for entry in self._logger.handlers:
+            if isinstance(entry, _DispatchHandler):
+                entry.handlers = list(self._handlers)
+        if self._listener is not None:
+            self._listener.handlers = tuple(self._handlers)
+        for handler in files:
+            handler.close()
+
+    def stop(self):
+        """Write the records still queued and stop the background thread (queue mode)."""
+        listener, self._listener = self._listener, None
+        if listener is not None and listener._thread is not None:
+            listener.stop()
+
+    @property
+    def handlers(self):
+        """Output handlers (console, file) written by the logger, directly or by the queue thread."""
+        return list(self._handlers)
 
     @property
     def logger(self):
@@ -23,4 +258,15 @@ class LoggerManager:
         return self._logger
 
 
-log = LoggerManager(log_file="app.log", level=logging.DEBUG).logger
\ No newline at end of file
+_manager = LoggerManager.from_config()
+log = _manager.logger
+
+
+def console_only_logging() -> None:
+    """Initializer of the render worker processes: console logging only, the file belongs to the API process."""
+    _manager.console_only()
+
+
+def get_logger(module: str) -> logging.Logger:
+    """Child logger of the application logger for a module, whose level can be set in [logging] levels."""
+    return log.getChild(module)
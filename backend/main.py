@@ -1,5 +1,10 @@
+import argparse
 import uvicorn
-from app import app
 
 if __name__ == "__main__":
-    uvicorn.run("app:app", host="127.0.0.1", port=8080, reload=True)
+    parser = argparse.ArgumentParser(description="Run the API with uvicorn.")
+    parser.add_argument("--reload", action="store_true", help="restart the server when a source file changes")
+    args = parser.parse_args()
+    # L'application est importée par le process serveur seulement (et non par le process
+    # qui surveille les fichiers en mode --reload)
+    uvicorn.run("app:app", host="127.0.0.1", port=8080, reload=args.reload)
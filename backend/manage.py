@@ -0,0 +1,78 @@
+"""
+Maintenance commands for the polygon database.
+
+Usage (depuis le dossier backend) :
+    python manage.py migrate                  # applique les scripts de migrations/ (idempotents)
+    python manage.py backfill-fingerprints    # calcule l'empreinte des polygones existants
+    python manage.py backfill-metrics         # calcule les métriques des polygones existants
+    python manage.py backfill-coordinates     # remplit polygons.coordinates (sommets en un blob)
+    python manage.py backfill-lods            # calcule les niveaux de détail des grands polygones
+"""
+import argparse
+import glob
+import os
+from sqlalchemy import text
+from database import Database
+from logger_manager import get_logger
+
+log = get_logger(__name__)
+
+CONF_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "config.ini"))
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+
+def migrate(db: Database, args) -> None:
+    """Apply every SQL script of migrations/ in name order; each script is idempotent."""
+    for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, "*.sql"))):
+        with open(path, encoding="utf-8") as f:
+            script = f.read()
+        with db.engine.begin() as connection:
+            connection.execute(text(script))
+        log.info("Migration applied: %s", os.path.basename(path))
+
+
+def backfill_fingerprints(db: Database, args) -> None:
+    updated = db.backfill_fingerprints(batch_size=args.batch_size)
+    log.info("Fingerprints backfilled for %s polygons", updated)
+
+
+def backfill_metrics(db: Database, args) -> None:
+    updated = db.backfill_metrics(batch_size=args.batch_size)
+    log.info("Metrics backfilled for %s polygons", updated)
+
+
+def backfill_coordinates(db: Database, args) -> None:
+    updated = db.backfill_coordinates(batch_size=args.batch_size)
+    log.info("Coordinates packed for %s polygons", updated)
+
+
+def backfill_lods(db: Database, args) -> None:
+    updated = db.backfill_lods(batch_size=args.batch_size)
+    log.info("Levels of detail computed for %s polygons", updated)
+
+
+COMMANDS = {
+    "migrate": migrate,
+    "backfill-fingerprints": backfill_fingerprints,
+    "backfill-metrics": backfill_metrics,
+    "backfill-coordinates": backfill_coordinates,
+    "backfill-lods": backfill_lods,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=COMMANDS)
+    parser.add_argument("--batch-size", type=int, default=1000, help="polygons per transaction for backfills")
+    parser.add_argument("--config", default=CONF_DIR)
+    args = parser.parse_args()
+
+    db = Database(args.config)
+    try:
+        COMMANDS[args.command](db, args)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
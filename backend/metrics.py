@@ -0,0 +1,232 @@
+import bisect
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from logger_manager import get_logger, request_id_var
+
+log = get_logger(__name__)
+
+# Bornes (secondes) des histogrammes de latence
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        with self._lock:
+            return self._values.get(label_values, 0.0)
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_format_labels(self.labels, key)} {value:g}" for key, value in values)
+        return lines
+
+
+class Histogram:
+    """Histogram with fixed buckets and labels: observe() is a bisect and three additions."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Par série : compte par bucket (non cumulé, le dernier pour +Inf), somme, nombre
+        self._series: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *label_values: str) -> int:
+        with self._lock:
+            series = self._series.get(label_values)
+            return series[2] if series else 0
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        names = self.labels + ("le",)
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Gauge:
+    """Gauge read at scrape time from a callback returning {label values: value}."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str], callback: Callable[[], Dict[Labels, float]]):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.callback = callback
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            values = sorted(self.callback().items())
+        except Exception as exc:  # Une jauge en erreur ne doit pas casser tout /metrics
+            log.warning("Metrics: gauge %s failed: %s", self.name, exc)
+            return lines
+        lines.extend(f"{self.name}{_format_labels(self.labels, key)} {float(value):g}" for key, value in values)
+        return lines
+
+
+class MetricsRegistry:
+    """Set of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str], callback: Callable[[], Dict[Labels, float]]) -> Gauge:
+        return self._register(Gauge(name, help, labels, callback))
+
+    def _register(self, metric):
+        # Même nom : la métrique existante (le middleware est recréé à chaque construction de la pile ASGI)
+        return self._metrics.setdefault(metric.name, metric)
+
+    def expose(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """Time spent in each stage of one request (seconds, summed when a stage runs several times)."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def total(self, *names: str) -> float:
+        return sum(self.stages.get(name, 0.0) for name in names)
+
+
+_stage_timer: ContextVar[Optional[StageTimer]] = ContextVar("stage_timer", default=None)
+
+
+def current_timer() -> Optional[StageTimer]:
+    """Stage timer of the request being handled, None outside a request."""
+    return _stage_timer.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Add the time spent in the block to the stage of the current request (no-op outside a request)."""
+    timer = _stage_timer.get()
+    if timer is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - start)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests and timing them per route template (not per raw path,
+    to bound the number of series), with the stage timings of each request. Every request gets
+    a request ID (X-Request-ID header, or a new one) attached to its log lines and returned in
+    the response; requests slower than slow_seconds are logged with their stages.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry, slow_seconds: float = 1.0):
+        self.app = app
+        self.slow_seconds = slow_seconds
+        self.requests = registry.counter("http_requests_total", "HTTP requests handled.",
+                                         ("method", "route", "status"))
+        self.latency = registry.histogram("http_request_duration_seconds", "HTTP request latency.",
+                                          ("method", "route"))
+        self.stages = registry.histogram("http_request_stage_seconds", "Time spent in each stage of a request.",
+                                         ("route", "stage"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        request_id = _header(scope, b"x-request-id") or uuid.uuid4().hex[:16]
+        id_token = request_id_var.set(request_id)
+        timer = StageTimer()
+        timer_token = _stage_timer.set(timer)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.requests.inc(scope["method"], route, str(status))
+            self.latency.observe(elapsed, scope["method"], route)
+            for name, seconds in timer.stages.items():
+                self.stages.observe(seconds, route, name)
+            if elapsed >= self.slow_seconds:
+                stages = " ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in timer.stages.items())
+                log.warning("Slow request %s %s: %.1fms %s", scope["method"], scope["path"], elapsed * 1000, stages)
+            _stage_timer.reset(timer_token)
+            request_id_var.reset(id_token)
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            # Identifiant fourni par le client : borné pour ne pas gonfler les logs
+            return value.decode("latin-1")[:64]
+    return None
+
@@ -0,0 +1,5 @@
+-- Canonical polygon fingerprint, used for indexed duplicate detection.
+-- Once applied, fill in the existing polygons with:
+--     python manage.py backfill-fingerprints
+ALTER TABLE polygons ADD COLUMN IF NOT EXISTS fingerprint VARCHAR(64);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_polygons_fingerprint ON polygons (fingerprint);
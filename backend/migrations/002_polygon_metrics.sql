@@ -0,0 +1,14 @@
+-- Polygon metrics computed at insert time (area, perimeter, bounding box, centroid, validity).
+-- Once applied, fill in the existing polygons with:
+--     python manage.py backfill-metrics
+ALTER TABLE polygons
+    ADD COLUMN IF NOT EXISTS area DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS perimeter DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS min_x DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS min_y DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS max_x DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS max_y DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS centroid_x DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS centroid_y DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS vertex_count INTEGER,
+    ADD COLUMN IF NOT EXISTS is_valid BOOLEAN;
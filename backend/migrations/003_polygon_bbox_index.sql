@@ -0,0 +1,3 @@
+-- GiST index on the bounding box of each polygon, for the bbox / intersection queries.
+-- Built on the metric columns of 002_polygon_metrics.sql (no PostGIS needed).
+CREATE INDEX IF NOT EXISTS ix_polygons_bbox ON polygons USING gist (box(point(min_x, min_y), point(max_x, max_y)));
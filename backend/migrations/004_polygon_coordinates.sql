@@ -0,0 +1,7 @@
+-- Optional packed copy of the vertices of each polygon (interleaved little-endian float64 x, y),
+-- so that a whole polygon can be read in one row. Float data barely compresses: store it
+-- out of line without trying.
+-- Once applied, fill in the existing polygons with:
+--     python manage.py backfill-coordinates
+ALTER TABLE polygons ADD COLUMN IF NOT EXISTS coordinates BYTEA;
+ALTER TABLE polygons ALTER COLUMN coordinates SET STORAGE EXTERNAL;
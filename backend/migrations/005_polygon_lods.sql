@@ -0,0 +1,12 @@
+-- Levels of detail of large polygons (simplified vertices, packed like polygons.coordinates).
+-- Once applied, compute them for the existing polygons with:
+--     python manage.py backfill-lods
+CREATE TABLE IF NOT EXISTS polygon_lods (
+    polygon_id INTEGER NOT NULL REFERENCES polygons(id) ON DELETE CASCADE,
+    level INTEGER NOT NULL,
+    tolerance DOUBLE PRECISION NOT NULL,
+    vertex_count INTEGER NOT NULL,
+    coordinates BYTEA NOT NULL,
+    PRIMARY KEY (polygon_id, level)
+);
+ALTER TABLE polygon_lods ALTER COLUMN coordinates SET STORAGE EXTERNAL;
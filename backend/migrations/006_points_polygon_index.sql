@@ -0,0 +1,3 @@
+-- Index on the points of each polygon in vertex order: reading the points of one polygon,
+-- keyset pages of GET /polygon/{id}/points and the ordered stream of GET /polygons/export.
+CREATE INDEX IF NOT EXISTS ix_points_polygon_id ON points (polygon_id, id);
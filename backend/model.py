@@ -1,4 +1,4 @@
-from typing import Union
+from typing import List, Union
 from pydantic import BaseModel
 
 class Point(BaseModel):
@@ -7,4 +7,12 @@ class Point(BaseModel):
     comment: Union[str, None] = None
     polygon_id: Union[int, None] = None
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class PolygonQuery(BaseModel):
+    points: List[Point]
+
+class MetricsQuery(BaseModel):
+    """Polygons whose metrics are requested: stored polygons by ID, or raw polygons."""
+    ids: Union[List[int], None] = None
+    polygons: Union[List[PolygonQuery], None] = None
@@ -0,0 +1,290 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from configparser import ConfigParser
+from typing import List, Optional, Sequence
+import numpy as np
+from logger_manager import get_logger
+
+log = get_logger(__name__)
+
+# Incrémenter quand le rendu change pour invalider les entrées déjà stockées (disque compris)
+RENDER_VERSION = 1
+# Au-delà du budget, le tier disque est vidé jusqu'à cette fraction : l'éviction ne repart pas à chaque écriture
+DISK_LOW_WATER = 0.9
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Return True if an If-None-Match header value matches the given ETag."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+class RenderCache:
+    """
+    Two-tier cache for rendered polygon images: an in-memory LRU bounded by a byte
+    budget, backed by an optional on-disk tier that survives restarts.
+    The disk tier is indexed in memory (key and size, in LRU order), built from one scan of
+    the directory at startup: eviction never walks the directory. get_async and put_async
+    serve memory hits inline and do the disk I/O in a worker thread, off the event loop.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._disk_size = 0
+        # Fichiers du tier disque : clé -> taille, du moins au plus récemment utilisé
+        self._disk_index: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            # Seul parcours du dossier : l'ordre LRU d'un redémarrage à l'autre vient du mtime des fichiers
+            for key, size, _ in sorted(self._disk_files(), key=lambda f: f[2]):
+                self._disk_index[key] = size
+                self._disk_size += size
+
+    @classmethod
+    def from_config(cls, config_file: str) -> "RenderCache":
+        """Build a cache from the [render_cache] section of the ini file (defaults if absent)."""
+        config = ConfigParser()
+        config.read(config_file)
+        section = config["render_cache"] if config.has_section("render_cache") else {}
+        return cls(
+            max_bytes=int(section.get("max_bytes", 64 * 1024 * 1024)),
+            disk_dir=section.get("disk_dir") or None,
+            disk_max_bytes=int(section.get("disk_max_bytes", 512 * 1024 * 1024)),
+        )
+
+    @staticmethod
+    def make_key(polygon_id: int, x_values: Sequence[float], y_values: Sequence[float], **options) -> str:
+        """Hash the polygon ID, its point set and the render options into a cache key."""
+        digest = hashlib.sha256()
+        digest.update(f"v{RENDER_VERSION}:{polygon_id}:".encode())
+        digest.update(np.asarray(x_values, dtype=np.float64).tobytes())
+        digest.update(np.asarray(y_values, dtype=np.float64).tobytes())
+        return RenderCache._finish_key(digest, options)
+
+    @staticmethod
+    def make_fingerprint_key(polygon_id: int, fingerprint: str, **options) -> str:
+        """
+        Same as make_key for a polygon whose fingerprint is stored: the fingerprint stands
+        for the point set, so the key is computed without loading the points.
+        """
+        digest = hashlib.sha256()
+        digest.update(f"v{RENDER_VERSION}:{polygon_id}:fp={fingerprint}".encode())
+        return RenderCache._finish_key(digest, options)
+
+    @staticmethod
+    def _finish_key(digest, options: dict) -> str:
+        for name in sorted(options):
+            digest.update(f"|{name}={options[name]}".encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached image for a key, looking in memory first, then on disk."""
+        data = self._memory_get(key)
+        if data is not None:
+            return data
+        return self._disk_lookup(key)
+
+    async def get_async(self, key: str) -> Optional[bytes]:
+        """get() from the event loop: a memory hit is returned inline, the disk tier is read in a worker thread."""
+        data = self._memory_get(key)
+        if data is not None:
+            return data
+        return await self._off_loop(self._disk_lookup, key)
+
+    async def get_many_async(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        """get_async() of several keys, the memory misses looked up on disk in a single worker thread call."""
+        found = [self._memory_get(key) for key in keys]
+        missing = [i for i, data in enumerate(found) if data is None]
+        if missing:
+            looked_up = await self._off_loop(lambda: [self._disk_lookup(keys[i]) for i in missing])
+            for i, data in zip(missing, looked_up):
+                found[i] = data
+        return found
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store an image in both tiers."""
+        with self._lock:
+            self._memory_put(key, data)
+        self._disk_put(key, data)
+
+    async def put_async(self, key: str, data: bytes) -> None:
+        """put() from the event loop: the disk tier is written in a worker thread."""
+        with self._lock:
+            self._memory_put(key, data)
+        if self.disk_dir:
+            await asyncio.to_thread(self._disk_put, key, data)
+
+    async def _off_loop(self, fn, *args):
+        """Run fn in a worker thread when it may touch the disk tier, inline when the cache is memory only."""
+        if self.disk_dir:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    def _memory_get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return data
+
+    def _disk_lookup(self, key: str) -> Optional[bytes]:
+        """Read a key from the disk tier, copied to memory on a hit."""
+        data = self._disk_get(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._memory_put(key, data)
+        return data
+
+    def clear(self) -> None:
+        """Drop every in-memory entry (the disk tier is left untouched)."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        """Return the hit/miss counters and the current size of each tier."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "disk_entries": len(self._disk_index),
+                "disk_bytes": self._disk_size,
+                "disk_max_bytes": self.disk_max_bytes if self.disk_dir else 0,
+            }
+
+    def _memory_put(self, key: str, data: bytes) -> None:
+        # Une image plus grosse que le budget n'est pas gardée en mémoire
+        if len(data) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous)
+        self._entries[key] = data
+        self._size += len(data)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.bin")
+
+    def _disk_files(self):
+        """(key, size, mtime) of every file of the disk tier (directory scan, at startup only)."""
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if name.endswith(".bin"):
+                    stat = os.stat(os.path.join(root, name))
+                    yield name[:-len(".bin")], stat.st_size, stat.st_mtime
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # Le mtime garde l'ordre LRU pour le prochain démarrage
+        except FileNotFoundError:
+            # Fichier retiré par un autre process qui partage le dossier
+            self._disk_forget(key)
+            return None
+        except OSError as e:
+            log.warning("Render cache: cannot read %s: %s", path, e)
+            return None
+        with self._lock:
+            # Fichier écrit par un autre process : ajouté à l'index à sa première lecture
+            if key not in self._disk_index:
+                self._disk_index[key] = len(data)
+                self._disk_size += len(data)
+            self._disk_index.move_to_end(key)
+        return data
+
+    def _disk_put(self, key: str, data: bytes) -> None:
+        if not self.disk_dir or len(data) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Écriture atomique : fichier temporaire puis rename
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.warning("Render cache: cannot write %s: %s", path, e)
+            return
+        with self._lock:
+            self._disk_size += len(data) - self._disk_index.pop(key, 0)
+            self._disk_index[key] = len(data)
+            over_budget = self._disk_size > self.disk_max_bytes
+        if over_budget:
+            self._disk_evict()
+
+    def _disk_evict(self) -> None:
+        """Remove the least recently used files until the disk tier is back under DISK_LOW_WATER of its budget."""
+        evicted = []
+        with self._lock:
+            while self._disk_index and self._disk_size > self.disk_max_bytes * DISK_LOW_WATER:
+                key, size = self._disk_index.popitem(last=False)
+                self._disk_size -= size
+                self.evictions += 1
+                evicted.append(key)
+        for key in evicted:
+            try:
+                os.remove(self._disk_path(key))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                log.warning("Render cache: cannot remove %s: %s", self._disk_path(key), e)
+
+    def _disk_forget(self, key: str) -> None:
+        with self._lock:
+            self._disk_size -= self._disk_index.pop(key, 0)
+
+    def _disk_remove(self, key: str) -> int:
+        """Remove a key from the disk tier; return 1 if its file was there."""
+        if not self.disk_dir:
+            return 0
+        self._disk_forget(key)
+        path = self._disk_path(key)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return 0
+        except OSError as e:
+            log.warning("Render cache: cannot remove %s: %s", path, e)
+            return 0
+        return 1
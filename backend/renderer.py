@@ -0,0 +1,336 @@
+import asyncio
+import functools
+import importlib
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from configparser import ConfigParser
+from typing import Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+import numpy as np
+from logger_manager import console_only_logging, get_logger
+from metrics import current_timer
+
+log = get_logger(__name__)
+
+ENGINES = ("matplotlib", "fast")
+FORMATS = ("png", "svg")
+# Modules chargés dans les workers de rendu par RenderPool.warm_up (matplotlib : ~0,6 s au premier import)
+WARM_UP_MODULES = ("PIL.Image", "PIL.ImageDraw", "matplotlib.figure", "matplotlib.backends.backend_agg",
+                   "matplotlib.patches")
+MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+# Emprise (min_x, min_y, max_x, max_y)
+BBox = Tuple[float, float, float, float]
+
+# Taille de l'image : identique à la figure matplotlib par défaut (6.4 x 4.8 pouces à 100 dpi)
+WIDTH, HEIGHT = 640, 480
+# Palette du moteur rapide : blanc, noir, bleu, gris clair
+PALETTE = [255, 255, 255, 0, 0, 0, 0, 0, 255, 211, 211, 211]
+WHITE, BLACK, BLUE, GRAY = range(4)
+# Position des axes dans la figure (valeurs par défaut de matplotlib : left, bottom, width, height)
+AXES_BOX = (0.125, 0.11, 0.775, 0.77)
+
+
+class RenderQueueFull(Exception):
+    """Raised when every render worker is busy and the waiting queue is full."""
+
+
+def render_polygon(polygon_id: int, x_values: Sequence[float], y_values: Sequence[float], area: float,
+                   fmt: str = "png", engine: str = "matplotlib", bbox: Optional[BBox] = None) -> bytes:
+    """
+    Render the outline of a polygon with the requested engine into PNG or SVG bytes.
+    bbox (min_x, min_y, max_x, max_y), when already known, saves a pass over the points.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown image format: {fmt}")
+    if engine == "matplotlib":
+        return render_matplotlib(polygon_id, x_values, y_values, area, fmt, bbox)
+    if engine == "fast":
+        if fmt == "svg":
+            return render_fast_svg(polygon_id, x_values, y_values, area, bbox)
+        return render_fast_png(polygon_id, x_values, y_values, area, bbox)
+    raise ValueError(f"Unknown render engine: {engine}")
+
+
+def render_matplotlib(polygon_id: int, x_values: Sequence[float], y_values: Sequence[float], area: float,
+                      fmt: str = "png", bbox: Optional[BBox] = None) -> bytes:
+    """
+    Render the outline of a polygon with matplotlib.
+    Uses a figure private to the call (Agg canvas, no pyplot global state) so that
+    concurrent renders can never share or corrupt each other's figure.
+    """
+    # Import tardif : matplotlib n'est chargé que par les process qui l'utilisent
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from matplotlib.patches import Polygon
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    x_min, y_min, x_max, y_max = bbox or _bbox(x_values, y_values)
+    ax.set_xlim(x_min - 1, x_max + 1)
+    ax.set_ylim(y_min - 1, y_max + 1)
+
+    # Ajout du polygone avec une couleur fixe
+    polygon = Polygon(np.column_stack((x_values, y_values)), closed=True, fill=False,
+                      edgecolor="blue", linewidth=2, label=_label(polygon_id, area))
+    ax.add_patch(polygon)
+    ax.legend(loc="upper right")
+
+    img_bytes = io.BytesIO()
+    fig.savefig(img_bytes, format=fmt)
+    return img_bytes.getvalue()
+
+
+def _label(polygon_id: int, area: float) -> str:
+    return f"Polygon {polygon_id}, Area = {area:.2f} px²"
+
+
+@functools.lru_cache(maxsize=1)
+def _legend_font():
+    """Return a legend font and whether it can draw "²" (the bundled bitmap font cannot)."""
+    from PIL import ImageFont
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", 11), True
+    except OSError:
+        return ImageFont.load_default(), False
+
+
+def _bbox(x_values: Sequence[float], y_values: Sequence[float]) -> BBox:
+    xs = np.asarray(x_values, dtype=np.float64)
+    ys = np.asarray(y_values, dtype=np.float64)
+    return xs.min(), ys.min(), xs.max(), ys.max()
+
+
+def pixel_tolerance(bbox: BBox) -> float:
+    """Half the size of a pixel, in data units, when the polygon with this bbox is rendered."""
+    x_min, y_min, x_max, y_max = bbox
+    # Mêmes marges que _to_pixels : l'emprise est élargie de 1 de chaque côté
+    x_scale = AXES_BOX[2] * WIDTH / (x_max - x_min + 2)
+    y_scale = AXES_BOX[3] * HEIGHT / (y_max - y_min + 2)
+    return 0.5 / max(x_scale, y_scale)
+
+
+def _to_pixels(x_values: Sequence[float], y_values: Sequence[float], bbox: Optional[BBox] = None):
+    """Map data coordinates to image pixels, using the same limits and axes box as matplotlib."""
+    xs = np.asarray(x_values, dtype=np.float64)
+    ys = np.asarray(y_values, dtype=np.float64)
+    x_min, y_min, x_max, y_max = bbox or _bbox(xs, ys)
+    x_min, x_max = x_min - 1, x_max + 1
+    y_min, y_max = y_min - 1, y_max + 1
+    left, bottom, width, height = AXES_BOX
+    left, width = left * WIDTH, width * WIDTH
+    top, height = (1 - bottom - height) * HEIGHT, height * HEIGHT
+    px = left + (xs - x_min) / (x_max - x_min) * width
+    # L'axe Y de l'image est orienté vers le bas
+    py = top + (y_max - ys) / (y_max - y_min) * height
+    return px, py, (left, top, left + width, top + height)
+
+
+def render_fast_svg(polygon_id: int, x_values: Sequence[float], y_values: Sequence[float], area: float,
+                    bbox: Optional[BBox] = None) -> bytes:
+    """Render the outline and the area label directly as SVG, without matplotlib."""
+    px, py, (x0, y0, x1, y1) = _to_pixels(x_values, y_values, bbox)
+    points = " ".join(f"{x:.2f},{y:.2f}" for x, y in zip(px.tolist(), py.tolist()))
+    label = escape(_label(polygon_id, area))
+    legend_x, legend_y = x1 - 10, y0 + 10
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{WIDTH}" height="{HEIGHT}" '
+        f'viewBox="0 0 {WIDTH} {HEIGHT}">'
+        f'<rect width="{WIDTH}" height="{HEIGHT}" fill="white"/>'
+        f'<rect x="{x0:.2f}" y="{y0:.2f}" width="{x1 - x0:.2f}" height="{y1 - y0:.2f}" fill="none" stroke="black"/>'
+        f'<polygon points="{points}" fill="none" stroke="blue" stroke-width="2" stroke-linejoin="round"/>'
+        f'<g font-family="sans-serif" font-size="11">'
+        f'<text x="{legend_x:.2f}" y="{legend_y + 12:.2f}" text-anchor="end">{label}</text>'
+        f'<line x1="{legend_x - 6.8 * len(label) - 24:.2f}" y1="{legend_y + 8:.2f}" '
+        f'x2="{legend_x - 6.8 * len(label) - 6:.2f}" y2="{legend_y + 8:.2f}" stroke="blue" stroke-width="2"/>'
+        f'</g></svg>'
+    )
+    return svg.encode("utf-8")
+
+
+def render_fast_png(polygon_id: int, x_values: Sequence[float], y_values: Sequence[float], area: float,
+                    bbox: Optional[BBox] = None) -> bytes:
+    """Render the outline and the area label into a PNG with Pillow, without matplotlib."""
+    px, py, frame = _to_pixels(x_values, y_values, bbox)
+    # Import tardif : Pillow n'est chargé que par les process qui dessinent
+    from PIL import Image, ImageDraw
+    # Image en palette (1 octet par pixel) : l'encodage PNG est bien plus rapide qu'en RGB
+    image = Image.new("P", (WIDTH, HEIGHT), WHITE)
+    image.putpalette(PALETTE)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle(frame, outline=BLACK)
+    outline = np.column_stack((px, py)).ravel().tolist()
+    draw.line(outline + outline[:2], fill=BLUE, width=2, joint="curve")
+
+    # Légende en haut à droite : échantillon de trait + texte
+    label = _label(polygon_id, area)
+    font, has_superscript = _legend_font()
+    if not has_superscript:
+        label = label.replace("²", "^2")
+    left, top, right, bottom = draw.textbbox((0, 0), label, font=font)
+    text_x = frame[2] - 10 - (right - left)
+    text_y = frame[1] + 10
+    draw.rectangle((text_x - 32, text_y - 4, frame[2] - 4, text_y + bottom - top + 6), outline=GRAY, fill=WHITE)
+    draw.line((text_x - 26, text_y + (bottom - top) // 2 + 1, text_x - 6, text_y + (bottom - top) // 2 + 1),
+              fill=BLUE, width=2)
+    draw.text((text_x, text_y - top), label, fill=BLACK, font=font)
+
+    img_bytes = io.BytesIO()
+    # Compression minimale : l'image est surtout du blanc, le gain de taille ne vaut pas le coût CPU
+    image.save(img_bytes, format="PNG", compress_level=1)
+    return img_bytes.getvalue()
+
+
+def render_tile(geometries: Sequence[Tuple[np.ndarray, np.ndarray]], bbox: BBox, size: int = 256) -> bytes:
+    """
+    Render the outlines of polygons, given as (x, y) arrays, into a transparent PNG map tile
+    covering bbox. Vertices are snapped to pixels and consecutive duplicates dropped, and a
+    polygon given as a single vertex is drawn as one pixel.
+    """
+    from PIL import Image, ImageDraw
+    min_x, min_y, max_x, max_y = bbox
+    x_scale, y_scale = size / (max_x - min_x), size / (max_y - min_y)
+    image = Image.new("P", (size, size), WHITE)
+    image.putpalette(PALETTE)
+    draw = ImageDraw.Draw(image)
+    for x_values, y_values in geometries:
+        px = np.rint((np.asarray(x_values, dtype=np.float64) - min_x) * x_scale)
+        py = np.rint((max_y - np.asarray(y_values, dtype=np.float64)) * y_scale)
+        # Sommets tombant sur le même pixel que le précédent : inutiles à cette échelle
+        keep = np.ones(len(px), dtype=bool)
+        keep[1:] = (np.diff(px) != 0) | (np.diff(py) != 0)
+        px, py = px[keep], py[keep]
+        if len(px) == 1:
+            draw.point((px[0], py[0]), fill=BLUE)
+            continue
+        outline = np.column_stack((px, py)).ravel().tolist()
+        draw.line(outline + outline[:2], fill=BLUE, width=1)
+    img_bytes = io.BytesIO()
+    # Fond blanc transparent : les tuiles se superposent à un fond de carte
+    image.save(img_bytes, format="PNG", compress_level=1, transparency=WHITE)
+    return img_bytes.getvalue()
+
+
+def preload(modules: Sequence[str]) -> float:
+    """Import modules and load the legend font in the current process; return the time it took."""
+    start = time.perf_counter()
+    for module in modules:
+        importlib.import_module(module)
+    _legend_font()
+    return time.perf_counter() - start
+
+
+def _timed_call(fn, *args):
+    """Run fn(*args) on the worker and return its result with the time it took."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+class RenderPool:
+    """
+    Bounded pool of render workers.
+    At most `workers` renders run at once and at most `queue_depth` more wait for a
+    worker; any request beyond that is rejected with RenderQueueFull instead of piling up.
+    With `workers = 0` renders run in a thread instead of a child process.
+    """
+
+    def __init__(self, workers: Optional[int] = None, queue_depth: int = 16, retry_after: int = 1):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config_file: str) -> "RenderPool":
+        """Build a pool from the [renderer] section of the ini file (defaults if absent)."""
+        config = ConfigParser()
+        config.read(config_file)
+        section = config["renderer"] if config.has_section("renderer") else {}
+        workers = section.get("workers")
+        return cls(
+            workers=int(workers) if workers else None,
+            queue_depth=int(section.get("queue_depth", 16)),
+            retry_after=int(section.get("retry_after", 1)),
+        )
+
+    @property
+    def capacity(self) -> int:
+        return max(self.workers, 1) + self.queue_depth
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.workers == 0:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
+            else:
+                # "spawn" : les workers n'héritent ni des connexions DB ni des threads du process parent ;
+                # ils journalisent sur la console seulement, le fichier de log reste au process de l'API
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context("spawn"),
+                                                     initializer=console_only_logging)
+                log.info("Render pool started with %s workers", self.workers)
+        return self._executor
+
+    async def submit(self, fn, *args):
+        """
+        Run `fn(*args)` on a render worker, or raise RenderQueueFull if the pool is saturated.
+        The wait for a worker and the render itself are added to the stages of the current request.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            if self._pending >= self.capacity:
+                raise RenderQueueFull(f"{self._pending} renders already in progress or queued")
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            with self._lock:
+                executor = self._get_executor()
+            result, elapsed = await loop.run_in_executor(executor, _timed_call, fn, *args)
+            timer = current_timer()
+            if timer is not None:
+                timer.add("render", elapsed)
+                timer.add("render_queue", time.perf_counter() - start - elapsed)
+            return result
+        except BrokenProcessPool:
+            # Un worker est mort : le pool sera recréé à la prochaine requête
+            log.error("Render pool is broken, restarting it on next render")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def warm_up(self, modules: Sequence[str] = WARM_UP_MODULES) -> None:
+        """Start the workers and import the render libraries in them, ahead of the first render."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            executor = self._get_executor()
+        # Une tâche par worker : le pool démarre un process par tâche en attente
+        await asyncio.gather(*(loop.run_in_executor(executor, preload, modules) for _ in range(max(self.workers, 1))))
+
+    def stats(self) -> dict:
+        """Return the number of renders running and waiting."""
+        with self._lock:
+            running = min(self._pending, max(self.workers, 1))
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queue_depth,
+                "running": running,
+                "queued": self._pending - running,
+            }
+
+    def shutdown(self) -> None:
+        """Stop the workers; the pool is recreated lazily on next use."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,132 @@
+import threading
+from configparser import ConfigParser
+from typing import Sequence, Tuple
+import numpy as np
+import shapely
+
+# Emprise (min_x, min_y, max_x, max_y)
+BBox = Tuple[float, float, float, float]
+
+
+def parse_bbox(value: str) -> BBox:
+    """Parse "min_x,min_y,max_x,max_y"; raise ValueError if malformed or inverted."""
+    parts = value.split(",")
+    if len(parts) != 4:
+        raise ValueError("bbox must be min_x,min_y,max_x,max_y")
+    min_x, min_y, max_x, max_y = (float(part) for part in parts)
+    if not all(np.isfinite((min_x, min_y, max_x, max_y))):
+        raise ValueError("bbox values must be finite numbers")
+    if min_x > max_x or min_y > max_y:
+        raise ValueError("bbox minimum is greater than its maximum")
+    return min_x, min_y, max_x, max_y
+
+
+class SpatialIndex:
+    """
+    In-process index of polygon bounding boxes, answering "which polygons may intersect
+    this box" in sub-linear time.
+
+    shapely's STRtree cannot be modified once built, so polygons added after the build
+    are kept in a small buffer scanned with NumPy; the tree is rebuilt (from memory) once
+    the buffer holds more than rebuild_ratio of the indexed polygons. Results are candidate
+    IDs only: the database stays the source of truth for the rows and exact geometry.
+    """
+
+    def __init__(self, rebuild_ratio: float = 0.1, rebuild_min: int = 1024):
+        self.rebuild_ratio = rebuild_ratio
+        self.rebuild_min = rebuild_min
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._tree = None
+        self._tree_ids = np.empty(0, dtype=np.int64)
+        self._tree_bounds = np.empty((0, 4), dtype=np.float64)
+        self._pending_ids = []
+        self._pending_bounds = []
+        self._pending_count = 0
+        self.max_id = 0
+        self.rebuilds = 0
+
+    @classmethod
+    def from_config(cls, config_file: str) -> "SpatialIndex":
+        """Build the index settings from the [spatial_index] section of the ini file."""
+        config = ConfigParser()
+        config.read(config_file)
+        return cls(
+            rebuild_ratio=config.getfloat("spatial_index", "rebuild_ratio", fallback=0.1),
+            rebuild_min=config.getint("spatial_index", "rebuild_min", fallback=1024),
+        )
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._tree_ids) + self._pending_count
+
+    def build(self, ids: Sequence[int], bounds: np.ndarray) -> None:
+        """Replace the whole index with these polygons (bounds: one min_x, min_y, max_x, max_y row each)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+        with self._lock:
+            self._set_tree(ids, bounds)
+            self._pending_ids, self._pending_bounds, self._pending_count = [], [], 0
+            self.max_id = max(self.max_id, int(ids.max())) if len(ids) else self.max_id
+            self._loaded = True
+
+    def add(self, ids: Sequence[int], bounds: np.ndarray) -> None:
+        """Add polygons inserted since the build."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+        with self._lock:
+            self._pending_ids.append(ids)
+            self._pending_bounds.append(bounds)
+            self._pending_count += len(ids)
+            self.max_id = max(self.max_id, int(ids.max()))
+            if self._pending_count > max(self.rebuild_min, self.rebuild_ratio * len(self._tree_ids)):
+                all_ids, all_bounds = self._pending_arrays()
+                self._set_tree(np.concatenate((self._tree_ids, all_ids)),
+                               np.concatenate((self._tree_bounds, all_bounds)))
+                self._pending_ids, self._pending_bounds, self._pending_count = [], [], 0
+
+    def query(self, bbox: BBox) -> np.ndarray:
+        """Return the sorted IDs of the polygons whose bounding box intersects bbox."""
+        min_x, min_y, max_x, max_y = bbox
+        with self._lock:
+            tree, tree_ids = self._tree, self._tree_ids
+            pending_ids, pending_bounds = self._pending_arrays()
+        found = []
+        if tree is not None:
+            # Sans prédicat, le tree compare les enveloppes : exactement les emprises indexées
+            found.append(tree_ids[tree.query(shapely.box(min_x, min_y, max_x, max_y))])
+        if len(pending_ids):
+            overlap = ((pending_bounds[:, 0] <= max_x) & (pending_bounds[:, 2] >= min_x)
+                       & (pending_bounds[:, 1] <= max_y) & (pending_bounds[:, 3] >= min_y))
+            found.append(pending_ids[overlap])
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"loaded": self._loaded, "polygons": len(self), "pending": self._pending_count,
+                    "max_id": self.max_id, "rebuilds": self.rebuilds}
+
+    def _pending_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        if not self._pending_ids:
+            return np.empty(0, dtype=np.int64), np.empty((0, 4), dtype=np.float64)
+        if len(self._pending_ids) > 1:
+            # Compactage : les requêtes suivantes ne reconcatènent pas les lots
+            self._pending_ids = [np.concatenate(self._pending_ids)]
+            self._pending_bounds = [np.concatenate(self._pending_bounds)]
+        return self._pending_ids[0], self._pending_bounds[0]
+
+    def _set_tree(self, ids: np.ndarray, bounds: np.ndarray) -> None:
+        self._tree_ids, self._tree_bounds = ids, bounds
+        if len(ids):
+            boxes = shapely.box(bounds[:, 0], bounds[:, 1], bounds[:, 2], bounds[:, 3])
+            self._tree = shapely.STRtree(boxes)
+        else:
+            self._tree = None
+        self.rebuilds += 1
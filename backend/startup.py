@@ -0,0 +1,65 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional, Sequence, Tuple
+from logger_manager import get_logger
+
+log = get_logger(__name__)
+
+Step = Tuple[str, Callable[[], Awaitable]]
+
+
+class WarmUp:
+    """
+    Warm-up of the application run in the background after startup: named steps awaited
+    in order, each timed. The application serves requests meanwhile (anything not warmed up
+    yet is initialized by the first request using it); `ready` turns true once every step
+    has run, even if one failed (its error is kept in `errors`).
+    """
+
+    def __init__(self):
+        self.steps: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.ready_after: Optional[float] = None
+        self._started = time.perf_counter()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_after is not None
+
+    def start(self, steps: Sequence[Step]) -> None:
+        """Run the steps in a background task of the running event loop."""
+        self.steps, self.errors, self.ready_after = {}, {}, None
+        self._started = time.perf_counter()
+        self._task = asyncio.create_task(self._run(steps))
+
+    async def _run(self, steps: Sequence[Step]) -> None:
+        for name, step in steps:
+            start = time.perf_counter()
+            try:
+                await step()
+            except Exception as exc:
+                log.error("Warm-up step %s failed: %s", name, exc)
+                self.errors[name] = str(exc)
+            self.steps[name] = time.perf_counter() - start
+        self.ready_after = time.perf_counter() - self._started
+        log.info("Warm-up done in %.0fms (%s)", self.ready_after * 1000,
+                 ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.steps.items()))
+
+    async def stop(self) -> None:
+        """Cancel the warm-up if it is still running (application shutdown)."""
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "ready_after_s": round(self.ready_after, 3) if self.ready else None,
+            "steps": {name: round(seconds, 3) for name, seconds in self.steps.items()},
+            "errors": self.errors,
+        }
@@ -0,0 +1,10 @@
+import pytest
+from fastapi.testclient import TestClient
+from app import app
+
+
+@pytest.fixture(scope="module")
+def client():
+    # Le bloc with exécute le lifespan : le pool de connexions est lié à la boucle du client
+    with TestClient(app) as client:
+        yield client
@@ -1,6 +1,11 @@
 import pytest
 import os
-from database import Database, PolygonORM, PointORM
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from sqlalchemy import insert, select
+from database import Database, PolygonLodORM, PolygonORM, PointORM
+from geometry import polygon_fingerprint, unpack_coordinates
 from model import Point
 
 
@@ -30,7 +35,8 @@ def test_insert_polygon():
     ]
     db.insert_polygon(points)
     nb_pts_db = len(db.get_all_rows(PointORM))
-    assert nb_pts_db == 3
+    # Deux polygones distincts peuvent partager des points : chacun garde les siens
+    assert nb_pts_db == 4
 
 # Test de la récupération de tous les points dans la base de données
 def test_get_points():
@@ -39,11 +45,60 @@ def test_get_points():
         Point(x=1.5, y=2.5, comment="Test point"),
         Point(x=1.0, y=3.0, comment="Test point2")
     ]
-    db.insert_polygon(points)
+    nb_pts_before = len(db.get_all_rows(PointORM))
+    id_polygon = db.insert_polygon(points)
 
-    # Utilise la méthode get_all_rows pour vérifier le nombre de points
+    # Le polygone existait déjà : aucun point n'est ajouté et ses deux points sont retrouvés
     all_points = db.get_all_rows(PointORM)
-    assert len(all_points) == 2  # Vérifie que deux points ont été insérés
+    assert len(all_points) == nb_pts_before
+    assert len(db.get_points(id=id_polygon)) == 2  # Vérifie que deux points ont été insérés
+
+# Test de la lecture en colonnes : blob des sommets ou lignes de points, commentaires à part
+@pytest.mark.parametrize("pack_coordinates", [True, False])
+def test_get_point_columns(pack_coordinates):
+    db = Database(CONF_DIR)
+    db.pack_coordinates = pack_coordinates
+    offset = 50.0 if pack_coordinates else 60.0
+    points = [Point(x=offset, y=0.5, comment="a"), Point(x=offset, y=3.0), Point(x=offset + 2.25, y=5.0, comment="c")]
+    id_polygon = db.insert_polygon(points)
+    x_values, y_values = db.get_point_columns(id_polygon)
+    assert x_values.dtype == np.float64
+    assert x_values.tolist() == [offset, offset, offset + 2.25] and y_values.tolist() == [0.5, 3.0, 5.0]
+    assert db.get_comments(id_polygon) == ["a", None, "c"]
+    coordinates = db.get_polygons_coordinates([id_polygon])
+    assert coordinates[id_polygon][1].tolist() == [0.5, 3.0, 5.0]
+    assert len(db.get_point_columns(9999)[0]) == 0
+
+# Test du remplissage des blobs de sommets des polygones existants
+def test_backfill_coordinates():
+    db = Database(CONF_DIR)
+    db.pack_coordinates = False
+    id_polygon = db.insert_polygon([Point(x=70.0, y=0.0), Point(x=70.0, y=3.0), Point(x=72.0, y=5.0)])
+    assert db.backfill_coordinates() >= 1
+    blob = db.session.execute(select(PolygonORM.coordinates).where(PolygonORM.id == id_polygon)).scalar()
+    assert unpack_coordinates(blob)[0].tolist() == [70.0, 70.0, 72.0]
+
+# Test des niveaux de détail stockés à l'insertion d'un grand polygone
+def test_insert_polygon_lods():
+    db = Database(CONF_DIR)
+    angles = np.linspace(0, 2 * np.pi, 2000, endpoint=False)
+    points = [Point(x=float(300 + 100 * np.cos(a)), y=float(100 * np.sin(a))) for a in angles]
+    id_polygon = db.insert_polygon(points)
+    levels = db.get_lod_levels(id_polygon)
+    assert [level for level, _, _ in levels] == list(range(1, len(levels) + 1)) and levels
+    level, tolerance, vertex_count = levels[-1]
+    assert vertex_count < 2000 and tolerance > 0
+    assert len(db.get_lod_columns(id_polygon, level)[0]) == vertex_count
+    assert len(db.get_lod_columns(id_polygon, 0)[0]) == 2000
+
+    # Les niveaux sont supprimés avec le polygone ; le backfill les recalcule
+    db.session.query(PolygonLodORM).filter(PolygonLodORM.polygon_id == id_polygon).delete()
+    db.session.commit()
+    assert db.get_lod_levels(id_polygon) == []
+    assert db.backfill_lods() >= 1
+    assert db.get_lod_levels(id_polygon) == levels
+    # Petit polygone : aucun niveau
+    assert db.get_lod_levels(db.insert_polygon([Point(x=80.0, y=0.0), Point(x=80.0, y=3.0), Point(x=82.0, y=5.0)])) == []
 
 # Test de la méthode is_polygon_exist
 def test_is_polygon_exist():
@@ -75,4 +130,75 @@ def test_is_polygon_exist():
     # Tester un polygone qui n'existe pas
     points_3 = [Point(x=9.5, y=10.5, comment="Test point 5")]
     existing_polygon_id_3 = db.is_polygon_exist(points_3)
-    assert existing_polygon_id_3 is None
\ No newline at end of file
+    assert existing_polygon_id_3 is None
+
+    # Même polygone avec un autre point de départ et un autre sens de parcours : même ID
+    assert db.is_polygon_exist(list(reversed(points_2))) == existing_polygon_id_2
+
+    # Un polygone dont les points sont un sous-ensemble d'un autre n'est pas le même polygone
+    points_4 = [Point(x=20.0, y=0.0), Point(x=20.0, y=3.0), Point(x=22.0, y=5.0), Point(x=23.0, y=1.0)]
+    id_polygon_4 = db.insert_polygon(points_4)
+    assert db.is_polygon_exist(points_4[:3]) is None
+    assert db.insert_polygon(points_4[:3]) != id_polygon_4
+
+# Test du remplissage des empreintes des polygones existants
+def test_backfill_fingerprints():
+    db = Database(CONF_DIR)
+    points = [Point(x=30.0, y=0.0), Point(x=30.0, y=3.0), Point(x=32.0, y=5.0)]
+    id_polygon = db.insert_polygon(points)
+    db.session.query(PolygonORM).filter(PolygonORM.id == id_polygon).update({"fingerprint": None})
+    db.session.commit()
+    assert db.is_polygon_exist(points) is None
+
+    assert db.backfill_fingerprints() >= 1
+    assert db.is_polygon_exist(points) == id_polygon
+# Test du calcul des métriques des polygones existants
+def test_backfill_metrics():
+    db = Database(CONF_DIR)
+    points = [Point(x=40.0, y=0.0), Point(x=40.0, y=3.0), Point(x=42.0, y=3.0)]
+    id_polygon = db.insert_polygon(points)
+    assert db.get_polygon_metrics(id_polygon)["area"] == 3.0
+    db.session.query(PolygonORM).filter(PolygonORM.id == id_polygon).update({"area": None, "vertex_count": None})
+    db.session.commit()
+
+    assert db.backfill_metrics() >= 1
+    metrics = db.get_polygon_metrics(id_polygon)
+    assert metrics["area"] == 3.0 and metrics["vertex_count"] == 3
+    assert db.get_polygon_metrics(9999) is None
+
+# Test de l'insertion en masse : executemany et COPY donnent les mêmes lignes
+@pytest.mark.parametrize("copy_threshold", [3, 1000])
+def test_bulk_insert_paths(copy_threshold):
+    db = Database(CONF_DIR)
+    db.copy_threshold = copy_threshold
+    offset = 1000.0 * copy_threshold
+    points = [
+        Point(x=offset + 0.1, y=0.0, comment=""),
+        Point(x=offset + 0.1, y=1.0, comment=None),
+        Point(x=offset + 1.1, y=1.0, comment='with "quotes", commas'),
+        Point(x=offset + 1.1, y=0.0, comment="last"),
+    ]
+    id_polygon = db.insert_polygon(points)
+    inserted = db.get_points(id=id_polygon)
+    assert [(p.x, p.y, p.comment) for p in inserted] == [(p.x, p.y, p.comment) for p in points]
+    db.session.query(PolygonORM).filter(PolygonORM.id == id_polygon).delete()
+    db.session.commit()
+
+# Test d'un lot inséré pendant qu'une autre transaction insère le même polygone : l'ID existant est repris
+def test_insert_polygons_concurrent_duplicate():
+    db = Database(CONF_DIR)
+    points = [Point(x=50.0, y=0.0), Point(x=50.0, y=3.0), Point(x=52.0, y=5.0)]
+    other = [Point(x=60.0, y=0.0), Point(x=60.0, y=3.0), Point(x=62.0, y=5.0)]
+    fingerprint = polygon_fingerprint([p.x for p in points], [p.y for p in points])
+    with db.SessionLocal() as concurrent:
+        # Polygone identique inséré par une autre transaction, validé après la lecture des empreintes du lot
+        concurrent_id = concurrent.execute(
+            insert(PolygonORM.__table__).values(fingerprint=fingerprint).returning(PolygonORM.id)).scalar()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(db.insert_polygons, [points, other])
+            time.sleep(0.5)  # L'INSERT du lot attend la fin de la transaction concurrente
+            concurrent.commit()
+            ids = future.result(timeout=10)
+    assert ids[0] == concurrent_id and ids[1] != concurrent_id
+    assert db.get_point_columns(concurrent_id)[0].size == 0  # Aucun point ajouté au polygone concurrent
+    assert list(db.get_point_columns(ids[1])[0]) == [60.0, 60.0, 62.0]
@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+import shapely
+from geometry import (FingerprintBuilder, choose_lod, metric_records, pack_coordinates, pack_polygons,
+                      polygon_fingerprint, polygon_lods, polygon_metrics, polygons_metrics, shapely_polygons,
+                      unpack_coordinates)
+
+SQUARE_X = [0.0, 1.0, 1.0, 0.0]
+SQUARE_Y = [0.0, 0.0, 1.0, 1.0]
+
+def test_fingerprint_is_rotation_and_direction_invariant():
+    reference = polygon_fingerprint(SQUARE_X, SQUARE_Y)
+    assert polygon_fingerprint(SQUARE_X[1:] + SQUARE_X[:1], SQUARE_Y[1:] + SQUARE_Y[:1]) == reference
+    assert polygon_fingerprint(SQUARE_X[::-1], SQUARE_Y[::-1]) == reference
+    # Sommet de fermeture explicite et -0.0 normalisés
+    assert polygon_fingerprint(SQUARE_X + [0.0], SQUARE_Y + [0.0]) == reference
+    assert polygon_fingerprint([-0.0] + SQUARE_X[1:], SQUARE_Y) == reference
+
+@pytest.mark.parametrize("x_values, y_values", [
+    (SQUARE_X[:3], SQUARE_Y[:3]),  # Sous-ensemble des sommets
+    ([0.0, 1.0, 0.0, 1.0], [0.0, 0.0, 1.0, 1.0]),  # Mêmes sommets, autre ordre (nœud papillon)
+    ([0.0, 2.0, 2.0, 0.0], SQUARE_Y),
+])
+def test_fingerprint_distinguishes_polygons(x_values, y_values):
+    assert polygon_fingerprint(x_values, y_values) != polygon_fingerprint(SQUARE_X, SQUARE_Y)
+
+def test_fingerprint_incremental():
+    """ L'empreinte calculée par lots est identique à celle calculée en une fois """
+    builder = FingerprintBuilder()
+    builder.update(SQUARE_X[:1], SQUARE_Y[:1])
+    builder.update(SQUARE_X[1:3], SQUARE_Y[1:3])
+    builder.update(SQUARE_X[3:], SQUARE_Y[3:])
+    assert builder.hexdigest() == polygon_fingerprint(SQUARE_X, SQUARE_Y)
+
+def test_polygon_metrics_match_shapely():
+    """ Les métriques vectorisées correspondent à celles de shapely """
+    xs, ys = [4.0, 4.0, 6.7, 6.4, 1.0], [0.0, 3.0, 5.7, 0.0, -2.0]
+    metrics = polygon_metrics(xs, ys)
+    polygon = shapely.Polygon(list(zip(xs, ys)))
+    assert metrics["area"] == pytest.approx(polygon.area)
+    assert metrics["perimeter"] == pytest.approx(polygon.length)
+    assert (metrics["min_x"], metrics["min_y"], metrics["max_x"], metrics["max_y"]) == polygon.bounds
+    assert (metrics["centroid_x"], metrics["centroid_y"]) == pytest.approx((polygon.centroid.x, polygon.centroid.y))
+    assert metrics["vertex_count"] == 5 and metrics["is_valid"] is True
+
+def test_polygon_metrics_invalid():
+    """ Nœud papillon et polygone dégénéré sont invalides """
+    assert polygon_metrics([0.0, 1.0, 0.0, 1.0], [0.0, 0.0, 1.0, 1.0])["is_valid"] is False
+    flat = polygon_metrics([0.0, 1.0, 2.0], [0.0, 0.0, 0.0])
+    assert flat["area"] == 0 and flat["is_valid"] is False
+    assert flat["centroid_x"] == 1.0
+
+def test_polygons_metrics_match_polygon_metrics():
+    """ Passe vectorisée sur un buffer concaténé : mêmes métriques que polygon par polygon, polygone vide compris """
+    rng = np.random.default_rng(0)
+    polygons = [(rng.uniform(-1e6, 1e6, n), rng.uniform(-1e6, 1e6, n)) for n in (3, 7, 50)]
+    polygons += [(SQUARE_X, SQUARE_Y), ([0.0, 1.0, 0.0, 1.0], [0.0, 0.0, 1.0, 1.0]), ([0.0, 1.0, 2.0], [0.0, 0.0, 0.0]),
+                 ([0.0, 1.0, 0.0], [0.0, 1.0, 0.0]), ([], [])]
+    records = metric_records(polygons_metrics(*pack_polygons(polygons)))
+    assert len(records) == len(polygons)
+    for record, (xs, ys) in zip(records, polygons):
+        expected = polygon_metrics(xs, ys)
+        assert record.keys() == expected.keys()
+        for name, value in expected.items():
+            assert record[name] == (pytest.approx(value) if isinstance(value, float) else value)
+
+def test_shapely_polygons():
+    xs, ys, offsets = pack_polygons([(SQUARE_X, SQUARE_Y), ([5.0, 7.0, 5.0], [5.0, 5.0, 7.0])])
+    assert offsets.tolist() == [0, 4, 7]
+    geometries = shapely_polygons(xs, ys, offsets)
+    assert shapely.area(geometries).tolist() == [1.0, 2.0]
+
+def test_pack_coordinates_roundtrip():
+    blob = pack_coordinates(SQUARE_X, SQUARE_Y)
+    assert len(blob) == 16 * len(SQUARE_X)
+    x_values, y_values = unpack_coordinates(blob)
+    assert x_values.tolist() == SQUARE_X and y_values.tolist() == SQUARE_Y
+
+def _noisy_circle(count: int):
+    """ Cercle bruité de rayon 100 : beaucoup de sommets, presque tous superflus à petite échelle """
+    angles = np.linspace(0, 2 * np.pi, count, endpoint=False)
+    radius = 100 + np.random.default_rng(0).uniform(-0.5, 0.5, count)
+    return radius * np.cos(angles), radius * np.sin(angles)
+
+def test_polygon_lods():
+    """ Chaque niveau réduit le nombre de sommets, reste valide et à moins de sa tolérance du polygone complet """
+    xs, ys = _noisy_circle(4000)
+    full = shapely.Polygon(np.column_stack((xs, ys)))
+    levels = polygon_lods(xs, ys)
+    assert len(levels) >= 2
+    counts = [len(x) for _, x, _ in levels]
+    assert counts == sorted(counts, reverse=True) and counts[0] < 4000
+    for tolerance, x, y in levels:
+        simplified = shapely.Polygon(np.column_stack((x, y)))
+        assert simplified.is_valid
+        assert shapely.hausdorff_distance(full, simplified) <= tolerance * 1.0001
+
+def test_polygon_lods_small_polygon():
+    """ Pas de niveau pour un petit polygone """
+    assert polygon_lods(SQUARE_X, SQUARE_Y) == []
+    assert polygon_lods(*_noisy_circle(500)) == []
+
+def test_choose_lod():
+    levels = [(0, 0.0, 4000), (1, 0.1, 800), (2, 0.4, 200), (3, 1.6, 40)]
+    assert choose_lod(levels) == 0
+    assert choose_lod(levels, lod=2) == 2
+    assert choose_lod(levels, lod=7) == 3
+    assert choose_lod(levels, max_vertices=500) == 2
+    assert choose_lod(levels, max_vertices=10) == 3
+    assert choose_lod(levels, max_tolerance=0.5) == 2
+    assert choose_lod(levels, max_tolerance=0.01) == 0
+    # Le premier critère donné l'emporte
+    assert choose_lod(levels, lod=1, max_vertices=10) == 1
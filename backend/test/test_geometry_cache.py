@@ -0,0 +1,162 @@
+import asyncio
+import os
+import numpy as np
+import pytest
+from app import geometry_cache
+from database import Database
+from geometry import pack_coordinates
+from geometry_cache import GeometryCache
+from model import Point
+
+CONF_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "config.ini"))
+
+XS, YS = np.array([0.0, 4.0, 4.0]), np.array([0.0, 0.0, 3.0])
+
+def test_ttl(monkeypatch):
+    """ Une entrée n'est plus servie après ttl secondes """
+    now = [1000.0]
+    monkeypatch.setattr("geometry_cache.time.monotonic", lambda: now[0])
+    cache = GeometryCache(ttl=10)
+    cache.put(cache.key(1), pack_coordinates(XS, YS))
+    assert cache.get(cache.key(1)) is not None
+    now[0] += 11
+    assert cache.get(cache.key(1)) is None
+    assert cache.stats()["expirations"] == 1 and cache.stats()["entries"] == 0
+
+def test_invalidate_drops_every_level():
+    cache = GeometryCache(levels=2)
+    for level in range(3):
+        cache.put(cache.key(1, level), pack_coordinates(XS, YS))
+    cache.put(cache.key(2), pack_coordinates(XS, YS))
+    assert cache.invalidate([1]) == 3
+    assert cache.stats()["entries"] == 1 and cache.get(cache.key(2)) is not None
+
+def test_shared_tier(tmp_path):
+    """ Tier partagé : une entrée écrite par un process est lue par un autre, l'invalidation la retire pour tous """
+    first, second = GeometryCache(shared_dir=str(tmp_path)), GeometryCache(shared_dir=str(tmp_path))
+    first.put(first.key(7), pack_coordinates(XS, YS))
+    assert second.get(second.key(7)) == pack_coordinates(XS, YS)
+    assert second.stats()["disk_hits"] == 1
+    first.invalidate([7])
+    assert GeometryCache(shared_dir=str(tmp_path)).get(first.key(7)) is None
+
+def test_shared_tier_ttl(tmp_path, monkeypatch):
+    """ Le ttl s'applique aussi au tier partagé : une entrée lue sur le disque n'est plus servie après ttl secondes """
+    now = [1000.0]
+    monkeypatch.setattr("geometry_cache.time.time", lambda: now[0])
+    monkeypatch.setattr("geometry_cache.time.monotonic", lambda: now[0])
+    first = GeometryCache(ttl=10, shared_dir=str(tmp_path))
+    first.put(first.key(7), pack_coordinates(XS, YS))
+    now[0] += 6
+    second = GeometryCache(ttl=10, shared_dir=str(tmp_path))
+    assert second.get(second.key(7)) is not None
+    now[0] += 5
+    # Copie en mémoire comprise : l'échéance est celle de l'écriture, pas celle de la lecture du disque
+    assert second.get(second.key(7)) is None
+    assert GeometryCache(ttl=10, shared_dir=str(tmp_path)).get(first.key(7)) is None
+    assert second.stats()["expirations"] >= 1 and not list(tmp_path.rglob("*.bin"))
+
+def test_load_started_before_invalidate_is_not_stored():
+    """ Lecture en base commencée avant une invalidation : le résultat, peut-être périmé, n'est pas gardé """
+    cache = GeometryCache()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        return XS, YS
+
+    async def run():
+        load = asyncio.ensure_future(cache.load(1, 0, fetch))
+        await asyncio.sleep(0)
+        cache.invalidate([1])
+        return await load
+
+    xs, _ = asyncio.run(run())
+    assert np.array_equal(xs, XS)
+    assert cache.get(cache.key(1)) is None
+    asyncio.run(cache.load(1, 0, fetch))
+    assert cache.get(cache.key(1)) is not None
+
+def test_concurrent_misses_share_one_fetch():
+    """ Lectures simultanées d'une même clé absente : une seule lecture en base """
+    cache = GeometryCache()
+    fetches = []
+
+    async def fetch():
+        fetches.append(1)
+        await asyncio.sleep(0.01)
+        return XS, YS
+
+    async def run():
+        return await asyncio.gather(*(cache.load(1, 0, fetch) for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert len(fetches) == 1
+    assert all(np.array_equal(xs, XS) and np.array_equal(ys, YS) for xs, ys in results)
+    assert cache.stats()["coalesced"] == 9
+    # Lecture suivante servie par le cache
+    asyncio.run(run())
+    assert len(fetches) == 1
+
+def test_failed_fetch_is_retried_by_waiters():
+    """ Erreur de la lecture partagée : la requête qui la faisait échoue, les autres relisent """
+    cache = GeometryCache()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        if len(calls) == 1:
+            raise RuntimeError("connection lost")
+        return XS, YS
+
+    async def run():
+        return await asyncio.gather(*(cache.load(1, 0, fetch) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert isinstance(results[0], RuntimeError)
+    assert all(np.array_equal(xs, XS) for xs, _ in results[1:])
+    assert len(calls) == 2
+
+def test_empty_result_not_cached():
+    """ Polygone absent (tableaux vides) : rien n'est gardé, il pourra être inséré ensuite """
+    cache = GeometryCache()
+
+    async def fetch():
+        return np.array([]), np.array([])
+
+    asyncio.run(cache.load(1, 0, fetch))
+    assert cache.stats()["entries"] == 0
+
+def test_load_many_fetches_misses_only():
+    cache = GeometryCache()
+    cache.put(cache.key(1), pack_coordinates(XS, YS))
+    requested = []
+
+    async def fetch(ids):
+        requested.extend(ids)
+        return {i: (XS + i, YS) for i in ids}
+
+    coordinates = asyncio.run(cache.load_many([1, 2, 3], fetch))
+    assert requested == [2, 3] and sorted(coordinates) == [1, 2, 3]
+    assert np.array_equal(coordinates[3][0], XS + 3)
+    assert cache.get(cache.key(3)) is not None
+
+def test_points_endpoint_uses_cache_and_delete_invalidates(client):
+    """ Deuxième lecture des points servie par le cache ; la suppression retire l'entrée """
+    db = Database(CONF_DIR)
+    polygon_id = db.insert_polygon([Point(x=8000.0, y=0.0), Point(x=8000.0, y=3.0), Point(x=8002.0, y=5.0)])
+    db.close()
+    first = client.get(f"/polygon/{polygon_id}/points").json()
+    hits = client.get("/cache/geometry/stats").json()["hits"]
+    second = client.get(f"/polygon/{polygon_id}/points").json()
+    assert second == first
+    assert client.get("/cache/geometry/stats").json()["hits"] == hits + 1
+    assert geometry_cache.get(geometry_cache.key(polygon_id)) is not None
+
+    response = client.delete(f"/polygon/{polygon_id}")
+    assert response.status_code == 200 and response.json()["id"] == polygon_id
+    assert geometry_cache.get(geometry_cache.key(polygon_id)) is None
+    assert client.get(f"/polygon/{polygon_id}/points").status_code == 400
+    assert client.delete(f"/polygon/{polygon_id}").status_code == 400
+    metrics = client.get("/metrics").text.splitlines()
+    assert any(line.startswith('cache_bytes{cache="geometry"}') for line in metrics)
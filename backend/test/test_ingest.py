@@ -0,0 +1,145 @@
+import io
+import asyncio
+import gzip
+import json
+import threading
+import time
+import numpy as np
+import pytest
+import shapely
+import zstandard
+from fastapi import UploadFile
+from export import encode_polygon
+from ingest import (FileTooLarge, TooManyPoints, decompressed, iter_csv_point_batches, iter_in_thread, iter_lines,
+                    iter_polygon_batches, read_polygon, upload_format)
+
+def upload(content: str) -> UploadFile:
+    return UploadFile(io.BytesIO(content.encode("utf-8")), filename="test.csv")
+
+async def collect(aiter):
+    return [item async for item in aiter]
+
+def test_iter_lines_across_chunks():
+    """ Les lignes et les caractères multi-octets coupés entre deux morceaux sont reconstitués """
+    lines = asyncio.run(collect(iter_lines(upload("x,y,comment\r\n1,2,été\n\n3,4,à"), chunk_size=3)))
+    assert lines == ["x,y,comment", "1,2,été", "3,4,à"]
+
+def test_point_batches_are_bounded():
+    content = "comment,x,y\n" + "\n".join(f"c{i},{i}.5,{-i}" for i in range(10))
+    batches = asyncio.run(collect(iter_csv_point_batches(upload(content), batch_size=4)))
+    assert [len(b) for b in batches] == [4, 4, 2]
+    assert list(batches[2].x) == [8.5, 9.5]
+    assert batches[2].comments == ["c8", "c9"]
+
+@pytest.mark.parametrize("content", ["x,y\n1,2\n", "x,y,comment\n1,2,\n1,a,\n", "x,y,comment\n1,2\n"])
+def test_point_batches_reject_malformed(content):
+    with pytest.raises(ValueError):
+        asyncio.run(collect(iter_csv_point_batches(upload(content), batch_size=4)))
+
+def test_point_batches_quoted_fields():
+    """ Champs entre guillemets (RFC 4180) : virgules, guillemets doublés, retour à la ligne ; guillemet isolé accepté """
+    content = 'x,y,comment\n1,2,"a, b"\n3,4,"say ""hi"""\n5,6,"two\nlines"\n7,8,5" pipe\n'
+    batches = asyncio.run(collect(iter_csv_point_batches(upload(content), batch_size=10)))
+    assert batches[0].comments == ["a, b", 'say "hi"', "two\nlines", '5" pipe']
+    assert list(batches[0].x) == [1.0, 3.0, 5.0, 7.0]
+    with pytest.raises(ValueError):
+        asyncio.run(collect(iter_csv_point_batches(upload('x,y,comment\n1,2,"open\n'), batch_size=10)))
+
+def test_point_batches_max_points():
+    content = "x,y,comment\n" + "\n".join(f"{i},{i}," for i in range(5))
+    with pytest.raises(TooManyPoints):
+        asyncio.run(collect(iter_csv_point_batches(upload(content), batch_size=2, max_points=4)))
+
+XS, YS = np.array([0.0, 4.0, 4.0, 0.5]), np.array([0.0, 0.0, 3.0, 2.0])
+
+@pytest.mark.parametrize("fmt", ["wkb", "geojson", "arrow", "parquet"])
+def test_read_polygon(fmt):
+    """ Relecture d'un polygone encodé par encode_polygon : anneau ouvert, commentaires conservés sauf en WKB """
+    comments = ["a", None, "c", ""]
+    x, y, read_comments = read_polygon(encode_polygon(fmt, 1, XS, YS, comments), fmt)
+    assert np.array_equal(x, XS) and np.array_equal(y, YS) and x.dtype == np.float64
+    assert read_comments == ([None] * 4 if fmt == "wkb" else comments)
+
+def test_read_polygon_geojson_variants():
+    ring = [[0, 0], [4, 0], [4, 3], [0, 0]]
+    collection = {"type": "FeatureCollection",
+                  "features": [{"type": "Feature", "properties": {}, "geometry": {"type": "Polygon", "coordinates": [ring]}}]}
+    x, _, comments = read_polygon(json.dumps(collection).encode(), "geojson")
+    assert x.tolist() == [0.0, 4.0, 4.0] and comments == [None] * 3
+
+@pytest.mark.parametrize("fmt,data", [
+    ("wkb", shapely.to_wkb(shapely.Point(1, 2))),
+    ("wkb", b"garbage"),
+    ("geojson", b'{"type": "Polygon", "coordinates": [[[0, 0], [1, 0], [1, 1], [0, 0]], [[0, 0], [1, 1], [0, 1]]]}'),
+    ("geojson", b'{"type": "LineString"}'),
+    ("arrow", b"garbage"),
+    ("parquet", encode_polygon("parquet", 1, XS, YS)[:20]),
+])
+def test_read_polygon_rejects_malformed(fmt, data):
+    with pytest.raises(ValueError):
+        read_polygon(data, fmt)
+
+def test_upload_format():
+    assert upload_format("polygon.CSV") == ("csv", None)
+    assert upload_format("polygon.wkb.zst") == ("wkb", "zstd")
+    assert upload_format("polygon.parquet.gz") == ("parquet", "gzip")
+    assert upload_format("polygon.txt") == (None, None)
+
+@pytest.mark.parametrize("compress,compression", [(gzip.compress, "gzip"), (zstandard.ZstdCompressor().compress, "zstd")])
+def test_decompressed_upload(compress, compression):
+    """ Fichier compressé lu par morceaux, décompressé au fil de la lecture """
+    data = compress(encode_polygon("csv", 1, XS, YS))
+    stream = decompressed(UploadFile(io.BytesIO(data), filename="p.csv"), compression)
+    batches = asyncio.run(collect(iter_csv_point_batches(stream, batch_size=10)))
+    assert list(batches[0].x) == XS.tolist()
+    with pytest.raises(ValueError):
+        corrupt = decompressed(UploadFile(io.BytesIO(data[:-8] + b"\0" * 8), filename="p.csv"), compression)
+        asyncio.run(collect(iter_csv_point_batches(corrupt, batch_size=10)))
+
+def test_polygon_batches_are_bounded():
+    data = encode_polygon("arrow", 1, XS, YS)
+    batches = asyncio.run(collect(iter_polygon_batches(UploadFile(io.BytesIO(data)), "arrow", batch_size=3)))
+    assert [len(b) for b in batches] == [3, 1]
+    with pytest.raises(TooManyPoints):
+        asyncio.run(collect(iter_polygon_batches(UploadFile(io.BytesIO(data)), "arrow", batch_size=3, max_points=3)))
+    with pytest.raises(FileTooLarge):
+        asyncio.run(collect(iter_polygon_batches(UploadFile(io.BytesIO(data)), "arrow", batch_size=3,
+                                                 max_bytes=len(data) - 1)))
+
+def test_iter_lines_long_line_is_linear():
+    """ Ligne sans fin coupée en milliers de morceaux : temps linéaire, refusée au-delà de max_line_length """
+    data = "x" * (8 * 1024 * 1024)
+    start = time.perf_counter()
+    with pytest.raises(ValueError):
+        asyncio.run(collect(iter_lines(upload(data), max_line_length=len(data) - 1)))
+    lines = asyncio.run(collect(iter_lines(upload(data + "\n" + "x,y\n"), max_line_length=None)))
+    assert [len(line) for line in lines] == [len(data), 3]
+    assert time.perf_counter() - start < 2
+
+def test_quoted_field_keeps_blank_and_crlf_lines():
+    """ Lignes vides et \r\n dans un commentaire entre guillemets : conservées telles quelles, comme à l'export """
+    content = 'x,y,comment\r\n1,2,"a\n\nb"\r\n3,4,"d\r\ne"\r\n5,6,\r\n'
+    batches = asyncio.run(collect(iter_csv_point_batches(upload(content), batch_size=10)))
+    assert batches[0].comments == ["a\n\nb", "d\r\ne", ""]
+
+def test_unterminated_quote_is_linear():
+    """ Guillemet jamais fermé suivi de nombreuses lignes : refusé en temps linéaire, et borné par max_line_length """
+    content = 'x,y,comment\n1,2,"\n' + "3,4,c\n" * 200000
+    start = time.perf_counter()
+    with pytest.raises(ValueError):
+        asyncio.run(collect(iter_csv_point_batches(upload(content), batch_size=1000, max_line_length=None)))
+    assert time.perf_counter() - start < 2
+    with pytest.raises(ValueError):
+        asyncio.run(collect(iter_csv_point_batches(upload(content), batch_size=1000, max_line_length=1000)))
+
+def test_iter_in_thread():
+    """ Lecture et analyse dans un thread : mêmes lots, erreurs transmises à l'appelant """
+    content = "x,y,comment\n" + "\n".join(f"{i},{i}," for i in range(10))
+    batches = asyncio.run(collect(iter_in_thread(iter_csv_point_batches(upload(content), batch_size=4))))
+    assert [len(b) for b in batches] == [4, 4, 2]
+    async def items():
+        for _ in range(2):
+            yield threading.get_ident()
+    assert threading.get_ident() not in asyncio.run(collect(iter_in_thread(items())))
+    with pytest.raises(ValueError):
+        asyncio.run(collect(iter_in_thread(iter_csv_point_batches(upload("x,y\n1,2\n"), batch_size=4))))
@@ -0,0 +1,190 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import pytest
+from fastapi import HTTPException
+from database import Database, PolygonORM
+from jobs import Job, JobQueue, JobQueueFull, MemoryJobStore, SQLiteJobStore
+from model import Point
+
+CONF_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "config.ini"))
+
+@pytest.fixture(scope="module")
+def client(client):
+    # Client de conftest.py : les workers de la file de tâches tournent sur sa boucle
+    yield client
+    # Nettoyage après les tests
+    db = Database(CONF_DIR)
+    db.session.query(PolygonORM).delete()
+    db.session.commit()
+    db.close()
+
+def wait_for(client, job_id, timeout=30):
+    """ Interroge /jobs/{id} jusqu'à la fin de la tâche """
+    deadline = time.monotonic() + timeout
+    while True:
+        status = client.get(f"/jobs/{job_id}").json()
+        if status["status"] in ("done", "failed") or time.monotonic() > deadline:
+            return status
+        time.sleep(0.02)
+
+def test_job_queue():
+    """ Tâches exécutées par les workers, erreurs HTTP conservées, file pleine rejetée """
+    async def ok():
+        return b"42", "text/plain"
+
+    async def bad_request():
+        raise HTTPException(status_code=400, detail="CSV is malformed.")
+
+    async def run():
+        queue = JobQueue(workers=1, queue_depth=2)
+        queue.start()
+        done, failed = queue.submit("test", ok), queue.submit("test", bad_request)
+        with pytest.raises(JobQueueFull):
+            queue.submit("test", ok)
+        await queue.join()
+        stored = await queue.get(done.id)
+        await queue.stop()
+        return queue, done, failed, stored
+
+    queue, done, failed, stored = asyncio.run(run())
+    assert stored.to_dict()["result_url"] == f"/jobs/{done.id}/result"
+    assert (done.result, done.media_type, done.status_code) == (b"42", "text/plain", 200)
+    assert failed.status == "failed" and (failed.status_code, failed.error) == (400, "CSV is malformed.")
+    assert queue.stats()["queued"] == 0
+
+def test_job_queue_stop_fails_pending_jobs():
+    """ Les tâches en attente à l'arrêt sont marquées en échec (503) """
+    async def slow():
+        await asyncio.sleep(10)
+        return b"", "text/plain"
+
+    async def run():
+        queue = JobQueue(workers=1, queue_depth=2)
+        queue.start()
+        jobs = [queue.submit("test", slow), queue.submit("test", slow)]
+        await asyncio.sleep(0.01)
+        await queue.stop()
+        return jobs
+
+    for job in asyncio.run(run()):
+        assert job.status == "failed" and job.status_code == 503
+
+@pytest.mark.parametrize("store_type", ["memory", "sqlite"])
+def test_job_stores(store_type, tmp_path):
+    """ Enregistrement, relecture et purge des tâches terminées depuis plus de ttl """
+    store = MemoryJobStore(ttl=60) if store_type == "memory" else SQLiteJobStore(str(tmp_path / "jobs.db"), ttl=60)
+    job = Job("upload")
+    store.save(job)
+    job.status, job.status_code, job.finished_at = "done", 200, time.time() - 120
+    job.result, job.media_type = b'{"id": 1}', "application/json"
+    store.save(job)
+    running = Job("render", status="running")
+    store.save(running)
+    assert store.get(job.id).to_dict() == job.to_dict() and store.get(job.id).result == b'{"id": 1}'
+    assert store.counts() == {"queued": 0, "running": 1, "done": 1, "failed": 0}
+    assert store.purge() == 1
+    assert store.get(job.id) is None and store.get(running.id).status == "running"
+
+def test_sqlite_store_closes_connections(tmp_path, monkeypatch):
+    """ Chaque appel du store SQLite ferme sa connexion """
+    opened = []
+    connect = sqlite3.connect
+
+    class Connection(sqlite3.Connection):
+        def close(self):
+            opened.remove(self)
+            super().close()
+
+    def tracked(*args, **kwargs):
+        connection = connect(*args, factory=Connection, **kwargs)
+        opened.append(connection)
+        return connection
+
+    monkeypatch.setattr("jobs.sqlite3.connect", tracked)
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+    job = Job("upload")
+    store.save(job)
+    store.get(job.id), store.counts(), store.purge()
+    assert opened == []
+
+def test_store_runs_off_the_event_loop(tmp_path):
+    """ Lectures et écritures du store dans un thread à part, pas dans celui de la boucle """
+    threads = set()
+
+    class Store(SQLiteJobStore):
+        def save(self, job):
+            threads.add(threading.get_ident())
+            super().save(job)
+
+        def get(self, id):
+            threads.add(threading.get_ident())
+            return super().get(id)
+
+    async def ok():
+        return b"42", "text/plain"
+
+    async def run():
+        queue = JobQueue(workers=1, store=Store(str(tmp_path / "jobs.db")))
+        queue.start()
+        job = queue.submit("test", ok)
+        await queue.join()
+        await queue.stop()
+        return threading.get_ident(), job, await queue.get(job.id)
+
+    loop_thread, job, stored = asyncio.run(run())
+    assert stored.status == "done" and stored.result == b"42"
+    assert threads and loop_thread not in threads
+
+def test_large_upload_runs_as_job(client, monkeypatch):
+    """ Upload au-delà du seuil : 202 avec l'ID de la tâche, puis réponse de /upload dans le résultat """
+    monkeypatch.setattr("app.UPLOAD_JOB_THRESHOLD", 10)
+    csv = "x,y,comment\n5000.0,0.0,\n5000.0,3.0,\n5002.0,5.0,job\n"
+    response = client.post("/upload", files={"csv_file": ("big.csv", csv, "text/csv")})
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    assert response.headers["Location"] == f"/jobs/{job_id}"
+    assert wait_for(client, job_id)["status"] == "done"
+    result = client.get(f"/jobs/{job_id}/result")
+    assert result.status_code == 200
+    assert result.json()["point_count"] == 3 and isinstance(result.json()["id"], int)
+    assert client.get(f"/polygon/{result.json()['id']}/metrics").json()["vertex_count"] == 3
+
+def test_failed_upload_job(client, monkeypatch):
+    """ Erreur de la tâche : même code HTTP et même message que la requête synchrone """
+    monkeypatch.setattr("app.UPLOAD_JOB_THRESHOLD", 10)
+    response = client.post("/upload", files={"csv_file": ("bad.csv", "x,y,comment\n1.0,oops,\n", "text/csv")})
+    assert response.status_code == 202
+    status = wait_for(client, response.json()["id"])
+    assert status["status"] == "failed" and status["status_code"] == 400
+    result = client.get(f"/jobs/{response.json()['id']}/result")
+    assert result.status_code == 400 and result.json()["detail"] == "CSV is malformed."
+
+def test_small_upload_stays_synchronous(client, monkeypatch):
+    monkeypatch.setattr("app.UPLOAD_JOB_THRESHOLD", 1 << 20)
+    csv = "x,y,comment\n6000.0,0.0,\n6000.0,3.0,\n6002.0,5.0,\n"
+    response = client.post("/upload", files={"csv_file": ("small.csv", csv, "text/csv")})
+    assert response.status_code == 200 and "id" in response.json()
+
+def test_large_render_runs_as_job(client, monkeypatch):
+    """ Rendu au-delà du seuil : 202, image dans le résultat, puis servie par le cache de rendu """
+    monkeypatch.setattr("app.RENDER_JOB_THRESHOLD", 3)
+    db = Database(CONF_DIR)
+    polygon_id = db.insert_polygon([Point(x=7000.0, y=0.0), Point(x=7000.0, y=3.0),
+                                    Point(x=7002.0, y=5.0), Point(x=7003.0, y=1.0)])
+    db.close()
+    response = client.get(f"/polygon/{polygon_id}", params={"engine": "fast"})
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    assert response.json()["kind"] == "render"
+    assert wait_for(client, job_id)["status"] == "done"
+    result = client.get(f"/jobs/{job_id}/result")
+    assert result.headers["content-type"] == "image/png" and result.content.startswith(b"\x89PNG")
+    cached = client.get(f"/polygon/{polygon_id}", params={"engine": "fast"})
+    assert cached.status_code == 200 and cached.content == result.content
+
+def test_unknown_job(client):
+    assert client.get("/jobs/unknown").status_code == 404
+    assert client.get("/jobs/unknown/result").status_code == 404
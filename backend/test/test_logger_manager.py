@@ -0,0 +1,115 @@
+import asyncio
+import json
+import logging
+import logging.handlers
+import os
+import pytest
+from logger_manager import LoggerManager, SamplingFilter, request_id_var
+from renderer import RenderPool
+
+def _manager(tmp_path, name, **options) -> LoggerManager:
+    manager = LoggerManager(name=f"test.{name}", log_file=str(tmp_path / f"{name}.log"), **options)
+    manager.logger.propagate = False
+    return manager
+
+def _lines(tmp_path, name):
+    return (tmp_path / f"{name}.log").read_text(encoding="utf-8").splitlines()
+
+def test_queue_json(tmp_path):
+    """ Mode file d'attente : écrit par le thread d'écriture, une ligne JSON avec l'ID de requête """
+    manager = _manager(tmp_path, "queue_json", use_queue=True, json_format=True)
+    token = request_id_var.set("req-1")
+    try:
+        manager.logger.info("Polygon %s stored", 12)
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            manager.logger.exception("Failed")
+    finally:
+        request_id_var.reset(token)
+    manager.stop()  # Vide la file
+    first, second = (json.loads(line) for line in _lines(tmp_path, "queue_json"))
+    assert first["message"] == "Polygon 12 stored" and first["request_id"] == "req-1"
+    assert first["level"] == "INFO" and first["logger"] == "test.queue_json"
+    assert second["level"] == "ERROR" and "ValueError: boom" in second["exception"]
+
+def test_module_levels(tmp_path):
+    """ Niveau propre à un module : logger enfant """
+    manager = _manager(tmp_path, "levels", level=logging.INFO, module_levels={"database": logging.WARNING})
+    manager.logger.getChild("database").info("hidden")
+    manager.logger.getChild("database").warning("shown")
+    manager.logger.getChild("renderer").info("also shown")
+    lines = _lines(tmp_path, "levels")
+    assert len(lines) == 2 and "shown" in lines[0] and "test.levels.renderer" in lines[1]
+
+def test_sampling(monkeypatch):
+    """ Au plus burst messages d'un gabarit par fenêtre, puis le nombre de messages supprimés ; erreurs jamais supprimées """
+    now = [0.0]
+    monkeypatch.setattr("logger_manager.time.monotonic", lambda: now[0])
+    sampling = SamplingFilter(window=10, burst=2)
+
+    def record(msg, level=logging.INFO):
+        return logging.LogRecord("app", level, __file__, 1, msg, (1,), None)
+
+    assert [sampling.filter(record("Polygon %s")) for _ in range(5)] == [True, True, False, False, False]
+    assert sampling.filter(record("Other %s"))
+    assert sampling.filter(record("Polygon %s", logging.ERROR))
+    now[0] = 11.0
+    summary = record("Polygon %s")
+    assert sampling.filter(summary) and summary.suppressed == 3
+    assert summary.msg == "Polygon %s"  # Gabarit inchangé : le nombre est ajouté par le formateur
+
+@pytest.mark.parametrize("json_format", [False, True])
+def test_sampling_two_outputs(tmp_path, monkeypatch, json_format):
+    """ Sans file d'attente, console et fichier : chaque message n'est échantillonné qu'une fois """
+    now = [0.0]
+    monkeypatch.setattr("logger_manager.time.monotonic", lambda: now[0])
+    name = f"sampling_{json_format}"
+    manager = _manager(tmp_path, name, sample_window=10, sample_burst=5, json_format=json_format)
+    console = tmp_path / "console.log"
+    with open(console, "w", encoding="utf-8") as stream:
+        next(h for h in manager.handlers if type(h) is logging.StreamHandler).setStream(stream)
+        for i in range(10):
+            manager.logger.info("Polygon %s stored", i)
+        now[0] = 11.0
+        manager.logger.info("Polygon %s stored", 10)
+    file_lines, console_lines = _lines(tmp_path, name), console.read_text(encoding="utf-8").splitlines()
+    assert file_lines == console_lines and len(file_lines) == 6
+    last = json.loads(file_lines[-1])["message"] if json_format else file_lines[-1]
+    assert last.endswith("Polygon 10 stored (5 similar messages suppressed)")
+
+@pytest.mark.parametrize("rotation, handler_type", [("size", logging.handlers.RotatingFileHandler),
+                                                    ("time", logging.handlers.TimedRotatingFileHandler)])
+def test_rotation(tmp_path, rotation, handler_type):
+    manager = _manager(tmp_path, f"rotation_{rotation}", rotation=rotation, max_bytes=200, backup_count=2)
+    assert any(type(handler) is handler_type for handler in manager.handlers)
+    if rotation == "size":
+        for i in range(20):
+            manager.logger.info("Message number %s", i)
+        assert os.path.exists(tmp_path / "rotation_size.log.1")
+
+@pytest.mark.parametrize("use_queue", [False, True])
+def test_console_only(tmp_path, use_queue):
+    """ console_only : le fichier n'est jamais ouvert par un process qui ne l'écrit pas """
+    manager = _manager(tmp_path, f"console_only_{use_queue}", use_queue=use_queue)
+    manager.console_only()
+    manager.logger.info("Console only")
+    manager.stop()
+    assert [type(handler) for handler in manager.handlers] == [logging.StreamHandler]
+    assert not os.path.exists(tmp_path / f"console_only_{use_queue}.log")
+
+def test_pid_file_name(tmp_path):
+    manager = LoggerManager(name="test.pid", log_file=str(tmp_path / "app-{pid}.log"))
+    manager.logger.propagate = False
+    manager.logger.info("One file per process")
+    assert os.path.exists(tmp_path / f"app-{os.getpid()}.log")
+
+def test_render_workers_log_to_console_only():
+    """ Workers de rendu : pas de fichier de log, seul le process de l'API l'écrit et le fait tourner """
+    pool = RenderPool(workers=1)
+    expression = "[type(handler).__name__ for handler in __import__('logger_manager')._manager.handlers]"
+    try:
+        handlers = asyncio.run(pool.submit(eval, expression))
+    finally:
+        pool.shutdown()
+    assert handlers == ["StreamHandler"]
@@ -0,0 +1,49 @@
+import os
+import pytest
+from database import Database
+from metrics import MetricsRegistry
+from model import Point
+
+CONF_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "config.ini"))
+
+def test_histogram_exposition():
+    """ Buckets cumulés, somme et nombre au format texte Prometheus """
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, "/a")
+    registry.counter("hits_total", "Hits.").inc()
+    lines = registry.expose().splitlines()
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{route="/a"} 4' in lines
+    assert "hits_total 1" in lines and "# TYPE latency_seconds histogram" in lines
+    # Un deuxième enregistrement sous le même nom renvoie la même métrique
+    assert registry.histogram("latency_seconds", "Latency.", ("route",)) is histogram
+
+def test_metrics_endpoint(client):
+    """ Requêtes par route (gabarit, pas chemin brut), étapes de get_polygon et d'upload_csv, jauges """
+    db = Database(CONF_DIR)
+    id_polygon = db.insert_polygon([Point(x=94.0, y=0.0), Point(x=94.0, y=3.0), Point(x=96.0, y=5.0)])
+    assert client.get(f"/polygon/{id_polygon}", params={"engine": "fast"}).status_code == 200
+    csv = "x,y,comment\n0,0,a\n4,0,b\n4,97,c\n"
+    assert client.post("/upload", files={"csv_file": ("m.csv", csv, "text/csv")}).status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 200 and response.headers["Content-Type"].startswith("text/plain")
+    text = response.text
+    assert 'http_requests_total{method="GET",route="/polygon/{id}",status="200"}' in text
+    assert 'http_request_duration_seconds_count{method="POST",route="/upload"}' in text
+    for stage in ("db_fetch", "render", "render_queue"):
+        assert f'http_request_stage_seconds_count{{route="/polygon/{{id}}",stage="{stage}"}}' in text
+    for stage in ("read", "decode", "parse", "insert", "dedup_check"):
+        assert f'http_request_stage_seconds_count{{route="/upload",stage="{stage}"}}' in text
+    assert 'db_pool_connections{engine="async",state="checked_out"}' in text
+    assert 'render_pool_renders{state="queued"} 0' in text
+
+def test_request_id(client):
+    """ L'identifiant de requête fourni est renvoyé, sinon un nouveau est généré """
+    assert client.get("/cache/stats", headers={"X-Request-ID": "trace-42"}).headers["X-Request-ID"] == "trace-42"
+    first, second = client.get("/cache/stats"), client.get("/cache/stats")
+    assert first.headers["X-Request-ID"] != second.headers["X-Request-ID"]
@@ -1,7 +1,7 @@
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from fastapi.testclient import TestClient
-from app import app
+import numpy as np
 from database import Database
 from model import Point
 import os
@@ -9,12 +9,6 @@ import os
 # Configuration de la base de données
 CONF_DIR = config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "config.ini"))
 
-@pytest.fixture(scope="function")
-def client():
-    """Fixture pour initialiser le client de test"""
-    client = TestClient(app)
-    yield client
-
 def test_get_polygon(client):
     """ Test du point d'API pour récupérer un polygone sous forme d'image """
     polygon = [
@@ -40,6 +34,76 @@ def test_get_polygon(client):
     png_signature = b'\x89PNG\r\n\x1a\n'
     assert img_data.read(len(png_signature)) == png_signature
 
+@pytest.mark.parametrize("fmt, engine, media_type", [("svg", "fast", "image/svg+xml"),
+                                                     ("png", "fast", "image/png"),
+                                                     ("svg", "matplotlib", "image/svg+xml")])
+def test_get_polygon_format_and_engine(client, fmt, engine, media_type):
+    """ Test du choix du format et du moteur de rendu """
+    polygon = [
+        Point(x=14.0, y=0.0, comment="Test point"),
+        Point(x=14.0, y=3.0, comment="Test point2"),
+        Point(x=16.7, y=5.7, comment="Test point3")
+    ]
+    db = Database(CONF_DIR)
+    id_polygone = db.insert_polygon(polygon)
+
+    response = client.get(f"/polygon/{id_polygone}", params={"format": fmt, "engine": engine})
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith(media_type)
+
+def test_get_polygon_metrics(client):
+    """ Test du point d'API retournant les métriques stockées du polygone """
+    polygon = [Point(x=24.0, y=0.0), Point(x=24.0, y=3.0), Point(x=28.0, y=3.0), Point(x=28.0, y=0.0)]
+    db = Database(CONF_DIR)
+    id_polygone = db.insert_polygon(polygon)
+
+    response = client.get(f"/polygon/{id_polygone}/metrics")
+    assert response.status_code == 200
+    assert response.json() == {
+        "id": id_polygone, "area": 12.0, "perimeter": 14.0, "bbox": [24.0, 0.0, 28.0, 3.0],
+        "centroid": [26.0, 1.5], "vertex_count": 4, "is_valid": True,
+    }
+    assert client.get("/polygon/9999/metrics").status_code == 400
+
+def test_get_polygon_lod(client):
+    """ Niveaux de détail : sommets simplifiés sur demande, aire toujours celle de la pleine résolution """
+    angles = np.linspace(0, 2 * np.pi, 3000, endpoint=False)
+    polygon = [Point(x=float(500 + 50 * np.cos(a)), y=float(50 * np.sin(a)), comment=f"p{i}")
+               for i, a in enumerate(angles)]
+    db = Database(CONF_DIR)
+    id_polygone = db.insert_polygon(polygon)
+
+    full = client.get(f"/polygon/{id_polygone}/points").json()
+    assert full["lod"] == 0 and full["vertex_count"] == 3000 and full["points"][1]["comment"] == "p1"
+    simplified = client.get(f"/polygon/{id_polygone}/points", params={"max_vertices": 1000}).json()
+    assert simplified["lod"] > 0 and 3 <= simplified["vertex_count"] <= 1000
+    assert "comment" not in simplified["points"][0]
+    assert client.get(f"/polygon/{id_polygone}/points", params={"lod": 1}).json()["lod"] == 1
+
+    # Même aire affichée quel que soit le niveau dessiné
+    svgs = [client.get(f"/polygon/{id_polygone}", params={"format": "svg", "engine": "fast", **params})
+            for params in ({"lod": 0}, {"max_vertices": 100}, {})]
+    assert all(r.status_code == 200 for r in svgs)
+    assert len({r.headers["ETag"] for r in svgs}) == 3
+    label = svgs[0].text.split("text-anchor=\"end\">")[1].split("<")[0]
+    assert all(label in r.text for r in svgs)
+    assert len(svgs[1].content) < len(svgs[0].content)
+
+def test_get_polygon_concurrent_requests(client):
+    """ Requêtes simultanées : chaque requête a sa propre session, aucune ne bloque ni ne corrompt l'autre """
+    db = Database(CONF_DIR)
+    ids = [db.insert_polygon([Point(x=34.0 + i, y=0.0), Point(x=34.0 + i, y=3.0), Point(x=36.0 + i, y=3.0)])
+           for i in range(4)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        responses = list(executor.map(lambda i: client.get(f"/polygon/{ids[i % 4]}/metrics"), range(16)))
+    assert all(r.status_code == 200 for r in responses)
+    assert [r.json()["id"] for r in responses] == [ids[i % 4] for i in range(16)]
+
+def test_get_polygon_unknown_engine(client):
+    """ Un moteur inconnu est refusé """
+    response = client.get("/polygon/1", params={"engine": "opengl"})
+    assert response.status_code == 422
+
 def test_get_non_existing_polygon(client):
     """ Test de récupération d'un polygone qui n'existe pas """
     non_existing_polygon_id = 9999  # Un ID de polygone qui n'existe pas dans la base de données
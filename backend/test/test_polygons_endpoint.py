@@ -0,0 +1,182 @@
+import asyncio
+import io
+import json
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from fastapi import UploadFile
+from database import Database, PolygonORM
+from ingest import iter_batch_csv
+from model import Point
+
+CONF_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "config.ini"))
+
+@pytest.fixture(scope="module")
+def db():
+    db = Database(CONF_DIR)
+    yield db
+    # Nettoyage après les tests
+    db.session.query(PolygonORM).delete()
+    db.session.commit()
+
+@pytest.fixture(scope="module")
+def grid(db):
+    """ Grille de 5 carrés de côté 1, espacés de 10 unités, loin des autres tests """
+    return [db.insert_polygon([Point(x=5000.0 + 10 * i, y=5000.0), Point(x=5001.0 + 10 * i, y=5000.0),
+                               Point(x=5001.0 + 10 * i, y=5001.0), Point(x=5000.0 + 10 * i, y=5001.0)])
+            for i in range(5)]
+
+def test_find_polygons_in_bbox(client, grid):
+    response = client.get("/polygons", params={"bbox": "5000.5,4999,5020.5,5002"})
+    assert response.status_code == 200
+    body = response.json()
+    assert [p["id"] for p in body["polygons"]] == grid[:3]
+    assert body["polygons"][0]["bbox"] == [5000.0, 5000.0, 5001.0, 5001.0]
+    assert body["next_after"] is None
+
+def test_find_polygons_paginated(client, grid):
+    """ Les pages se suivent avec next_after, sans doublon ni trou """
+    seen, after = [], 0
+    while after is not None:
+        body = client.get("/polygons", params={"bbox": "4990,4990,5100,5010", "limit": 2, "after": after}).json()
+        seen.extend(p["id"] for p in body["polygons"])
+        after = body["next_after"]
+    assert seen == grid
+
+def test_index_updated_on_insert(client, db, grid):
+    response = client.get("/polygons", params={"bbox": "5000,5000,5051,5001"})
+    assert len(response.json()["polygons"]) == 5
+    files = {"csv_file": ("new.csv", "x,y,comment\n5050.5,5000.5,\n5051,5000.5,\n5051,5001,\n", "text/csv")}
+    new_id = client.post("/upload", files=files).json()["id"]
+    response = client.get("/polygons", params={"bbox": "5000,5000,5051,5001"})
+    assert [p["id"] for p in response.json()["polygons"]] == grid + [new_id]
+
+def test_find_intersecting_polygons(client, grid):
+    # Triangle partant du carré 1, dont l'emprise couvre aussi les carrés 2 et 3 sans les toucher
+    body = {"points": [{"x": 5010.5, "y": 5000.5}, {"x": 5030.0, "y": 5010.0}, {"x": 5010.5, "y": 5010.0}]}
+    response = client.post("/polygons/intersects", json=body)
+    assert response.status_code == 200
+    assert [p["id"] for p in response.json()["polygons"]] == [grid[1]]
+
+@pytest.mark.parametrize("params", [{"bbox": "1,2,3"}, {"bbox": "3,0,1,1"}])
+def test_find_polygons_invalid_bbox(client, params):
+    assert client.get("/polygons", params=params).status_code == 400
+
+def test_find_intersecting_polygons_too_few_points(client):
+    response = client.post("/polygons/intersects", json={"points": [{"x": 0, "y": 0}, {"x": 1, "y": 1}]})
+    assert response.status_code == 400
+
+def test_find_polygons_without_spatial_index(client, grid, monkeypatch):
+    """ Index en mémoire désactivé : mêmes résultats par l'index GiST de la base """
+    monkeypatch.setattr("app.SPATIAL_INDEX_ENABLED", False)
+    body = client.get("/polygons", params={"bbox": "5000.5,4999,5020.5,5002", "limit": 2}).json()
+    assert [p["id"] for p in body["polygons"]] == grid[:2] and body["next_after"] == grid[1]
+    points = [{"x": 5010.5, "y": 5000.5}, {"x": 5030.0, "y": 5010.0}, {"x": 5010.5, "y": 5010.0}]
+    response = client.post("/polygons/intersects", json={"points": points}, params={"limit": 1})
+    assert [p["id"] for p in response.json()["polygons"]] == [grid[1]]
+
+def test_list_polygons(client, grid):
+    """ Sans bbox : tous les polygones par pages triées par ID, avec aire et nombre de sommets """
+    seen, after = [], 0
+    while after is not None:
+        body = client.get("/polygons", params={"limit": 2, "after": after}).json()
+        seen.extend(body["polygons"])
+        after = body["next_after"]
+    ids = [p["id"] for p in seen]
+    assert ids == sorted(ids) and set(grid) <= set(ids)
+    first = next(p for p in seen if p["id"] == grid[0])
+    assert first["area"] == 1.0 and first["vertex_count"] == 4 and first["bbox"] == [5000.0, 5000.0, 5001.0, 5001.0]
+
+def test_points_pages(client, grid):
+    """ Points en pleine résolution par pages de limit, avec leur ID comme curseur """
+    first = client.get(f"/polygon/{grid[0]}/points", params={"limit": 3}).json()
+    assert [(p["x"], p["y"]) for p in first["points"]] == [(5000.0, 5000.0), (5001.0, 5000.0), (5001.0, 5001.0)]
+    assert first["vertex_count"] == 4 and first["next_after"] == first["points"][-1]["id"]
+    last = client.get(f"/polygon/{grid[0]}/points", params={"limit": 3, "after": first["next_after"]}).json()
+    assert [(p["x"], p["y"]) for p in last["points"]] == [(5000.0, 5001.0)] and last["next_after"] is None
+    assert client.get(f"/polygon/{grid[0]}/points", params={"limit": 3, "lod": 1}).status_code == 400
+
+def test_export_ndjson(client, grid, monkeypatch):
+    """ Export en flux, une ligne par polygone au format de /upload/batch, lots plus petits qu'un polygone """
+    monkeypatch.setattr("app.EXPORT_BATCH_SIZE", 3)
+    response = client.get("/polygons/export", params={"after": grid[0] - 1})
+    assert response.status_code == 200 and response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [int(line["polygon_key"]) for line in lines][:5] == grid
+    assert [(p["x"], p["y"]) for p in lines[0]["points"]] == [(5000.0, 5000.0), (5001.0, 5000.0),
+                                                               (5001.0, 5001.0), (5000.0, 5001.0)]
+
+def test_export_csv(client, grid):
+    response = client.get("/polygons/export", params={"format": "csv", "after": grid[-1] - 1})
+    assert response.status_code == 200 and response.headers["content-type"].startswith("text/csv")
+    lines = response.text.splitlines()
+    assert lines[0] == "polygon_key,x,y,comment"
+    assert lines[1:5] == [f"{grid[-1]},5040.0,5000.0,", f"{grid[-1]},5041.0,5000.0,",
+                          f"{grid[-1]},5041.0,5001.0,", f"{grid[-1]},5040.0,5001.0,"]
+
+def test_export_csv_reimport(client, db):
+    """ Export CSV réimporté par /upload/batch : commentaires avec virgule, guillemets et retour à la ligne intacts """
+    comments = ['a, b', 'say "hi"', 'two\nlines']
+    polygon_id = db.insert_polygon([Point(x=6100.0, y=0.0, comment=comments[0]),
+                                    Point(x=6100.0, y=3.0, comment=comments[1]),
+                                    Point(x=6102.0, y=5.0, comment=comments[2])])
+    exported = client.get("/polygons/export", params={"format": "csv", "after": polygon_id - 1}).content
+
+    async def parse():
+        return [item async for item in iter_batch_csv(UploadFile(io.BytesIO(exported)))]
+
+    key, points, error = asyncio.run(parse())[0]
+    assert (key, error) == (str(polygon_id), None)
+    assert [(p.x, p.y, p.comment) for p in points] == [(6100.0, 0.0, comments[0]), (6100.0, 3.0, comments[1]),
+                                                       (6102.0, 5.0, comments[2])]
+    response = client.post("/upload/batch", files={"batch_file": ("export.csv", exported, "text/csv")})
+    assert response.status_code == 200 and response.json()["failed"] == 0
+    assert response.json()["polygons"][0] == {"polygon_key": str(polygon_id), "id": polygon_id}
+
+@pytest.mark.parametrize("fmt", ["arrow", "parquet"])
+def test_export_columnar(client, grid, monkeypatch, fmt):
+    """ Export en colonnes, un lot Arrow (ou groupe de lignes Parquet) par aller-retour du curseur """
+    monkeypatch.setattr("app.EXPORT_BATCH_SIZE", 3)
+    response = client.get("/polygons/export", params={"format": fmt, "after": grid[0] - 1})
+    assert response.status_code == 200
+    data = pa.BufferReader(response.content)
+    table = pq.read_table(data) if fmt == "parquet" else pa.ipc.open_stream(data).read_all()
+    assert table.column_names == ["polygon_id", "x", "y", "comment"]
+    assert table.column("polygon_id").to_pylist()[:5] == [grid[0]] * 4 + [grid[1]]
+    assert table.column("x").to_pylist()[:4] == [5000.0, 5001.0, 5001.0, 5000.0]
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_export_compressed(client, grid, encoding):
+    """ Export compressé selon Accept-Encoding (décompressé par le client HTTP) ; Parquet jamais recompressé """
+    plain = client.get("/polygons/export", params={"format": "csv", "after": grid[0] - 1})
+    response = client.get("/polygons/export", params={"format": "csv", "after": grid[0] - 1},
+                          headers={"Accept-Encoding": f"{encoding}, br;q=0"})
+    assert response.headers["content-encoding"] == encoding and response.headers["vary"] == "Accept-Encoding"
+    assert response.text == plain.text
+    parquet = client.get("/polygons/export", params={"format": "parquet"}, headers={"Accept-Encoding": encoding})
+    assert "content-encoding" not in parquet.headers
+
+def test_polygons_metrics_by_id(client, grid):
+    """ Métriques stockées de plusieurs polygones en un appel, dans l'ordre demandé ; ID inconnu signalé """
+    response = client.post("/polygons/metrics", json={"ids": [grid[1], 999999, grid[0]]})
+    assert response.status_code == 200
+    polygons = response.json()["polygons"]
+    assert [p["id"] for p in polygons] == [grid[1], 999999, grid[0]]
+    assert polygons[0]["area"] == 1.0 and polygons[0]["bbox"] == [5010.0, 5000.0, 5011.0, 5001.0]
+    assert polygons[0]["centroid"] == [5010.5, 5000.5] and polygons[0]["is_valid"] is True
+    assert polygons[1] == {"id": 999999, "error": "No polygon found in DB"}
+
+def test_polygons_metrics_raw(client):
+    """ Polygones bruts : calcul vectorisé, erreur par polygone de moins de 3 points """
+    square = [{"x": 0, "y": 0}, {"x": 2, "y": 0}, {"x": 2, "y": 2}, {"x": 0, "y": 2}]
+    bowtie = [{"x": 0, "y": 0}, {"x": 1, "y": 0}, {"x": 0, "y": 1}, {"x": 1, "y": 1}]
+    body = {"polygons": [{"points": square}, {"points": square[:2]}, {"points": bowtie}]}
+    polygons = client.post("/polygons/metrics", json=body).json()["polygons"]
+    assert polygons[0]["area"] == 4.0 and polygons[0]["perimeter"] == 8.0 and polygons[0]["vertex_count"] == 4
+    assert "error" in polygons[1]
+    assert polygons[2]["is_valid"] is False
+
+@pytest.mark.parametrize("body", [{}, {"ids": [1], "polygons": []}])
+def test_polygons_metrics_invalid_query(client, body):
+    assert client.post("/polygons/metrics", json=body).status_code == 400
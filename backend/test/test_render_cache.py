@@ -0,0 +1,108 @@
+import asyncio
+import pytest
+import os
+from app import render_cache
+from database import Database
+from model import Point
+from render_cache import RenderCache, etag_matches
+
+# Configuration de la base de données
+CONF_DIR = config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "config.ini"))
+
+def test_make_key_depends_on_points_and_options():
+    """ La clé change avec les points et les options de rendu """
+    key = RenderCache.make_key(1, [0.0, 1.0, 1.0], [0.0, 0.0, 1.0], format="png")
+    assert key == RenderCache.make_key(1, [0.0, 1.0, 1.0], [0.0, 0.0, 1.0], format="png")
+    assert key != RenderCache.make_key(1, [0.0, 1.0, 2.0], [0.0, 0.0, 1.0], format="png")
+    assert key != RenderCache.make_key(2, [0.0, 1.0, 1.0], [0.0, 0.0, 1.0], format="png")
+    assert key != RenderCache.make_key(1, [0.0, 1.0, 1.0], [0.0, 0.0, 1.0], format="svg")
+
+def test_lru_eviction_respects_byte_budget():
+    """ Les entrées les moins récemment utilisées sont évincées au-delà du budget """
+    cache = RenderCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"  # "a" devient la plus récente
+    cache.put("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234"
+    stats = cache.stats()
+    assert stats["bytes"] <= 10
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2 and stats["misses"] == 1
+
+def test_disk_tier_survives_restart(tmp_path):
+    """ Le tier disque est relu par une nouvelle instance du cache """
+    RenderCache(max_bytes=100, disk_dir=str(tmp_path)).put("abcdef", b"png-bytes")
+    cache = RenderCache(max_bytes=100, disk_dir=str(tmp_path))
+    assert cache.get("abcdef") == b"png-bytes"
+    assert cache.stats()["disk_hits"] == 1
+
+def test_disk_eviction_uses_index_and_low_water(tmp_path, monkeypatch):
+    """ Éviction du tier disque sans parcourir le dossier, jusqu'à 90 % du budget, des moins récemment lues """
+    cache = RenderCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=1000)
+    monkeypatch.setattr(cache, "_disk_files", lambda: pytest.fail("directory scanned"))
+    for i in range(10):
+        cache.put(f"k{i}", b"x" * 100)
+    assert cache.get("k0") is not None  # "k0" devient la plus récente
+    cache.put("k10", b"x" * 100)
+    stats = cache.stats()
+    assert stats["disk_bytes"] == 900 and stats["disk_entries"] == 9 and stats["evictions"] == 2
+    assert cache.get("k1") is None and cache.get("k2") is None and cache.get("k0") is not None
+    assert sorted(p.name for p in tmp_path.rglob("*.bin")) == sorted(f"k{i}.bin" for i in [0] + list(range(3, 11)))
+
+def test_disk_index_rebuilt_at_startup(tmp_path):
+    """ Un redémarrage relit l'index une fois, dans l'ordre LRU des mtime """
+    cache = RenderCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=1000)
+    for i, key in enumerate(["old", "new"]):
+        cache.put(key, b"x" * 500)
+        os.utime(cache._disk_path(key), (1000 + i, 1000 + i))
+    restarted = RenderCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=1000)
+    assert restarted.stats()["disk_bytes"] == 1000
+    restarted.put("third", b"x" * 100)
+    assert restarted.get("old") is None and restarted.get("new") is not None
+
+def test_async_access_to_disk_tier(tmp_path):
+    """ get_async / put_async : mêmes résultats que get / put, le disque lu et écrit dans un thread """
+    cache = RenderCache(max_bytes=100, disk_dir=str(tmp_path))
+
+    async def run():
+        await cache.put_async("abcdef", b"png-bytes")
+        cache.clear()
+        return await cache.get_async("abcdef"), await cache.get_async("abcdef"), await cache.get_async("zz")
+
+    assert asyncio.run(run()) == (b"png-bytes", b"png-bytes", None)
+    stats = cache.stats()
+    assert stats["disk_hits"] == 1 and stats["hits"] == 1 and stats["misses"] == 1
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches(None, '"abc"')
+    assert not etag_matches('"def"', '"abc"')
+
+def test_get_polygon_etag_and_cache(client):
+    """ Une seconde requête est servie depuis le cache, If-None-Match renvoie 304 """
+    polygon = [
+        Point(x=10.0, y=0.0, comment="Cache point"),
+        Point(x=10.0, y=3.0, comment="Cache point2"),
+        Point(x=12.5, y=5.5, comment="Cache point3"),
+    ]
+    db = Database(CONF_DIR)
+    id_polygone = db.insert_polygon(polygon)
+    render_cache.clear()
+
+    response = client.get(f"/polygon/{id_polygone}")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    hits = render_cache.stats()["hits"]
+
+    response = client.get(f"/polygon/{id_polygone}")
+    assert response.status_code == 200
+    assert response.headers["ETag"] == etag
+    assert render_cache.stats()["hits"] == hits + 1
+
+    response = client.get(f"/polygon/{id_polygone}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert client.get("/cache/stats").json()["entries"] >= 1
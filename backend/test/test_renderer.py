@@ -0,0 +1,86 @@
+import pytest
+import time
+import asyncio
+import io
+import xml.etree.ElementTree as ET
+import numpy as np
+from PIL import Image
+from renderer import RenderPool, RenderQueueFull, render_polygon
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+def test_render_polygon():
+    """ Le rendu produit une image PNG sans passer par l'état global de pyplot """
+    img = render_polygon(1, [4.0, 4.0, 6.7, 6.4], [0.0, 3.0, 5.7, 0.0], 10.5)
+    assert img.startswith(PNG_SIGNATURE)
+
+def _outline(png: bytes):
+    """ Pixels bleus du contour, sous la zone de la légende (même position dans les deux moteurs) """
+    rgb = np.asarray(Image.open(io.BytesIO(png)).convert("RGB")).astype(int)
+    mask = (rgb[..., 2] > 150) & (rgb[..., 0] < 120) & (rgb[..., 1] < 120)
+    mask[:100] = False
+    return mask
+
+def _dilate(mask, radius=2):
+    grown = mask.copy()
+    for dy in range(-radius, radius + 1):
+        for dx in range(-radius, radius + 1):
+            grown |= np.roll(np.roll(mask, dy, axis=0), dx, axis=1)
+    return grown
+
+def test_fast_png_matches_matplotlib():
+    """ Le moteur rapide dessine le même contour que matplotlib : même taille, même emprise, mêmes pixels à 2 px près """
+    args = (1, [4.0, 4.0, 6.7, 6.4], [0.0, 3.0, 5.7, 0.0], 10.5)
+    reference_png = render_polygon(*args, fmt="png", engine="matplotlib")
+    fast_png = render_polygon(*args, fmt="png", engine="fast")
+    reference, fast = Image.open(io.BytesIO(reference_png)), Image.open(io.BytesIO(fast_png))
+    assert fast.format == "PNG"
+    assert fast.size == reference.size
+    reference, fast = _outline(reference_png), _outline(fast_png)
+    assert reference.any() and fast.any()
+    reference_box = [f(axis) for axis in np.nonzero(reference)[::-1] for f in (np.min, np.max)]
+    fast_box = [f(axis) for axis in np.nonzero(fast)[::-1] for f in (np.min, np.max)]
+    assert np.abs(np.subtract(reference_box, fast_box)).max() <= 2
+    # Chaque pixel d'un contour est à moins de 2 px d'un pixel de l'autre
+    assert (fast & _dilate(reference)).sum() / fast.sum() > 0.95
+    assert (reference & _dilate(fast)).sum() / reference.sum() > 0.95
+
+def test_fast_svg():
+    """ Le SVG contient le contour et le libellé de l'aire """
+    svg = render_polygon(3, [0.0, 2.0, 2.0, 0.0], [0.0, 0.0, 2.0, 2.0], 4.0, fmt="svg", engine="fast")
+    root = ET.fromstring(svg)
+    polygon = root.find("{http://www.w3.org/2000/svg}polygon")
+    assert len(polygon.get("points").split()) == 4
+    assert "Polygon 3, Area = 4.00" in svg.decode("utf-8")
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        render_polygon(1, [0.0, 1.0, 1.0], [0.0, 0.0, 1.0], 0.5, engine="opengl")
+
+def test_concurrent_renders_in_process_pool():
+    """ Des rendus concurrents sur le pool donnent chacun leur propre image """
+    pool = RenderPool(workers=2, queue_depth=4)
+    async def render_all():
+        return await asyncio.gather(*[
+            pool.submit(render_polygon, i, [0.0, float(i), float(i)], [0.0, 0.0, float(i)], i * i / 2)
+            for i in range(1, 5)
+        ])
+    try:
+        images = asyncio.run(render_all())
+    finally:
+        pool.shutdown()
+    assert all(img.startswith(PNG_SIGNATURE) for img in images)
+    assert len(set(images)) == 4
+    assert images[0] == render_polygon(1, [0.0, 1.0, 1.0], [0.0, 0.0, 1.0], 0.5)
+
+def test_pool_rejects_when_queue_is_full():
+    """ Au-delà de workers + queue_depth, les rendus sont refusés """
+    pool = RenderPool(workers=0, queue_depth=1)
+    async def saturate():
+        return await asyncio.gather(*[pool.submit(time.sleep, 0.2) for _ in range(3)], return_exceptions=True)
+    try:
+        results = asyncio.run(saturate())
+    finally:
+        pool.shutdown()
+    assert sum(isinstance(r, RenderQueueFull) for r in results) == 1
+    assert pool.stats()["queued"] == 0
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from spatial_index import SpatialIndex, parse_bbox
+
+def _random_bounds(rng, count):
+    lower = rng.uniform(0, 1000, (count, 2))
+    return np.hstack((lower, lower + rng.uniform(0, 20, (count, 2))))
+
+def _brute_force(ids, bounds, bbox):
+    min_x, min_y, max_x, max_y = bbox
+    overlap = ((bounds[:, 0] <= max_x) & (bounds[:, 2] >= min_x) & (bounds[:, 1] <= max_y) & (bounds[:, 3] >= min_y))
+    return np.sort(ids[overlap])
+
+def test_query_matches_brute_force():
+    """ Le STRtree et le tampon des ajouts donnent les mêmes résultats qu'un parcours complet """
+    rng = np.random.default_rng(0)
+    bounds = _random_bounds(rng, 3000)
+    ids = np.arange(1, 3001)
+    index = SpatialIndex(rebuild_ratio=0.2, rebuild_min=100)
+    index.build(ids[:2000], bounds[:2000])
+    index.add(ids[2000:2050], bounds[2000:2050])  # Reste dans le tampon
+    assert index.stats()["pending"] == 50
+    for bbox in [(100, 100, 300, 250), (0, 0, 1000, 1000), (500, 500, 500, 500)]:
+        assert np.array_equal(index.query(bbox), _brute_force(ids[:2050], bounds[:2050], bbox))
+
+    index.add(ids[2050:], bounds[2050:])  # Dépasse le seuil : reconstruction
+    assert index.stats()["pending"] == 0 and len(index) == 3000 and index.max_id == 3000
+    assert np.array_equal(index.query((100, 100, 300, 250)), _brute_force(ids, bounds, (100, 100, 300, 250)))
+
+def test_empty_index():
+    index = SpatialIndex()
+    index.build([], np.empty((0, 4)))
+    assert index.loaded and len(index.query((0, 0, 1, 1))) == 0
+    index.add([7], [(0.5, 0.5, 0.5, 0.5)])  # Emprise dégénérée (un point)
+    assert index.query((0, 0, 1, 1)).tolist() == [7]
+
+@pytest.mark.parametrize("value", ["1,2,3", "a,b,c,d", "3,0,1,1", "0,0,inf,1"])
+def test_parse_bbox_rejected(value):
+    with pytest.raises(ValueError):
+        parse_bbox(value)
@@ -0,0 +1,46 @@
+import asyncio
+import time
+from fastapi.testclient import TestClient
+from app import app
+from startup import WarmUp
+
+def test_warm_up_steps():
+    """ Étapes exécutées dans l'ordre et chronométrées ; une étape en erreur n'empêche pas la disponibilité """
+    calls = []
+
+    async def step(name):
+        calls.append(name)
+
+    async def failing():
+        raise RuntimeError("database unreachable")
+
+    async def run():
+        warm_up = WarmUp()
+        warm_up.start([("a", lambda: step("a")), ("broken", failing), ("b", lambda: step("b"))])
+        assert not warm_up.ready
+        while not warm_up.ready:
+            await asyncio.sleep(0.01)
+        return warm_up
+
+    warm_up = asyncio.run(run())
+    assert calls == ["a", "b"]
+    status = warm_up.status()
+    assert status["ready"] and list(status["steps"]) == ["a", "broken", "b"]
+    assert status["errors"] == {"broken": "database unreachable"}
+
+def test_ready_endpoint():
+    """ /ready : 503 tant que le préchauffage tourne, puis 200 avec la durée de chaque étape """
+    with TestClient(app) as client:
+        deadline = time.monotonic() + 60
+        response = client.get("/ready")
+        while response.status_code == 503 and time.monotonic() < deadline:
+            assert response.json()["ready"] is False
+            time.sleep(0.05)
+            response = client.get("/ready")
+        assert response.status_code == 200
+        body = response.json()
+        assert body["ready"] and body["errors"] == {}
+        assert set(body["steps"]) == {"db_pool", "spatial_index", "render_workers"}
+        metrics = client.get("/metrics").text.splitlines()
+        assert "app_ready 1" in metrics
+        assert any(line.startswith('app_warm_up_seconds{step="db_pool"}') for line in metrics)
@@ -0,0 +1,43 @@
+import io
+import numpy as np
+import pytest
+from PIL import Image
+from renderer import render_tile
+from tiles import TileCache, TileGrid
+
+GRID = TileGrid(world=(0.0, 0.0, 1024.0, 1024.0), tile_size=256, max_zoom=4)
+
+def test_tile_bbox():
+    """ Tuile 0/0/0 : tout le monde ; y croît vers le bas depuis le haut du monde """
+    assert GRID.tile_bbox(0, 0, 0) == (0.0, 0.0, 1024.0, 1024.0)
+    assert GRID.tile_bbox(1, 0, 0) == (0.0, 512.0, 512.0, 1024.0)
+    assert GRID.tile_bbox(2, 3, 3) == (768.0, 0.0, 1024.0, 256.0)
+    assert GRID.pixel_size(2) == 1.0
+    assert GRID.is_valid(2, 3, 3) and not GRID.is_valid(2, 4, 0) and not GRID.is_valid(5, 0, 0)
+
+def test_invalidate_drops_tiles_in_footprint():
+    """ Seules les tuiles (de tous les zooms) qui recouvrent l'emprise insérée sont supprimées """
+    cache = TileCache(GRID)
+    for key in ("0/0/0", "1/0/0", "1/1/1", "2/3/3"):
+        cache.put(key, b"png")
+    generation = cache.generation
+    assert cache.invalidate([7], np.array([[100.0, 900.0, 110.0, 910.0]])) == 2
+    assert cache.get("0/0/0") is None and cache.get("1/0/0") is None
+    assert cache.get("1/1/1") == b"png" and cache.get("2/3/3") == b"png"
+    assert cache.max_id == 7 and cache.stats()["invalidations"] == 2
+    # Une tuile rendue avant l'invalidation n'est pas mise en cache
+    assert not cache.put_if_current("0/0/0", b"stale", generation)
+    assert cache.put_if_current("0/0/0", b"fresh", cache.generation)
+    assert cache.get("0/0/0") == b"fresh"
+
+def test_render_tile():
+    """ Contour dessiné sur fond transparent, polygone réduit à un point dessiné en un pixel """
+    square = (np.array([100.0, 900.0, 900.0, 100.0]), np.array([100.0, 100.0, 900.0, 900.0]))
+    dot = (np.array([512.0]), np.array([512.0]))
+    image = Image.open(io.BytesIO(render_tile([square, dot], GRID.tile_bbox(0, 0, 0)))).convert("RGBA")
+    assert image.size == (256, 256)
+    alpha = np.asarray(image)[:, :, 3]
+    assert alpha[0, 0] == 0  # Fond transparent
+    assert alpha[31, 25] > 0 and alpha[128, 25] > 0  # Coin (x=25, y=31) et bord gauche du carré
+    assert alpha[128, 128] > 0  # Point
+    assert alpha[60, 60] == 0
@@ -0,0 +1,51 @@
+import io
+import os
+import numpy as np
+import pytest
+from PIL import Image
+from database import Database
+from model import Point
+
+CONF_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "config.ini"))
+
+# Avec le monde par défaut (-8192..8192), la tuile 4/2/2 couvre x de -6144 à -5120 et y de 5120 à 6144
+TILE = "/tiles/4/2/2.png"
+
+def _drawn_pixels(response) -> int:
+    return int((np.asarray(Image.open(io.BytesIO(response.content)).convert("RGBA"))[:, :, 3] > 0).sum())
+
+def _square(x: float, y: float, side: float):
+    return [Point(x=x, y=y), Point(x=x + side, y=y), Point(x=x + side, y=y + side), Point(x=x, y=y + side)]
+
+def test_get_tile(client):
+    """ Tuile PNG avec les polygones qui la traversent, ETag et 304 """
+    db = Database(CONF_DIR)
+    db.insert_polygon(_square(-6000.0, 5500.0, 200.0))
+    response = client.get(TILE)
+    assert response.status_code == 200 and response.headers["Content-Type"] == "image/png"
+    assert _drawn_pixels(response) > 0
+    assert client.get(TILE, headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+def test_tile_invalidated_on_insert(client):
+    """ Une insertion dans l'emprise d'une tuile en cache la fait redessiner, les autres tuiles restent en cache """
+    db = Database(CONF_DIR)
+    before = client.get(TILE)
+    other = client.get("/tiles/4/0/15.png")
+    hits = client.get("/tiles/stats").json()["hits"]
+
+    db.insert_polygon(_square(-5500.0, 5300.0, 300.0))
+    after = client.get(TILE)
+    assert after.headers["ETag"] != before.headers["ETag"]
+    assert _drawn_pixels(after) > _drawn_pixels(before)
+    assert client.get("/tiles/4/0/15.png").headers["ETag"] == other.headers["ETag"]
+    assert client.get("/tiles/stats").json()["hits"] == hits + 1
+
+def test_small_polygon_at_low_zoom(client):
+    """ Au zoom 0 (64 unités par pixel), un petit polygone est dessiné comme un point """
+    db = Database(CONF_DIR)
+    db.insert_polygon(_square(-7000.0, -7000.0, 2.0))
+    assert _drawn_pixels(client.get("/tiles/0/0/0.png")) > 0
+
+@pytest.mark.parametrize("path", ["/tiles/4/16/0.png", "/tiles/19/0/0.png", "/tiles/2/-1/0.png"])
+def test_tile_out_of_range(client, path):
+    assert client.get(path).status_code == 404
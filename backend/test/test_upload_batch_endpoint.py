@@ -0,0 +1,80 @@
+import asyncio
+import os
+import io
+import json
+import pytest
+from fastapi import HTTPException, UploadFile
+from app import upload_batch
+from database import Database, PolygonORM, PointORM
+
+CONF_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "config.ini"))
+
+@pytest.fixture(scope="module")
+def db():
+    db = Database(CONF_DIR)
+    yield db
+    # Nettoyage après les tests
+    db.session.query(PolygonORM).delete()
+    db.session.commit()
+
+@pytest.fixture
+def batch_csv():
+    return ("polygon_key,x,y,comment\n"
+            "a,100.0,0.0,\na,100.0,3.0,\na,102.0,5.0,first\n"
+            "b,200.0,0.0,\nb,200.0,3.0,\n"  # Seulement 2 points
+            "c,300.0,0.0,\nc,300.0,3.0,\nc,oops,5.0,\n"  # Ligne mal formée
+            "d,400.0,0.0,\nd,400.0,3.0,\nd,402.0,5.0,\nd,403.0,1.0,last\n")
+
+def test_upload_batch_csv(client, db, batch_csv):
+    files = {"batch_file": ("batch.csv", batch_csv, "text/csv")}
+    response = client.post("/upload/batch", files=files)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["succeeded"] == 2 and body["failed"] == 2
+    by_key = {p["polygon_key"]: p for p in body["polygons"]}
+    assert isinstance(by_key["a"]["id"], int) and isinstance(by_key["d"]["id"], int)
+    assert by_key["b"]["error"] == "A polygon must have at least 3 points."
+    assert "malformed" in by_key["c"]["error"]
+    assert "points" not in body  # Pas d'écho des points
+    nb_points = db.session.query(PointORM).filter(PointORM.polygon_id == by_key["d"]["id"]).count()
+    assert nb_points == 4
+    assert db.get_polygon_metrics(by_key["d"]["id"])["vertex_count"] == 4
+
+def test_upload_batch_ndjson(client, db):
+    lines = [
+        {"polygon_key": "n1", "points": [{"x": 500.0, "y": 0.0}, {"x": 500.0, "y": 3.0}, {"x": 502.0, "y": 5.0}]},
+        {"polygon_key": "n2", "points": [{"x": 600.0, "y": 0.0, "comment": "c"}, {"x": 600.0, "y": 3.0},
+                                         {"x": 602.0, "y": 5.0}]},
+        # Doublon de n1 dans le même lot : même ID
+        {"polygon_key": "n3", "points": [{"x": 500.0, "y": 0.0}, {"x": 500.0, "y": 3.0}, {"x": 502.0, "y": 5.0}]},
+    ]
+    content = "\n".join(json.dumps(line) for line in lines) + "\n{not json\n"
+    files = {"batch_file": ("batch.ndjson", io.BytesIO(content.encode("utf-8")), "application/x-ndjson")}
+    response = client.post("/upload/batch", files=files)
+    assert response.status_code == 200
+    polygons = response.json()["polygons"]
+    assert [p["polygon_key"] for p in polygons] == ["n1", "n2", "n3", "4"]
+    assert polygons[0]["id"] != polygons[1]["id"]
+    assert polygons[0]["id"] == polygons[2]["id"]
+    assert "error" in polygons[3]
+
+@pytest.mark.parametrize("filename, content", [("batch.csv", "x,y,comment\n1,2,\n"),  # Pas de polygon_key
+                                               ("batch.txt", "polygon_key,x,y,comment\n")])
+def test_upload_batch_rejected(client, filename, content):
+    files = {"batch_file": (filename, content, "text/plain")}
+    response = client.post("/upload/batch", files=files)
+    assert response.status_code == 400
+
+def test_upload_batch_malformed_message(client):
+    """ Le message d'erreur nomme le format du fichier envoyé """
+    files = {"batch_file": ("batch.ndjson", b"\xff\xfe not utf-8\n", "application/x-ndjson")}
+    response = client.post("/upload/batch", files=files)
+    assert response.status_code == 400 and response.json()["detail"] == "NDJSON is malformed."
+    files = {"batch_file": ("batch.csv", "x,y,comment\n1,2,\n", "text/csv")}
+    assert client.post("/upload/batch", files=files).json()["detail"] == "CSV is malformed."
+
+def test_upload_batch_without_filename():
+    """ Fichier sans nom : 400 (format inconnu) et non 500 """
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(upload_batch(UploadFile(io.BytesIO(b"polygon_key,x,y,comment\n")), session=None))
+    assert exc_info.value.status_code == 400
@@ -1,10 +1,12 @@
 import sys
 import os
 import io
+import gzip
 import time
+import zstandard
 import pytest
-from fastapi.testclient import TestClient
 from database import Database, PolygonORM
+from model import Point
 from app import app
 
 CONF_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "config.ini"))
@@ -23,10 +25,6 @@ def db():
     db.session.query(PolygonORM).delete()
     db.session.commit()
 
-@pytest.fixture(scope="module")
-def client():
-    return TestClient(app)
-
 @pytest.fixture
 def valid_csv():
     return "x,y,comment\n4.0,0.0,\n4.0,3.0,\n6.7,5.7,was 6.5 before version 2.3.0\n6.7,0.0," 
@@ -71,7 +69,7 @@ def test_upload_no_csv(client, text_file_content):
     files = {"csv_file": ("test.txt", text_file_content, "text/plain")}
     response = client.post("/upload", files=files)
     assert response.status_code == 400
-    assert "The file is not in CSV format" in response.text
+    assert "The file is not in a supported format" in response.text
 
 # Test de l'upload de deux fois le même CSV, vérification que la DB reste inchangée
 def test_upload_duplicate_csv(client, valid_csv, db):
@@ -92,3 +90,114 @@ def test_upload_duplicate_csv(client, valid_csv, db):
     # Vérifier que l'ID du polygone est le même (la DB ne devrait pas changer)
     second_polygon_id = db.session.query(PolygonORM.id).first()[0]
     assert first_polygon_id == second_polygon_id  # L'ID du polygone devrait être le même
+
+# Test de l'upload par COPY binaire asyncpg (seuil abaissé)
+def test_upload_csv_copy_path(client, db, monkeypatch):
+    monkeypatch.setattr("app.db.copy_threshold", 3)
+    csv = "x,y,comment\n800.5,0.0,\n800.5,3.0,a b\n802.5,5.0,last\n"
+    files = {"csv_file": ("copy.csv", csv, "text/csv")}
+    response = client.post("/upload", files=files)
+    assert response.status_code == 200
+    points = db.get_points(id=response.json()["id"])
+    assert [(p.x, p.y, p.comment) for p in points] == [(800.5, 0.0, ""), (800.5, 3.0, "a b"), (802.5, 5.0, "last")]
+
+# Test de l'upload en flux : les points sont insérés en plusieurs lots
+def test_upload_csv_streamed_in_batches(client, db, monkeypatch):
+    monkeypatch.setattr("app.UPLOAD_INSERT_BATCH_SIZE", 2)
+    csv = "x,y,comment\n" + "\n".join(f"{700 + i}.0,{i % 3}.0,pt {i}" for i in range(7))
+    files = {"csv_file": ("big.csv", csv, "text/csv")}
+    response = client.post("/upload", files=files)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["point_count"] == 7
+    assert [p["comment"] for p in body["points"]] == [f"pt {i}" for i in range(7)]
+    assert len(db.get_points(id=body["id"])) == 7
+    assert db.get_polygon_metrics(body["id"])["vertex_count"] == 7  # Métriques calculées sur tous les lots
+
+# Test de la limite du nombre de points : 413 et aucun polygone créé
+def test_upload_csv_too_many_points(client, db, monkeypatch):
+    monkeypatch.setattr("app.UPLOAD_MAX_POINTS", 3)
+    nb_polygons = db.session.query(PolygonORM).count()
+    csv = "x,y,comment\n800.0,0.0,\n800.0,1.0,\n801.0,1.0,\n801.0,0.0,"
+    files = {"csv_file": ("big.csv", csv, "text/csv")}
+    response = client.post("/upload", files=files)
+    assert response.status_code == 413
+    db.session.commit()
+    assert db.session.query(PolygonORM).count() == nb_polygons
+
+# Test de l'écho des points limité pour les gros polygones
+def test_upload_csv_echo_limit(client, monkeypatch):
+    monkeypatch.setattr("app.UPLOAD_ECHO_MAX_POINTS", 3)
+    csv = "x,y,comment\n900.0,0.0,\n900.0,1.0,\n901.0,1.0,\n901.0,0.0,"
+    files = {"csv_file": ("big.csv", csv, "text/csv")}
+    response = client.post("/upload", files=files)
+    assert response.status_code == 200
+    assert response.json()["point_count"] == 4
+    assert "points" not in response.json()
+
+# Test de l'aller-retour export / upload dans chaque format : même polygone (même ID), mêmes commentaires
+@pytest.mark.parametrize("fmt,filename,encoding", [("csv", "p.csv", None), ("wkb", "p.wkb", None),
+                                                   ("geojson", "p.geojson", "gzip"), ("arrow", "p.arrow.zst", "zstd"),
+                                                   ("parquet", "p.parquet", None)])
+def test_upload_exported_polygon(client, fmt, filename, encoding):
+    csv = "x,y,comment\n1000.0,0.0,a\n1000.0,3.0,\n1002.5,5.0,b c\n"
+    polygon_id = client.post("/upload", files={"csv_file": ("p.csv", csv, "text/csv")}).json()["id"]
+    exported = client.get(f"/polygon/{polygon_id}/export", params={"format": fmt},
+                          headers={"Accept-Encoding": encoding or "identity"})
+    assert exported.status_code == 200
+    assert exported.headers.get("content-encoding") == encoding
+    content = exported.content
+    if encoding == "zstd":
+        # Fichier envoyé compressé, décompressé à l'upload selon son extension .zst
+        content = zstandard.ZstdCompressor().compress(content)
+    response = client.post("/upload", files={"csv_file": (filename, content, "application/octet-stream")})
+    assert response.status_code == 200
+    assert response.json()["id"] == polygon_id
+    comments = [p["comment"] for p in response.json()["points"]]
+    assert comments == ([None] * 3 if fmt == "wkb" else ["a", "", "b c"])
+
+# Test de l'aller-retour CSV d'un commentaire avec virgule et guillemets (champ entre guillemets à l'export)
+def test_upload_exported_csv_with_quoted_comment(client, db):
+    comments = ['a, "b"', "", 'c "d", e']
+    polygon_id = db.insert_polygon([Point(x=1100.0, y=0.0, comment=comments[0]),
+                                    Point(x=1100.0, y=3.0, comment=comments[1]),
+                                    Point(x=1102.5, y=5.0, comment=comments[2])])
+    exported = client.get(f"/polygon/{polygon_id}/export", params={"format": "csv"})
+    assert '"a, ""b"""' in exported.text
+    response = client.post("/upload", files={"csv_file": ("p.csv", exported.content, "text/csv")})
+    assert response.status_code == 200 and response.json()["id"] == polygon_id
+    assert [(p["x"], p["y"], p["comment"]) for p in response.json()["points"]] == [
+        (1100.0, 0.0, comments[0]), (1100.0, 3.0, comments[1]), (1102.5, 5.0, comments[2])]
+
+# Test de la limite de taille décompressée : un petit fichier gzip qui se décompresse au-delà est refusé (413)
+def test_upload_decompression_limit(client, monkeypatch):
+    monkeypatch.setattr("app.UPLOAD_MAX_FILE_BYTES", 100000)
+    bomb = gzip.compress(b"\0" * 10_000_000)
+    assert len(bomb) < 100000
+    response = client.post("/upload", files={"csv_file": ("p.wkb.gz", bomb, "application/gzip")})
+    assert response.status_code == 413 and "100000 bytes" in response.json()["detail"]
+
+def test_upload_malformed_binary(client):
+    files = {"csv_file": ("p.wkb", b"not a geometry", "application/octet-stream")}
+    response = client.post("/upload", files=files)
+    assert response.status_code == 400 and response.json()["detail"] == "WKB is malformed."
+    files = {"csv_file": ("p.parquet.gz", b"not gzip", "application/octet-stream")}
+    assert client.post("/upload", files=files).json()["detail"] == "Parquet is malformed."
+
+def test_export_unknown_polygon(client):
+    assert client.get("/polygon/999999/export", params={"format": "wkb"}).status_code == 400
+
+# Test de la limite de taille décompressée en CSV : un petit .csv.gz qui se décompresse en lignes valides au-delà est refusé (413)
+def test_upload_csv_gzip_bomb(client, monkeypatch):
+    monkeypatch.setattr("app.UPLOAD_MAX_FILE_BYTES", 100_000)
+    bomb = gzip.compress(b"x,y,comment\n" + b"1,2,\n" * 1_000_000)
+    assert len(bomb) < 100_000
+    response = client.post("/upload", files={"csv_file": ("p.csv.gz", bomb, "application/gzip")})
+    assert response.status_code == 413
+
+# Test de la longueur maximale d'une ligne : un fichier sans retour à la ligne est refusé (400)
+def test_upload_csv_line_too_long(client, monkeypatch):
+    monkeypatch.setattr("app.UPLOAD_MAX_LINE_LENGTH", 1000)
+    files = {"csv_file": ("long.csv", "x,y,comment\n" + "1" * 100000, "text/csv")}
+    response = client.post("/upload", files=files)
+    assert response.status_code == 400 and response.json()["detail"] == "CSV is malformed."
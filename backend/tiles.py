@@ -0,0 +1,128 @@
+from configparser import ConfigParser
+from typing import Sequence, Tuple
+import numpy as np
+from render_cache import RenderCache
+from spatial_index import BBox
+
+# Nombre de tuiles comparées à la fois aux emprises des nouveaux polygones (et nombre d'emprises
+# au-delà duquel tout le cache est vidé)
+_INVALIDATE_CHUNK = 4096
+
+
+class TileGrid:
+    """
+    XYZ tile pyramid over a world extent: zoom z has 2^z x 2^z tiles of tile_size
+    pixels, x growing eastward and y growing downward from the top of the world (slippy map
+    convention).
+    """
+
+    def __init__(self, world: BBox = (-8192.0, -8192.0, 8192.0, 8192.0), tile_size: int = 256, max_zoom: int = 18):
+        self.world = world
+        self.tile_size = tile_size
+        self.max_zoom = max_zoom
+
+    @classmethod
+    def from_config(cls, config_file: str) -> "TileGrid":
+        """Build the grid from the [tiles] section of the ini file (defaults if absent)."""
+        config = ConfigParser()
+        config.read(config_file)
+        world = config.get("tiles", "world", fallback="-8192,-8192,8192,8192")
+        return cls(
+            world=tuple(float(value) for value in world.split(",")),
+            tile_size=config.getint("tiles", "tile_size", fallback=256),
+            max_zoom=config.getint("tiles", "max_zoom", fallback=18),
+        )
+
+    def is_valid(self, z: int, x: int, y: int) -> bool:
+        return 0 <= z <= self.max_zoom and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+    def tile_span(self, z) -> Tuple[float, float]:
+        """Width and height of a tile at zoom z, in data units (z may be an array)."""
+        min_x, min_y, max_x, max_y = self.world
+        scale = np.exp2(z)
+        return (max_x - min_x) / scale, (max_y - min_y) / scale
+
+    def tile_bbox(self, z: int, x: int, y: int) -> BBox:
+        """Extent (min_x, min_y, max_x, max_y) of a tile, in data units."""
+        width, height = self.tile_span(z)
+        left, top = self.world[0] + x * width, self.world[3] - y * height
+        return float(left), float(top - height), float(left + width), float(top)
+
+    def pixel_size(self, z: int) -> float:
+        """Size of one tile pixel at zoom z, in data units (the larger of both axes)."""
+        return float(max(self.tile_span(z)) / self.tile_size)
+
+
+class TileCache(RenderCache):
+    """
+    In-memory cache of rendered tiles keyed by "z/x/y", with the LRU byte budget of RenderCache.
+    Tiles are dropped when polygons are inserted in their footprint (invalidate); a tile
+    rendered while an invalidation happened is not stored (put_if_current).
+    """
+
+    def __init__(self, grid: TileGrid, max_bytes: int = 32 * 1024 * 1024):
+        super().__init__(max_bytes=max_bytes)
+        self.grid = grid
+        self.generation = 0
+        self.invalidations = 0
+        # Plus grand ID de polygone dont l'emprise a été prise en compte
+        self.max_id = 0
+
+    @classmethod
+    def from_config(cls, config_file: str) -> "TileCache":
+        """Build the grid and the cache budget from the [tiles] section of the ini file."""
+        config = ConfigParser()
+        config.read(config_file)
+        return cls(TileGrid.from_config(config_file),
+                   max_bytes=config.getint("tiles", "cache_max_bytes", fallback=32 * 1024 * 1024))
+
+    @staticmethod
+    def tile_key(z: int, x: int, y: int) -> str:
+        return f"{z}/{x}/{y}"
+
+    def put_if_current(self, key: str, data: bytes, generation: int) -> bool:
+        """Store a tile rendered when the cache was at this generation, unless tiles were invalidated since."""
+        with self._lock:
+            if generation != self.generation:
+                return False
+            self._memory_put(key, data)
+            return True
+
+    def invalidate(self, ids: Sequence[int], bounds: np.ndarray) -> int:
+        """Drop the cached tiles intersecting any of these polygon bounding boxes; return how many."""
+        bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+        with self._lock:
+            if len(ids):
+                self.max_id = max(self.max_id, int(np.max(ids)))
+            if not len(bounds):
+                return 0
+            self.generation += 1
+            if len(bounds) > _INVALIDATE_CHUNK:
+                # Gros import : tout vider coûte moins que comparer chaque tuile à chaque emprise
+                dropped = len(self._entries)
+                self._entries.clear()
+                self._size = 0
+                self.invalidations += dropped
+                return dropped
+            keys = list(self._entries)
+            dropped = 0
+            for start in range(0, len(keys), _INVALIDATE_CHUNK):
+                chunk = keys[start:start + _INVALIDATE_CHUNK]
+                tiles = np.array([key.split("/") for key in chunk], dtype=np.int64).reshape(-1, 3)
+                width, height = self.grid.tile_span(tiles[:, 0])
+                left = self.grid.world[0] + tiles[:, 1] * width
+                top = self.grid.world[3] - tiles[:, 2] * height
+                # Tuiles x emprises : recouvrement des deux rectangles
+                overlap = ((left[:, None] <= bounds[None, :, 2]) & (left[:, None] + width[:, None] >= bounds[None, :, 0])
+                           & (top[:, None] - height[:, None] <= bounds[None, :, 3]) & (top[:, None] >= bounds[None, :, 1]))
+                for key in np.asarray(chunk, dtype=object)[overlap.any(axis=1)]:
+                    self._size -= len(self._entries.pop(key))
+                    dropped += 1
+            self.invalidations += dropped
+            return dropped
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        with self._lock:
+            stats.update(generation=self.generation, invalidations=self.invalidations)
+        return stats
@@ -12,8 +12,24 @@ CREATE DATABASE polygone;
 
 -- Créer les tables
 CREATE TABLE IF NOT EXISTS polygons (
-    id SERIAL PRIMARY KEY
+    id SERIAL PRIMARY KEY,
+    fingerprint VARCHAR(64),
+    area DOUBLE PRECISION,
+    perimeter DOUBLE PRECISION,
+    min_x DOUBLE PRECISION,
+    min_y DOUBLE PRECISION,
+    max_x DOUBLE PRECISION,
+    max_y DOUBLE PRECISION,
+    centroid_x DOUBLE PRECISION,
+    centroid_y DOUBLE PRECISION,
+    vertex_count INTEGER,
+    is_valid BOOLEAN,
+    coordinates BYTEA
 );
+ALTER TABLE polygons ALTER COLUMN coordinates SET STORAGE EXTERNAL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ix_polygons_fingerprint ON polygons (fingerprint);
+CREATE INDEX IF NOT EXISTS ix_polygons_bbox ON polygons USING gist (box(point(min_x, min_y), point(max_x, max_y)));
 
 CREATE TABLE IF NOT EXISTS points (
     id SERIAL PRIMARY KEY,
@@ -23,3 +39,14 @@ CREATE TABLE IF NOT EXISTS points (
     polygon_id INT,
     FOREIGN KEY (polygon_id) REFERENCES polygons(id) ON DELETE CASCADE
 );
+CREATE INDEX IF NOT EXISTS ix_points_polygon_id ON points (polygon_id, id);
+
+CREATE TABLE IF NOT EXISTS polygon_lods (
+    polygon_id INTEGER NOT NULL REFERENCES polygons(id) ON DELETE CASCADE,
+    level INTEGER NOT NULL,
+    tolerance DOUBLE PRECISION NOT NULL,
+    vertex_count INTEGER NOT NULL,
+    coordinates BYTEA NOT NULL,
+    PRIMARY KEY (polygon_id, level)
+);
+ALTER TABLE polygon_lods ALTER COLUMN coordinates SET STORAGE EXTERNAL;
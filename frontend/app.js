@@ -1,3 +1,115 @@
+const API_URL = "http://localhost:8080";
+
+// Slippy map state: zoom level and map center, in pixels of the whole world at that zoom
+const map = { grid: null, z: 0, centerX: 0, centerY: 0, version: 0, tiles: new Map() };
+
+async function initMap() {
+    const container = document.getElementById("tile-map");
+    try {
+        const response = await fetch(`${API_URL}/tiles/grid`);
+        map.grid = await response.json();
+    } catch (error) {
+        displayServerResponse("Server connection error.", "error");
+        return;
+    }
+    // Whole world visible at zoom 0
+    map.centerX = map.centerY = map.grid.tile_size / 2;
+
+    let drag = null;
+    container.addEventListener("pointerdown", (event) => {
+        drag = { x: event.clientX, y: event.clientY };
+        container.setPointerCapture(event.pointerId);
+    });
+    container.addEventListener("pointermove", (event) => {
+        if (!drag) return;
+        map.centerX -= event.clientX - drag.x;
+        map.centerY -= event.clientY - drag.y;
+        drag = { x: event.clientX, y: event.clientY };
+        renderTiles();
+    });
+    container.addEventListener("pointerup", () => { drag = null; });
+    container.addEventListener("wheel", (event) => {
+        event.preventDefault();
+        const rect = container.getBoundingClientRect();
+        zoomAt(map.z + (event.deltaY < 0 ? 1 : -1), event.clientX - rect.left, event.clientY - rect.top);
+    }, { passive: false });
+    window.addEventListener("resize", renderTiles);
+    renderTiles();
+}
+
+function zoomAt(z, offsetX, offsetY) {
+    const container = document.getElementById("tile-map");
+    z = Math.max(0, Math.min(map.grid.max_zoom, z));
+    if (z === map.z) return;
+    // The point under the cursor stays in place
+    const scale = 2 ** (z - map.z);
+    const dx = offsetX - container.clientWidth / 2;
+    const dy = offsetY - container.clientHeight / 2;
+    map.centerX = (map.centerX + dx) * scale - dx;
+    map.centerY = (map.centerY + dy) * scale - dy;
+    map.z = z;
+    renderTiles();
+}
+
+function zoomBy(step) {
+    const container = document.getElementById("tile-map");
+    if (map.grid) zoomAt(map.z + step, container.clientWidth / 2, container.clientHeight / 2);
+}
+
+function showBBox(bbox) {
+    // Highest zoom at which the bounding box fits in the map, centered on it
+    const container = document.getElementById("tile-map");
+    const [worldMinX, worldMinY, worldMaxX, worldMaxY] = map.grid.world;
+    const [minX, minY, maxX, maxY] = bbox;
+    const tileSize = map.grid.tile_size;
+    let z = map.grid.max_zoom;
+    while (z > 0 && ((maxX - minX) / (worldMaxX - worldMinX) * tileSize * 2 ** z > container.clientWidth
+                  || (maxY - minY) / (worldMaxY - worldMinY) * tileSize * 2 ** z > container.clientHeight)) {
+        z -= 1;
+    }
+    map.z = z;
+    map.centerX = ((minX + maxX) / 2 - worldMinX) / (worldMaxX - worldMinX) * tileSize * 2 ** z;
+    map.centerY = (worldMaxY - (minY + maxY) / 2) / (worldMaxY - worldMinY) * tileSize * 2 ** z;
+    renderTiles();
+}
+
+function renderTiles() {
+    if (!map.grid) return;
+    const container = document.getElementById("tile-map");
+    const tileSize = map.grid.tile_size;
+    const count = 2 ** map.z;
+    const left = map.centerX - container.clientWidth / 2;
+    const top = map.centerY - container.clientHeight / 2;
+    const visible = new Set();
+
+    for (let x = Math.max(0, Math.floor(left / tileSize)); x < count && x * tileSize < left + container.clientWidth; x++) {
+        for (let y = Math.max(0, Math.floor(top / tileSize)); y < count && y * tileSize < top + container.clientHeight; y++) {
+            const key = `${map.z}/${x}/${y}?v=${map.version}`;
+            visible.add(key);
+            let img = map.tiles.get(key);
+            if (!img) {
+                img = document.createElement("img");
+                img.className = "tile";
+                img.draggable = false;
+                img.style.width = img.style.height = `${tileSize}px`;
+                img.src = `${API_URL}/tiles/${map.z}/${x}/${y}.png?v=${map.version}`;
+                container.appendChild(img);
+                map.tiles.set(key, img);
+            }
+            img.style.left = `${x * tileSize - left}px`;
+            img.style.top = `${y * tileSize - top}px`;
+        }
+    }
+    // Drop the tiles that left the view (or belong to another zoom level or version)
+    for (const [key, img] of map.tiles) {
+        if (!visible.has(key)) {
+            img.remove();
+            map.tiles.delete(key);
+        }
+    }
+    document.getElementById("map-zoom").textContent = `Zoom ${map.z}`;
+}
+
 async function uploadFile() {
     const fileInput = document.getElementById("csv-file");
     const file = fileInput.files[0];
@@ -11,18 +123,28 @@ async function uploadFile() {
     formData.append("csv_file", file);
 
     try {
-        const response = await fetch("http://localhost:8080/upload", {
+        let response = await fetch(`${API_URL}/upload`, {
             method: "POST",
             body: formData,
         });
 
+        // Large file: processed in the background, poll the job until it is finished
+        if (response.status === 202) {
+            displayServerResponse("Large file: processing in the background...", "success");
+            response = await waitForJob((await response.json()).id);
+        }
+
         const data = await response.json();
 
         if (response.ok) {
-            displayServerResponse(`CSV file uploaded successfully! Polygon ID: ${data.id}`, "success");
+            displayServerResponse(`File uploaded successfully! Polygon ID: ${data.id}`, "success");
 
             // ✅ Automatically update the ID input field
             document.getElementById("polygon-id").value = data.id;
+
+            // Redraw the map: the tiles covering the new polygon have changed
+            map.version += 1;
+            renderTiles();
         } else {
             displayServerResponse(data.detail || "An error occurred while uploading the file.", "error");
         }
@@ -31,6 +153,17 @@ async function uploadFile() {
     }
 }
 
+async function waitForJob(jobId) {
+    // Poll the job status, then return the response of its result (or of its error)
+    while (true) {
+        const job = await (await fetch(`${API_URL}/jobs/${jobId}`)).json();
+        if (job.status === "done" || job.status === "failed") {
+            return fetch(`${API_URL}/jobs/${jobId}/result`);
+        }
+        await new Promise((resolve) => setTimeout(resolve, 500));
+    }
+}
+
 async function loadPolygon() {
     const polygonIdInput = document.getElementById("polygon-id");
     const polygonId = polygonIdInput.value;
@@ -41,12 +174,12 @@ async function loadPolygon() {
     }
 
     try {
-        // Adjust URL to use parameterized route: "/polygon/{id}"
-        const response = await fetch(`http://localhost:8080/polygon/${polygonId}`);
-        
+        // The map is drawn from tiles: only the bounding box of the polygon is needed to show it
+        const response = await fetch(`${API_URL}/polygon/${polygonId}/metrics`);
+
         if (response.ok) {
-            const imgUrl = URL.createObjectURL(await response.blob());
-            document.getElementById("polygon-img").src = imgUrl;
+            const metrics = await response.json();
+            showBBox(metrics.bbox);
             displayServerResponse("Polygon retrieved successfully!", "success");
         } else {
             const data = await response.json();
@@ -66,3 +199,5 @@ function displayServerResponse(message, type) {
 
     serverResponseDiv.style.display = "block";  // Show message
 }
+
+initMap();